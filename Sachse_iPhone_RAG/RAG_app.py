@@ -1,33 +1,40 @@
 # --- Suppress noisy logs and warnings ---
-import logging
 import warnings
-from transformers import logging as hf_logging
-
-# Set specific loggers to ERROR level
-logging.getLogger("langchain.text_splitter").setLevel(logging.ERROR)
-
-# Silence Hugging Face transformers logs
-hf_logging.set_verbosity_error()
 
 # Filter out generic Python warnings
 warnings.filterwarnings("ignore")
 
 # --- Load OpenAI API key from .env ---
+import atexit
 import os
 from dotenv import load_dotenv
-from openai import OpenAI  # UPDATED: use new OpenAI client
 
 # Load environment variables from .env in the current directory
 load_dotenv()
 
-# Initialize OpenAI client (replaces openai.api_key = ...)  # UPDATED
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Heavy libraries (transformers, sentence-transformers, faiss, openai) are
+# imported on first use by RAGPipeline below, so importing this module stays
+# fast.
+import threading
+import time
+import numpy as np
+
+# Per-stage timing spans; no-ops unless profiler.enabled (see profiling.py)
+from profiling import profiler, span
 
 # --- RAG Parameters ---
 
-# Text splitting parameters
+# Text splitting parameters (see chunker.py)
 chunk_size = 150 #500 initially
 chunk_overlap = 100
+chunk_unit = "chars"  # or "tokens": sizes count tokens of the embedder's tokenizer
+
+# Near-duplicate chunks (see near_dedup.py): a chunk whose MinHash-estimated
+# Jaccard similarity to an already indexed chunk reaches this threshold is not
+# embedded or indexed. Higher = only closer copies are dropped; None = off.
+# Off by default, since it changes the indexed chunks; pick a value with
+# `python near_dedup.py --report` (e.g. 0.8).
+dedup_threshold = None
 
 # Embedding model (bi-encoder)
 model_name = "sentence-transformers/all-distilroberta-v1"
@@ -35,93 +42,660 @@ model_name = "sentence-transformers/all-distilroberta-v1"
 # Retrieval parameters
 top_k = 20
 
+# FAISS backend: "flat" (exact), "fp16" / "sq8" (exact scan over float16 or
+# int8 codes, 2x / 4x smaller), "hnsw", "ivf" or "ivfpq" (see ann_index.py)
+index_backend = "flat"
+# "l2" (original) or "ip": L2-normalized vectors ranked by inner product,
+# i.e. the cosine similarity the embedding model is trained for
+index_metric = "l2"
+nprobe = 16      # IVF lists probed per query
+ef_search = 64   # HNSW candidate list size per query
+
+# Hybrid retrieval (see sparse_index.py): BM25 and dense hits, `hybrid_depth`
+# from each, fused with reciprocal rank fusion and cut to top_k. Recall holds
+# with a smaller top_k, so fewer pairs reach the cross-encoder. Applies to the
+# single-document index (corpus mode stays dense).
+hybrid_search = False
+hybrid_depth = 20
+rrf_k = 60
+
 # Re-ranking parameters
 cross_encoder_name = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 top_m = 8
 
-# --- Load pre-scraped document ---
+# Inference backend for both models: "torch", or "onnx" / "onnx-int8" to run
+# them with ONNX Runtime, exported once to .rag_cache/onnx (see onnx_backend.py)
+model_backend = "torch"
+
+# Context packing (see context_packer.py): MMR-ordered, overlap-merged
+# passages up to a token budget instead of all top_m chunks joined
+context_packing = True
+context_token_budget = 1200   # tokens of the chat model's tokenizer
+mmr_lambda = 0.7              # 1 = pure relevance, 0 = pure diversity
+context_log = False           # print prompt tokens saved per question (REPL: --context-log)
+
+# Chat model
+llm_model = "gpt-5"
+
+# Batch sizes for answer_questions() (offline / evaluation jobs)
+encode_batch_size = 64
+rerank_batch_size = 128
+llm_workers = 4  # chat completions kept in flight at once
+
+# Worker processes for embedding large chunk sets at indexing time
+# (see parallel_embed.py); 0 = a single in-process encode() call
+embed_workers = 0
+
+# Async pipeline (answer_question_async)
+llm_concurrency = 8  # max chat completions in flight (sync and async callers each)
+cpu_workers = 4      # threads for retrieval + reranking
+
+# LLM calls (see llm_client.py): deadlines, retries with jittered backoff,
+# rate limit and circuit breaker
+llm_timeout = 60.0            # seconds per answer, queueing and retries included
+llm_attempt_timeout = 30.0    # seconds before a single hung request is retried
+llm_max_retries = 4
+llm_rate_limit = None         # requests per second; None = unlimited
+llm_breaker_threshold = 5     # consecutive failures that open the circuit
+llm_breaker_reset = 30.0      # seconds before trying upstream again
+
+# Answer cache: exact match on the normalized question, then (when a
+# threshold is set) cosine similarity of the query embedding against past
+# questions. Entries are dropped when the index or any setting that shapes
+# an answer changes (see RAGPipeline.index_version()).
+answer_cache_path = os.path.join(".rag_cache", "answers.sqlite3")
+answer_cache_size = 1000
+answer_cache_ttl = 7 * 24 * 3600   # seconds; None = never expire
+# Cosine for a semantic hit; None = exact matches only. Off by default:
+# questions differing only in an entity ("iPhone 5" vs "iPhone 6") can
+# score above 0.95 and would get each other's answers.
+answer_cache_threshold = None
+
+# Reranking shortcuts (see rerank_cascade.py)
+rerank_cache_size = 10000          # cached (question, chunk) cross-encoder scores
+rerank_cascade_margin = None       # e.g. 0.15; smaller = faster, less accurate; None = off
+
+# Extractive answers (see extractive.py): answer with a sentence of the
+# reranked chunks instead of calling the LLM
+extractive_mode = "off"            # "off", "auto" (local when confident, else LLM) or "local" (never the LLM)
+extractive_threshold = 0.95        # confidence (0..1) an "auto" answer needs to be served locally
+extractive_chunks = 3              # best reranked chunks searched for the answer
+extractive_model = None            # extractive QA model, e.g. "distilbert-base-cased-distilled-squad"; None = cross-encoder sentence scoring
+
+# --- Document and splitter ---
 DOC_PATH = "Selected_Document.txt"
 
-try:
-    with open(DOC_PATH, "r", encoding="utf-8") as f:
-        text = f.read()
-    print(f"✅ Loaded document: {DOC_PATH} ({len(text)} characters)")
-except FileNotFoundError:
-    print(f"❌ {DOC_PATH} not found. Make sure to run your extractor first.")
-    text = ""
+# Root of the on-disk index cache (see index_cache.py)
+index_cache_dir = ".rag_cache"
 
-# --- Split text into chunks ---
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+# Directory built by `python corpus.py ingest`; when set, questions are
+# answered from that multi-document corpus instead of DOC_PATH
+corpus_index_dir = None
 
-# Define the splitter with your parameters
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=chunk_size,
-    chunk_overlap=chunk_overlap,
-    separators=["", "\n", " ", ""]
-)
+# --- Lazily initialized pipeline ---
 
-# Perform the split
-chunks = splitter.split_text(text)
+class RAGPipeline:
+    """
+    Holds the models, the LLM client and the FAISS index, creating each
+    one on first access instead of at import time. Every resource has its
+    own lock, so a background warm_up() can load one model while a caller
+    already uses another, and concurrent first uses build it only once.
 
-print(f"✅ Split document into {len(chunks)} chunks.")
+    The module-level names `embedder`, `reranker`, `client`, `faiss_index`,
+    `chunks`, `chunk_by_id`, `chunk_index`, `text`, `splitter`, `index_key`
+    and `answer_cache` resolve to the attributes of the default `pipeline`.
+    """
 
-# --- Embed chunks and build FAISS index ---
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss  # make sure faiss-cpu is installed
+    def __init__(self, doc_path: str = DOC_PATH):
+        self.doc_path = doc_path
+        self._values = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lazy(self, name: str, factory):
+        """Return the cached value for `name`, building it once with `factory`."""
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._values:
+                self._values[name] = factory()
+            return self._values[name]
 
-# Load the embedding model
-embedder = SentenceTransformer(model_name)
+    def is_loaded(self, name: str) -> bool:
+        return name in self._values
 
-# Encode the chunks (progress bar hidden)
-embeddings = embedder.encode(chunks, show_progress_bar=False)
+    # --- models and clients ---
 
-# Ensure float32 dtype for FAISS
-embeddings = np.array(embeddings, dtype="float32")
+    @staticmethod
+    def _silence_hf_logs():
+        # Silence Hugging Face transformers logs
+        from transformers import logging as hf_logging
+        hf_logging.set_verbosity_error()
 
-# Initialize FAISS index
-dim = embeddings.shape[1]
-faiss_index = faiss.IndexFlatL2(dim)
+    @staticmethod
+    def _onnx_backend():
+        import onnx_backend
+        if model_backend not in onnx_backend.MODEL_BACKENDS:
+            raise ValueError(f"model_backend must be one of {onnx_backend.MODEL_BACKENDS}, got {model_backend!r}")
+        return onnx_backend
 
-# Add embeddings to the index
-faiss_index.add(embeddings)
+    def _load_embedder(self):
+        self._silence_hf_logs()
+        if model_backend != "torch":
+            with span("load.embedder"):
+                return self._onnx_backend().load_embedder(model_name, quantize=model_backend == "onnx-int8")
+        from sentence_transformers import SentenceTransformer
+        with span("load.embedder"):
+            return SentenceTransformer(model_name)
 
-print(f"✅ Built FAISS index with {faiss_index.ntotal} vectors of dimension {dim}.")
+    def _load_reranker(self):
+        self._silence_hf_logs()
+        if model_backend != "torch":
+            with span("load.reranker"):
+                return self._onnx_backend().load_cross_encoder(
+                    cross_encoder_name, quantize=model_backend == "onnx-int8")
+        from sentence_transformers import CrossEncoder
+        # Initialize the cross-encoder reranker (uses the name defined earlier)
+        with span("load.reranker"):
+            return CrossEncoder(cross_encoder_name)
 
-# --- Retrieve nearest chunks from FAISS ---
-from typing import List
+    @property
+    def embedder(self):
+        return self._lazy("embedder", self._load_embedder)
+
+    @property
+    def reranker(self):
+        return self._lazy("reranker", self._load_reranker)
+
+    @property
+    def qa_model(self):
+        """The extractive QA pipeline (only when extractive_model is set)."""
+        def make():
+            self._silence_hf_logs()
+            from transformers import pipeline as hf_pipeline
+            with span("load.qa"):
+                return hf_pipeline("question-answering", model=extractive_model, tokenizer=extractive_model)
+        return self._lazy("qa_model", make)
+
+    @property
+    def embed_pool(self):
+        def make():
+            from parallel_embed import EmbeddingPool
+            return EmbeddingPool(model_name, workers=embed_workers, batch_size=encode_batch_size)
+        return self._lazy("embed_pool", make)
+
+    @property
+    def client(self):
+        """The LLMClient (pooled OpenAI clients with deadlines, retries and limits)."""
+        def make():
+            from llm_client import LLMClient
+            llm = LLMClient(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_concurrency=llm_concurrency,
+                timeout=llm_timeout,
+                attempt_timeout=llm_attempt_timeout,
+                max_retries=llm_max_retries,
+                rate_per_s=llm_rate_limit,
+                breaker_threshold=llm_breaker_threshold,
+                breaker_reset_s=llm_breaker_reset,
+            )
+            llm.sync_client  # import openai and open the pool now (warm-up)
+            return llm
+        return self._lazy("client", make)
+
+    # --- document and index ---
+
+    def _load_text(self) -> str:
+        try:
+            with open(self.doc_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            print(f"✅ Loaded document: {self.doc_path} ({len(text)} characters)")
+        except FileNotFoundError:
+            print(f"❌ {self.doc_path} not found. Make sure to run your extractor first.")
+            text = ""
+        return text
+
+    def _make_splitter(self):
+        from chunker import Chunker
+
+        # Offset-based chunker on sentence/word (or token) boundaries
+        tokenizer = self.embedder.tokenizer if chunk_unit == "tokens" else None
+        return Chunker(chunk_size, chunk_overlap, unit=chunk_unit, tokenizer=tokenizer)
+
+    def _split_chunks(self, text: str):
+        chunks = self.splitter.split_text(text)
+        if dedup_threshold is None or not chunks:
+            return chunks
+        from near_dedup import dedupe_chunks
+
+        unique = list(dict.fromkeys(chunks))
+        with span("index.dedup"):
+            kept = dedupe_chunks(unique, dedup_threshold)
+        print(f"✅ Left out {len(unique) - len(kept)} near-duplicate chunks "
+              f"({1 - len(kept) / len(unique):.1%} of {len(unique)}).")
+        return kept
+
+    def _encode_chunks(self, new_chunks):
+        # Small updates are not worth a round trip through the worker pool, and
+        # the workers load the PyTorch model
+        if (model_backend == "torch" and embed_workers
+                and len(new_chunks) > encode_batch_size * embed_workers):
+            return self.embed_pool.iter_encode(new_chunks)
+        return self.embedder.encode(new_chunks, show_progress_bar=False)
+
+    def _build_index(self):
+        from index_cache import load_or_build_index
+
+        chunk_index, n_added, n_removed = load_or_build_index(
+            self.index_key,
+            self.text,
+            split=self._split_chunks,
+            encode=self._encode_chunks,
+            dim=self.embedder.get_sentence_embedding_dimension(),
+            cache_dir=index_cache_dir,
+            backend=index_backend,
+            build_params={"metric": index_metric},
+            search_params={"nprobe": nprobe, "ef_search": ef_search},
+        )
+
+        dim = chunk_index.dim
+        if n_added == n_removed == 0:
+            print(f"✅ Loaded cached FAISS index with {chunk_index.index.ntotal} vectors of dimension {dim}.")
+        else:
+            print(f"✅ Split document into {len(chunk_index.chunks)} chunks.")
+            print(f"✅ Indexed {chunk_index.index.ntotal} vectors of dimension {dim} "
+                  f"({n_added} embedded, {n_removed} removed).")
+        return chunk_index
+
+    @property
+    def text(self) -> str:
+        return self._lazy("text", self._load_text)
+
+    @property
+    def splitter(self):
+        return self._lazy("splitter", self._make_splitter)
+
+    @property
+    def index_key(self) -> str:
+        # The key covers every parameter above, so changing any of them selects a
+        # fresh cache entry. Within an entry, chunks are content-addressed: an edited
+        # document only re-embeds the chunks that actually changed.
+        def make():
+            from index_cache import cache_key
+            # ONNX (and int8 even more) embeddings differ slightly from PyTorch's,
+            # so every backend keeps its own cache entry
+            model = model_name if model_backend == "torch" else f"{model_name}@{model_backend}"
+            splitter = self.splitter.describe()
+            if dedup_threshold is not None:
+                splitter.append(f"near-dedup-{dedup_threshold}")
+            return cache_key(model, chunk_size, chunk_overlap, splitter)
+        return self._lazy("index_key", make)
+
+    @property
+    def chunk_index(self):
+        return self._lazy("chunk_index", self._build_index)
+
+    @property
+    def faiss_index(self):
+        return self.chunk_index.index
+
+    @property
+    def chunks(self):
+        return self.chunk_index.chunks
+
+    @property
+    def chunk_by_id(self):
+        return self.chunk_index.chunk_by_id
+
+    @property
+    def bm25(self):
+        """BM25 inverted index over the unique chunks, keyed by the same ids as FAISS."""
+        def make():
+            from sparse_index import BM25Index
+            chunk_by_id = self.chunk_index.chunk_by_id
+            return BM25Index(list(chunk_by_id.values()), ids=list(chunk_by_id))
+        return self._lazy("bm25", make)
+
+    @property
+    def embedding_rows(self):
+        """Chunk id -> row of chunk_index.embeddings (single-document index)."""
+        def make():
+            return {int(i): r for r, i in enumerate(self.chunk_index.ids.tolist())}
+        return self._lazy("embedding_rows", make)
+
+    def chunk_vectors(self, chunks) -> np.ndarray:
+        """
+        Embeddings of the given chunk texts, taken from the index cache when
+        they are indexed there and encoded otherwise (e.g. corpus mode).
+        """
+        from index_cache import chunk_id
+
+        rows = {} if corpus_index_dir else self.embedding_rows
+        found = [rows.get(chunk_id(c)) for c in chunks]
+        missing = [i for i, r in enumerate(found) if r is None]
+        out = np.empty((len(chunks), self.embedder.get_sentence_embedding_dimension()), dtype="float32")
+        if len(missing) < len(chunks):
+            have = [i for i, r in enumerate(found) if r is not None]
+            out[have] = self.chunk_index.embeddings[[found[i] for i in have]]
+        if missing:
+            out[missing] = self.embedder.encode([chunks[i] for i in missing], show_progress_bar=False)
+        return out
+
+    @property
+    def token_counter(self):
+        def make():
+            from context_packer import make_token_counter
+            return make_token_counter(llm_model, fallback_tokenizer=self.embedder.tokenizer)
+        return self._lazy("token_counter", make)
+
+    @property
+    def corpus(self):
+        def make():
+            from corpus import ShardedIndex
+            corpus = ShardedIndex(corpus_index_dir, search_params={"nprobe": nprobe, "ef_search": ef_search})
+            print(f"✅ Loaded corpus index {corpus_index_dir}: {len(corpus.shards)} shards, "
+                  f"{corpus.ntotal} vectors.")
+            return corpus
+        return self._lazy("corpus", make)
+
+    @property
+    def doc_sources(self):
+        """Chunk id -> SourceChunk (document and offsets) for the single-document index."""
+        def make():
+            from corpus import SourceChunk
+            from index_cache import chunk_id
+            text = self.text
+            sources = {}
+            for start, end in self.splitter.spans(text).tolist():
+                chunk = text[start:end]
+                sources.setdefault(chunk_id(chunk), SourceChunk(chunk, self.doc_path, start, end))
+            return sources
+        return self._lazy("doc_sources", make)
+
+    def search(self, q_arr: np.ndarray, k: int):
+        """
+        Search the active index (corpus shards or the single document).
+
+        Returns:
+            List[List[tuple]]: Per query, (SourceChunk, distance) hits in rank
+            order; distances ascend for both metrics (1 - cosine for "ip").
+        """
+        if corpus_index_dir:
+            corpus = self.corpus
+            with span("search"):
+                D, I = corpus.search(q_arr, k)
+            lookup = corpus.records
+        else:
+            from ann_index import search
+            index = self.chunk_index.index
+            with span("search"):
+                D, I = search(index, q_arr, k)  # distances, chunk ids
+            lookup = self.doc_sources
 
-def retrieve_chunks(question: str, k: int = top_k) -> List[str]:
+        # Map ids back to chunks (-1 marks an unfilled slot)
+        return [
+            [(lookup[i], d) for i, d in zip(ids, dists) if i in lookup]
+            for ids, dists in zip(I.tolist(), D.tolist())
+        ]
+
+    def search_sparse(self, questions, k: int):
+        """
+        BM25 search of the single-document index.
+
+        Returns:
+            List[List[tuple]]: Per question, (SourceChunk, BM25 score) hits in rank order.
+        """
+        bm25, lookup = self.bm25, self.doc_sources
+        results = []
+        for question in questions:
+            with span("search.bm25"):
+                scores, ids = bm25.search(question, k)
+            results.append([(lookup[i], s) for i, s in zip(ids.tolist(), scores.tolist()) if i in lookup])
+        return results
+
+    def index_version(self) -> str:
+        """
+        Identifies the current index and answer settings (_answer_settings());
+        cached answers are dropped when it changes.
+        """
+        if corpus_index_dir:
+            index = self.corpus.version()
+        else:
+            index = f"{self.index_key}:{self.chunk_index.doc_hash}"
+        return f"{index}:{_answer_settings()}"
+
+    @property
+    def answer_cache(self):
+        def make():
+            from answer_cache import AnswerCache
+            return AnswerCache(
+                answer_cache_path,
+                self.index_version(),
+                max_entries=answer_cache_size,
+                ttl_seconds=answer_cache_ttl,
+                similarity_threshold=answer_cache_threshold,
+            )
+        cache = self._lazy("answer_cache", make)
+        # Settings changed since the cache was opened (e.g. top_m set at runtime)
+        version = self.index_version()
+        if cache.index_version != version:
+            cache.invalidate(version)
+        return cache
+
+    def refresh_index(self, path: str = None) -> tuple[int, int]:
+        """
+        Re-read the document and update the index and `chunks` in place,
+        embedding only chunks that are new since the last build.
+
+        Returns:
+            tuple: (vectors added, vectors removed)
+        """
+        from index_cache import text_hash
+
+        if corpus_index_dir:
+            raise RuntimeError("A corpus index is read-only here; re-run `python corpus.py ingest`.")
+
+        path = path or self.doc_path
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        self._values["text"] = text
+
+        chunk_index = self.chunk_index
+        doc_hash = text_hash(text)
+        if doc_hash == chunk_index.doc_hash:
+            return 0, 0
+
+        # Non-flat backends replace chunk_index.index; faiss_index follows it
+        added, removed = chunk_index.sync(self._split_chunks(text), self._encode_chunks, doc_hash)
+        for name in ("doc_sources", "bm25", "embedding_rows"):
+            self._values.pop(name, None)
+        self.answer_cache.invalidate(self.index_version())
+        try:
+            chunk_index.save(os.path.join(index_cache_dir, self.index_key))
+        except OSError as e:
+            print(f"⚠️ Could not write index cache: {e}")
+        print(f"✅ Re-indexed {path}: {added} chunks embedded, {removed} removed.")
+        return added, removed
+
+    def reset_index(self) -> None:
+        """
+        Forget the splitter, the index and everything derived from them, so
+        the next access rebuilds them from the current chunking parameters
+        (e.g. after changing chunk_size). Models and clients stay loaded.
+        """
+        for name in ("splitter", "index_key", "chunk_index", "doc_sources", "bm25",
+                     "embedding_rows", "answer_cache"):
+            self._values.pop(name, None)
+
+    def close(self) -> None:
+        """Shut down the embedding worker processes and the LLM connection pool, if started."""
+        pool = self._values.pop("embed_pool", None)
+        if pool is not None:
+            pool.close()
+        client = self._values.pop("client", None)
+        if client is not None:
+            client.close()
+
+    # --- warm-up ---
+
+    def warm_up(self, background: bool = True):
+        """
+        Load the embedder, index (the corpus shards when corpus_index_dir is
+        set), reranker and client ahead of the first question. With background=True this runs on a daemon thread (which
+        is returned) so the caller can start accepting input immediately;
+        a question asked meanwhile just waits for the parts it needs.
+        """
+        def run():
+            try:
+                # Corpus mode searches the ingested shards, not DOC_PATH's index
+                if corpus_index_dir:
+                    names = ["embedder", "corpus", "reranker", "client"]
+                else:
+                    names = ["chunk_index", "reranker", "client"]
+                if hybrid_search and not corpus_index_dir:
+                    names.insert(1, "bm25")
+                if extractive_mode != "off" and extractive_model:
+                    names.append("qa_model")
+                if extractive_mode == "local":
+                    names.remove("client")
+                for name in names:
+                    getattr(self, name)
+            except Exception as e:
+                print(f"⚠️ Warm-up failed: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="rag-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+
+pipeline = RAGPipeline()
+atexit.register(pipeline.close)
+
+_PIPELINE_ATTRS = {
+    "embedder", "reranker", "client", "chunk_index", "faiss_index", "chunks",
+    "chunk_by_id", "text", "splitter", "index_key", "answer_cache", "bm25",
+}
+
+
+def __getattr__(name):
+    # Module-level access to lazily built state, e.g. RAG_app.faiss_index
+    if name in _PIPELINE_ATTRS:
+        return getattr(pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def refresh_index(path: str = DOC_PATH) -> tuple[int, int]:
     """
-    Encode the question, search the FAISS index for top-k neighbors,
-    and return the corresponding text chunks.
+    Re-read the document and update `faiss_index` and `chunks` in place,
+    embedding only chunks that are new since the last build.
 
-    Assumes the following exist in the global namespace:
-      - embedder: SentenceTransformer
-      - faiss_index: faiss.Index
-      - chunks: List[str]
-      - top_k: int (default used for k)
+    Returns:
+        tuple: (vectors added, vectors removed)
     """
-    # Encode query with the bi-encoder (no progress bar for interactivity)
-    q_vec = embedder.encode([question], show_progress_bar=False)
+    return pipeline.refresh_index(path)
+
+# --- Retrieve nearest chunks from FAISS ---
+from typing import List, Optional
+
+def encode_questions(questions: List[str]) -> np.ndarray:
+    """Encode questions with the bi-encoder into a float32 (n, dim) matrix."""
+    # No progress bar for interactivity
+    embedder = pipeline.embedder
+    with span("encode"):
+        q_vecs = embedder.encode(questions, batch_size=encode_batch_size, show_progress_bar=False)
 
     # Convert to float32 NumPy array for FAISS
-    q_arr = np.array(q_vec, dtype="float32")
+    return np.array(q_vecs, dtype="float32").reshape(len(questions), -1)
+
+def retrieve_chunks_batch(
+    questions: List[str],
+    k: int = top_k,
+    q_arr: Optional[np.ndarray] = None,
+    with_distances: bool = False,
+    with_sources: bool = False,
+):
+    """
+    Encode all questions in one call and search FAISS with the whole query
+    matrix at once, returning the top-k chunks for each question.
+    Pass `q_arr` to reuse embeddings that were already computed.
+
+    With hybrid_search, BM25 and FAISS each return hybrid_depth hits, which
+    are fused with reciprocal rank fusion and cut to k; there are no FAISS
+    distances for fused lists, so their distance list is None.
+
+    Returns:
+        List[List[str]] (List[List[SourceChunk]] with with_sources=True),
+        or (chunk lists, distance lists) with with_distances=True.
+    """
+    if q_arr is None:
+        q_arr = encode_questions(questions)
+
+    hybrid = hybrid_search and not corpus_index_dir
+    if hybrid:
+        from sparse_index import reciprocal_rank_fusion
+        dense = pipeline.search(q_arr, max(k, hybrid_depth))
+        sparse = pipeline.search_sparse(questions, max(k, hybrid_depth))
+        hit_lists = [
+            [(src, None) for src, _ in reciprocal_rank_fusion(
+                [[s for s, _ in d], [s for s, _ in sp]], rrf_k, limit=k)]
+            for d, sp in zip(dense, sparse)
+        ]
+    else:
+        # Search FAISS for the top-k nearest neighbors of every query
+        hit_lists = pipeline.search(q_arr, k)
 
-    # Search FAISS for the top-k nearest neighbors
-    D, I = faiss_index.search(q_arr, k)  # distances, indices
+    chunk_lists, distance_lists = [], []
+    for hits in hit_lists:
+        chunk_lists.append([src if with_sources else src.text for src, _ in hits])
+        distance_lists.append(None if hybrid else [d for _, d in hits])
 
-    # Map indices back to text chunks
-    idxs = I[0].tolist()
-    return [chunks[i] for i in idxs if 0 <= i < len(chunks)]
+    if with_distances:
+        return chunk_lists, distance_lists
+    return chunk_lists
+
+def retrieve_chunks(
+    question: str,
+    k: int = top_k,
+    q_vec: Optional[np.ndarray] = None,
+    with_distances: bool = False,
+    with_sources: bool = False,
+):
+    """
+    Encode the question, search the FAISS index for top-k neighbors,
+    and return the corresponding text chunks.
+
+    Uses the lazily loaded state of `pipeline`:
+      - embedder: SentenceTransformer
+      - faiss_index: faiss.IndexIDMap keyed by chunk id (or the corpus
+        shards when corpus_index_dir is set)
+    and top_k (default used for k).
+
+    Pass `q_vec` to reuse an embedding of the question computed elsewhere;
+    with_sources=True returns SourceChunk(text, doc_id, start, end) items so
+    answers can cite their origin; with_distances=True returns
+    (chunks, FAISS distances).
+    """
+    q_arr = None if q_vec is None else np.asarray(q_vec, dtype="float32").reshape(1, -1)
+    result = retrieve_chunks_batch([question], k, q_arr, with_distances, with_sources)
+    if with_distances:
+        return result[0][0], result[1][0]
+    return result[0]
 
 # --- Cross-encoder re-ranking ---
 import re
 from typing import List
-from sentence_transformers import CrossEncoder
 
-# Initialize the cross-encoder reranker (uses the name defined earlier)
-reranker = CrossEncoder(cross_encoder_name)
+from rerank_cascade import CascadeStats, ScoreCache, plan_rerank
+
+score_cache = ScoreCache(rerank_cache_size)
+cascade_stats = CascadeStats()
 
 def dedupe_preserve_order(items: List[str]) -> List[str]:
     """Remove exact duplicates while preserving first occurrence."""
@@ -137,30 +711,94 @@ def _normalize_ws(s: str) -> str:
     """Normalize whitespace to reduce near-duplicates."""
     return re.sub(r"\s+", " ", s).strip()
 
-def rerank_chunks(question: str, candidate_chunks: List[str], m: int = top_m) -> List[str]:
+def _select_top(cleaned: List[str], scores, m: int) -> List[str]:
+    """Sort cleaned chunks by cross-encoder score (desc), keep m, dedupe."""
+    ranked = sorted(zip(cleaned, scores), key=lambda x: x[1], reverse=True)[:m]
+    selected = [c for c, _ in ranked]
+
+    # Light dedupe to avoid repeats
+    return dedupe_preserve_order(selected)
+
+def _score_pairs(pairs: List[tuple]) -> List[float]:
+    """Cross-encoder scores for pairs, predicting only those not in score_cache."""
+    keys = [ScoreCache.key(q, c) for q, c in pairs]
+    scores = [score_cache.get(key) for key in keys] if rerank_cache_size else [None] * len(pairs)
+
+    missing = [i for i, score in enumerate(scores) if score is None]
+    if missing:
+        reranker = pipeline.reranker
+        with span("rerank"):
+            predicted = reranker.predict([pairs[i] for i in missing], batch_size=rerank_batch_size)
+        for i, score in zip(missing, predicted):
+            scores[i] = float(score)
+            if rerank_cache_size:
+                score_cache.put(keys[i], scores[i])
+    return scores
+
+def rerank_chunks_batch(
+    questions: List[str],
+    candidate_lists: List[List[str]],
+    m: int = top_m,
+    distance_lists: Optional[List[List[float]]] = None,
+) -> List[List[str]]:
     """
-    Score (question, chunk) pairs with a cross-encoder and return the best m.
+    Rerank the candidates of many questions with a single cross-encoder call:
+    all (question, chunk) pairs are flattened into large predict() batches
+    and the scores are split back per question.
 
-    Notes:
-      - Does NOT re-encode with the bi-encoder; only uses the cross-encoder for scoring.
-      - Assumes cross_encoder_name and top_m are already defined in the program.
+    With FAISS `distance_lists` and rerank_cascade_margin set, each question
+    may skip the cross-encoder or score only its leading candidates.
     """
+    if distance_lists is None:
+        distance_lists = [None] * len(questions)
+
     # Normalize to avoid scoring redundant near-duplicates
-    cleaned = [_normalize_ws(c) for c in candidate_chunks if c and c.strip()]
+    cleaned_lists, plans = [], []
+    for candidates, dists in zip(candidate_lists, distance_lists):
+        margin = rerank_cascade_margin if dists is not None else None
+        if dists is None:
+            dists = [0.0] * len(candidates)
+        kept = [(_normalize_ws(c), d) for c, d in zip(candidates, dists) if c and c.strip()]
+        cleaned = [c for c, _ in kept]
+        path, n = plan_rerank([d for _, d in kept], m, margin)
+        cascade_stats.record(path, 0 if path == "skip" else n, len(cleaned))
+        cleaned_lists.append(cleaned)
+        plans.append((path, n))
 
-    if not cleaned:
-        return []
+    pairs = [
+        (q, c)
+        for q, cleaned, (path, n) in zip(questions, cleaned_lists, plans)
+        if path != "skip"
+        for c in cleaned[:n]
+    ]
+    scores = _score_pairs(pairs) if pairs else []  # higher = more relevant
 
-    # Create pairs and score
-    pairs = [(question, c) for c in cleaned]
-    scores = reranker.predict(pairs)  # higher = more relevant
+    results, start = [], 0
+    for cleaned, (path, n) in zip(cleaned_lists, plans):
+        if path == "skip":
+            # FAISS order is trusted; keep the best m as retrieved
+            results.append(dedupe_preserve_order(cleaned[:n]))
+            continue
+        end = start + len(cleaned[:n])
+        results.append(_select_top(cleaned[:n], scores[start:end], m))
+        start = end
+    return results
 
-    # Sort by score (desc) and select top m
-    ranked = sorted(zip(cleaned, scores), key=lambda x: x[1], reverse=True)[:m]
-    selected = [c for c, _ in ranked]
+def rerank_chunks(
+    question: str,
+    candidate_chunks: List[str],
+    m: int = top_m,
+    distances: Optional[List[float]] = None,
+) -> List[str]:
+    """
+    Score (question, chunk) pairs with a cross-encoder and return the best m.
 
-    # Light dedupe to avoid repeats
-    return dedupe_preserve_order(selected)
+    Notes:
+      - Does NOT re-encode with the bi-encoder; only uses the cross-encoder for scoring.
+      - Assumes cross_encoder_name and top_m are already defined in the program.
+      - Pass the FAISS `distances` of the candidates to enable the cascade.
+    """
+    return rerank_chunks_batch([question], [candidate_chunks], m, [distances])[0]
 
 
 # --- Q&A with OpenAI Chat Completions ---
@@ -184,30 +822,352 @@ Answer:"""
     return system_prompt, user_prompt
 
 
-def answer_question(question: str) -> str:
-    """
-    Retrieve candidate chunks, re-rank them, and synthesize an answer
-    using the OpenAI Chat Completions API.
-    """
-    candidates = retrieve_chunks(question)
-    relevant_chunks = rerank_chunks(question, candidates, m=top_m)
+def _completion_args(question: str, relevant_chunks: List[str]) -> dict:
+    """Keyword arguments for chat.completions.create(), shared by the sync and async paths."""
     context = "\n\n".join(relevant_chunks)
     system_prompt, user_prompt = _build_qa_prompts(question, context)
-
-    # UPDATED: new client-based call
-    resp = client.chat.completions.create(
-        model="gpt-5",
+    return dict(
+        model=llm_model,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user",   "content": user_prompt},
         ],
         max_completion_tokens=500,
     )
+
+
+def _complete(question: str, relevant_chunks: List[str]) -> str:
+    """Ask the chat model to answer `question` from the selected chunks."""
+    client = pipeline.client
+    with span("llm"):
+        resp = client.complete(**_completion_args(question, relevant_chunks))
     return resp.choices[0].message.content.strip()
 
 
+# --- Context packing ---
+
+def build_context(q_vec: np.ndarray, sources: list, relevant: List[str]) -> List[str]:
+    """
+    Turn the reranked chunks into the context passages for the prompt:
+    MMR order, overlapping chunks merged via their offsets, capped at
+    context_token_budget. Returns `relevant` unchanged when packing is off.
+
+    Args:
+        q_vec (np.ndarray): Question embedding.
+        sources (list): Retrieved SourceChunks the reranked texts came from.
+        relevant (List[str]): Reranked chunk texts (whitespace-normalized), best first.
+    """
+    if not context_packing or not relevant:
+        return relevant
+    from context_packer import pack_context
+
+    by_text = {}
+    for src in sources:
+        by_text.setdefault(_normalize_ws(src.text), src)
+    chosen = [by_text[t] for t in relevant if t in by_text]
+    vectors, count_tokens = pipeline.chunk_vectors([s.text for s in chosen]), pipeline.token_counter
+    with span("context"):
+        packed = pack_context(q_vec, chosen, vectors, context_token_budget, count_tokens, mmr_lambda)
+    if context_log:
+        print(f"📊 Context: {len(chosen)} chunks → {len(packed.passages)} passages, "
+              f"{packed.tokens} prompt tokens ({packed.saved} saved of {packed.naive_tokens})")
+    return packed.passages
+
+
+# --- Extractive answers ---
+from extractive import ExtractiveStats, extract_sentence, extract_span
+
+extractive_stats = ExtractiveStats()
+
+
+def extract_answer(question: str, relevant_chunks: List[str]):
+    """
+    The best sentence (or, with extractive_model, QA span) for `question`
+    in the first extractive_chunks reranked chunks.
+
+    Returns:
+        extractive.Extraction: text and confidence (0..1), or None for empty chunks.
+    """
+    with span("extract"):
+        if extractive_model:
+            return extract_span(question, relevant_chunks, pipeline.qa_model, extractive_chunks)
+        return extract_sentence(question, relevant_chunks, _score_pairs, extractive_chunks)
+
+
+def _local_answer(question: str, relevant_chunks: List[str]) -> Optional[str]:
+    """The extracted answer when extractive_mode allows serving it without the LLM, else None."""
+    if extractive_mode == "off":
+        return None
+    found = extract_answer(question, relevant_chunks)
+    if found is None:
+        return "I don't know." if extractive_mode == "local" else None
+    if extractive_mode == "local" or found.confidence >= extractive_threshold:
+        return found.text
+    return None
+
+
+# --- Answer cache ---
+import hashlib
+import json
+
+
+def _answer_settings() -> str:
+    """
+    Short hash of every setting between the index and the answer text:
+    retrieval, reranking, context packing, extractive mode and the chat
+    request itself (model, prompts, token limit).
+    """
+    settings = {
+        "retrieval": [top_k, index_backend, index_metric, nprobe, ef_search, hybrid_search, hybrid_depth, rrf_k],
+        "rerank": [cross_encoder_name, model_backend, top_m, rerank_cascade_margin],
+        "context": [context_packing, context_token_budget, mmr_lambda],
+        "extractive": [extractive_mode, extractive_threshold, extractive_chunks, extractive_model],
+        "completion": _completion_args("{question}", ["{context}"]),
+    }
+    blob = json.dumps(settings, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def _prepare_answer(question: str):
+    """
+    Check both cache levels (pipeline.answer_cache) and, on a miss, retrieve and rerank reusing the
+    query embedding computed for the semantic lookup, then try a local extractive answer.
+
+    Returns:
+        tuple: (answer or None, where it came from ("cache" / "local" / None),
+        query embedding, relevant chunks for the LLM)
+    """
+    answer_cache = pipeline.answer_cache
+    with span("cache"):
+        cached = answer_cache.get_exact(question)
+    if cached is not None:
+        return cached, "cache", None, []
+
+    q_vec = encode_questions([question])[0]
+    with span("cache"):
+        cached = answer_cache.get_similar(q_vec)
+    if cached is not None:
+        return cached, "cache", q_vec, []
+
+    sources, distances = retrieve_chunks(question, q_vec=q_vec, with_distances=True, with_sources=True)
+    relevant = rerank_chunks(question, [s.text for s in sources], m=top_m, distances=distances)
+    local = _local_answer(question, relevant)
+    if local is not None:
+        return local, "local", q_vec, []
+    return None, None, q_vec, build_context(q_vec, sources, relevant)
+
+
+def answer_question(question: str) -> str:
+    """
+    Retrieve candidate chunks, re-rank them, and synthesize an answer
+    using the OpenAI Chat Completions API. Repeated or near-identical
+    questions are served from the answer cache; with extractive_mode on,
+    confident extractive answers are served without the LLM.
+    """
+    t0 = time.perf_counter()
+    with span("answer"):
+        answer, path, q_vec, relevant_chunks = _prepare_answer(question)
+        if answer is None:
+            answer, path = _complete(question, relevant_chunks), "llm"
+            pipeline.answer_cache.put(question, q_vec, answer)
+    extractive_stats.record(path, time.perf_counter() - t0)
+    return answer
+
+
+def answer_questions(questions: List[str]) -> List[str]:
+    """
+    Batch version of answer_question() for offline evaluation jobs.
+
+    Both answer cache levels are checked first. The remaining questions
+    are encoded in one call, searched with one FAISS query matrix and
+    reranked in large cross-encoder batches; the chat completions then run
+    `llm_workers` at a time, for the questions extractive_mode does not
+    answer locally, and their answers are cached. Retrieval and reranking
+    give the same chunks as calling answer_question() per item.
+
+    extractive_stats records every answer's path; the latency recorded is
+    the batch's time per question.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not questions:
+        return []
+
+    t0 = time.perf_counter()
+    answer_cache = pipeline.answer_cache
+    with span("cache"):
+        answers = [answer_cache.get_exact(q) for q in questions]
+    paths = ["cache" if answer is not None else None for answer in answers]
+
+    todo = [i for i, answer in enumerate(answers) if answer is None]
+    if todo:
+        q_arr = encode_questions([questions[i] for i in todo])
+        with span("cache"):
+            for i, q_vec in zip(todo, q_arr):
+                answers[i] = answer_cache.get_similar(q_vec)
+                if answers[i] is not None:
+                    paths[i] = "cache"
+        keep = [j for j, i in enumerate(todo) if answers[i] is None]
+        todo, q_arr = [todo[j] for j in keep], q_arr[keep]
+
+    if todo:
+        todo_questions = [questions[i] for i in todo]
+        source_lists, distance_lists = retrieve_chunks_batch(
+            todo_questions, q_arr=q_arr, with_distances=True, with_sources=True)
+        relevant_lists = rerank_chunks_batch(
+            todo_questions, [[s.text for s in sources] for sources in source_lists], m=top_m,
+            distance_lists=distance_lists)
+
+        llm = []  # positions in todo
+        for j, (question, relevant) in enumerate(zip(todo_questions, relevant_lists)):
+            answers[todo[j]] = _local_answer(question, relevant)
+            if answers[todo[j]] is None:
+                llm.append(j)
+            else:
+                paths[todo[j]] = "local"
+        contexts = [build_context(q_arr[j], source_lists[j], relevant_lists[j]) for j in llm]
+
+        with ThreadPoolExecutor(max_workers=llm_workers) as pool:
+            for j, answer in zip(llm, pool.map(_complete, [todo_questions[j] for j in llm], contexts)):
+                answers[todo[j]], paths[todo[j]] = answer, "llm"
+                answer_cache.put(todo_questions[j], q_arr[j], answer)
+
+    per_question = (time.perf_counter() - t0) / len(questions)
+    for path in paths:
+        extractive_stats.record(path, per_question)
+    return answers
+
+
+# --- Streaming answers ---
+from typing import Iterator
+
+
+def stream_answer(question: str, timings: Optional[dict] = None) -> Iterator[str]:
+    """
+    Like answer_question(), but yield the answer piece by piece as the chat
+    completion streams in instead of waiting for all of it.
+
+    If a `timings` dict is passed it is filled with seconds measured from the
+    call: "retrieval_s" (cache lookup, retrieval and reranking), "ttft_s"
+    (time to first token) and "total_s" (last token).
+    """
+    timings = {} if timings is None else timings
+    t0 = time.perf_counter()
+
+    answer, path, q_vec, relevant_chunks = _prepare_answer(question)
+    timings["retrieval_s"] = time.perf_counter() - t0
+    if answer is not None:
+        timings["ttft_s"] = timings["total_s"] = time.perf_counter() - t0
+        extractive_stats.record(path, timings["total_s"])
+        yield answer
+        return
+
+    stream = pipeline.client.stream(**_completion_args(question, relevant_chunks))
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if not parts:
+            timings["ttft_s"] = time.perf_counter() - t0
+        parts.append(delta)
+        yield delta
+
+    timings["total_s"] = time.perf_counter() - t0
+    timings.setdefault("ttft_s", timings["total_s"])
+    profiler.record("llm.ttft", timings["ttft_s"] - timings["retrieval_s"])
+    profiler.record("llm", timings["total_s"] - timings["retrieval_s"])
+    profiler.record("answer", timings["total_s"])
+    extractive_stats.record("llm", timings["total_s"])
+    pipeline.answer_cache.put(question, q_vec, "".join(parts).strip())
+
+
+# --- Async pipeline ---
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+_cpu_pool = None
+
+
+def _async_state():
+    """
+    Lazily create the CPU thread pool. (In-flight completions are capped
+    at llm_concurrency by the LLM client's complete_async().)
+    """
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="rag-cpu")
+    return _cpu_pool
+
+
+async def answer_question_async(question: str) -> str:
+    """
+    Async version of answer_question().
+
+    Retrieval and reranking are CPU-bound, so they run in a thread pool and
+    do not block the event loop; the chat completion uses the async OpenAI
+    client, with at most llm_concurrency requests in flight at once.
+    """
+    pool = _async_state()
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+
+    answer, path, q_vec, relevant_chunks = await loop.run_in_executor(pool, _prepare_answer, question)
+    if answer is not None:
+        extractive_stats.record(path, time.perf_counter() - t0)
+        return answer
+
+    with span("llm"):
+        resp = await pipeline.client.complete_async(**_completion_args(question, relevant_chunks))
+    answer = resp.choices[0].message.content.strip()
+    pipeline.answer_cache.put(question, q_vec, answer)
+    extractive_stats.record("llm", time.perf_counter() - t0)
+    return answer
+
+
+async def answer_questions_async(questions: List[str]) -> List[str]:
+    """Answer many questions concurrently; results are in input order."""
+    return await asyncio.gather(*(answer_question_async(q) for q in questions))
+
+
 # --- Interactive loop for Q&A ---
+def _print_streamed_answer(question: str) -> None:
+    """Print tokens as they arrive, then time-to-first-token and total latency."""
+    timings = {}
+    for i, piece in enumerate(stream_answer(question, timings)):
+        if i == 0:
+            print("Answer:", piece.lstrip(), end="", flush=True)
+        else:
+            print(piece, end="", flush=True)
+    print()
+    print(f"⏱️ first token {timings['ttft_s']:.2f}s "
+          f"(retrieval {timings['retrieval_s']:.2f}s), total {timings['total_s']:.2f}s")
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ask questions about Selected_Document.txt.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print answers token by token and report time to first token")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every pipeline stage; type 'profile' for p50/p95/p99 so far")
+    parser.add_argument("--profile-out", metavar="PATH",
+                        help="With --profile, write the histograms on exit (.json, else Prometheus text)")
+    parser.add_argument("--extractive", choices=("off", "auto", "local"), default=extractive_mode,
+                        help="Answer with a sentence of the context when confident (auto) or always (local, offline)")
+    parser.add_argument("--context-log", action="store_true",
+                        help="Print the prompt tokens context packing saved for every question")
+    args = parser.parse_args()
+    profiler.enabled = args.profile
+    extractive_mode = args.extractive
+    context_log = args.context_log
+
+    # Load models and the index in the background while the prompt is up
+    pipeline.warm_up(background=True)
+
     print("Enter 'exit' or 'quit' to end.")
     while True:
         try:
@@ -223,8 +1183,30 @@ if __name__ == "__main__":
         if not question:
             continue
 
+        if args.profile and question.lower() == "profile":
+            print(profiler.report())
+            continue
+
+        profiler.clear_last()
         try:
-            answer = answer_question(question)
-            print("Answer:", answer)
+            if args.stream:
+                _print_streamed_answer(question)
+            else:
+                answer = answer_question(question)
+                print("Answer:", answer)
         except Exception as e:
             print("⚠️ Error while answering:", e)
+        if args.profile:
+            print(f"⏱️ {profiler.last_report()}")
+
+    if rerank_cascade_margin is not None and sum(cascade_stats.paths.values()):
+        print(f"📊 {cascade_stats.report(score_cache)}")
+
+    if extractive_mode != "off" and sum(extractive_stats.paths.values()):
+        print(f"📊 {extractive_stats.report()}")
+
+    if args.profile:
+        print(f"📊 Stage latency:\n{profiler.report()}")
+        if args.profile_out:
+            profiler.dump(args.profile_out)
+            print(f"✅ Wrote profile to {args.profile_out}")
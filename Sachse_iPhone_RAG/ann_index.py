@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+ANN Index Factory
+-----------------
+Builds the FAISS index behind retrieve_chunks from a backend name:
+
+  - "flat":  IndexFlat, exact brute-force search (the original behavior with "l2")
+  - "fp16":  IndexScalarQuantizer storing float16 vectors (half the memory)
+  - "sq8":   IndexScalarQuantizer storing int8 codes (a quarter of the memory)
+  - "hnsw":  IndexHNSWFlat, graph search tuned with ef_search
+  - "ivf":   IndexIVFFlat, inverted lists tuned with nprobe
+  - "ivfpq": IndexIVFPQ, inverted lists over product-quantized codes
+
+Every backend takes a metric: "l2" ranks by Euclidean distance on the raw
+vectors; "ip" L2-normalizes vectors and queries and ranks by inner
+product, i.e. cosine similarity, which sentence-transformers models are
+trained for. search() hides the difference: it normalizes queries for IP
+indexes and always returns ascending distances (1 - cosine for IP).
+
+Trained backends are trained on the chunk embeddings themselves. Cluster
+and code-book sizes are clamped to what the number of vectors can support,
+so a small document still gets a valid (if not very useful) index.
+
+Run this file to print a recall@k, latency and memory report for every
+backend, measured against the exact IndexFlatL2 index.
+"""
+
+import argparse
+import math
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import faiss
+
+BACKENDS = ("flat", "fp16", "sq8", "hnsw", "ivf", "ivfpq")
+METRICS = ("l2", "ip")
+
+_SQ_TYPES = {"fp16": "QT_fp16", "sq8": "QT_8bit"}
+
+# FAISS k-means wants roughly this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def _default_nlist(n: int) -> int:
+    """~4*sqrt(n) inverted lists, capped so each list has enough training points."""
+    nlist = int(4 * math.sqrt(max(n, 1)))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(dim: int, wanted: int) -> int:
+    """Largest divisor of dim that is <= wanted (PQ needs dim % m == 0)."""
+    for m in range(min(wanted, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _faiss_metric(metric: str) -> int:
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+    return faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+
+
+def prepare_vectors(vectors: np.ndarray, metric: str = "l2") -> np.ndarray:
+    """
+    Vectors as FAISS wants them for `metric`: contiguous float32, and
+    L2-normalized (on a copy) for "ip".
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if metric == "ip" and len(vectors):
+        vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build_index(
+    embeddings: np.ndarray,
+    backend: str = "flat",
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    ef_construction: int = 40,
+    pq_m: int = 16,
+    pq_nbits: int = 8,
+    add: bool = True,
+    metric: str = "l2",
+) -> faiss.Index:
+    """
+    Create, train and fill a FAISS index for the given embeddings.
+
+    Args:
+        embeddings (np.ndarray): float32 matrix of shape (n, dim).
+        backend (str): One of BACKENDS.
+        nlist (int): IVF inverted lists (default: ~4*sqrt(n)).
+        hnsw_m (int): HNSW neighbors per node.
+        ef_construction (int): HNSW candidate list size while building.
+        pq_m (int): PQ sub-quantizers (rounded down to a divisor of dim).
+        pq_nbits (int): Bits per PQ code (reduced for tiny corpora).
+        add (bool): Add the embeddings after training; pass False to get an
+            empty (trained) index, e.g. to wrap in an IndexIDMap (then add
+            prepare_vectors(embeddings, metric) yourself).
+        metric (str): "l2" or "ip" (vectors are normalized for "ip").
+
+    Returns:
+        faiss.Index: Index containing all embeddings under ids 0..n-1, or
+        empty when add=False.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown index backend {backend!r}; expected one of {BACKENDS}")
+
+    faiss_metric = _faiss_metric(metric)
+    embeddings = prepare_vectors(embeddings, metric)
+    n, dim = embeddings.shape
+
+    # Nothing to train on yet: fall back to exact search
+    if n == 0 and backend in ("sq8", "ivf", "ivfpq"):
+        backend = "flat"
+
+    if backend == "flat":
+        index = faiss.IndexFlat(dim, faiss_metric)
+    elif backend in _SQ_TYPES:
+        qtype = getattr(faiss.ScalarQuantizer, _SQ_TYPES[backend])
+        index = faiss.IndexScalarQuantizer(dim, qtype, faiss_metric)
+        index.train(embeddings)  # int8: learns per-dimension ranges; fp16: no-op
+    elif backend == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss_metric)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        lists = max(1, min(nlist or _default_nlist(n), n))
+        quantizer = faiss.IndexFlat(dim, faiss_metric)
+        if backend == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, lists, faiss_metric)
+        else:
+            nbits = max(1, min(pq_nbits, int(math.log2(max(n // MIN_POINTS_PER_CENTROID, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, dim, lists, _pq_subquantizers(dim, pq_m), nbits, faiss_metric)
+        index.train(embeddings)
+
+    if add and n:
+        index.add(embeddings)
+    return index
+
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """
+    Apply query-time knobs to an index (also through wrappers like IndexIDMap).
+    Knobs that do not apply to the index type are ignored.
+    """
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+        if value is None:
+            continue
+        try:
+            params.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass
+
+
+def search(index: faiss.Index, queries: np.ndarray, k: int):
+    """
+    Search any index built here with raw query vectors.
+
+    Returns:
+        tuple: (distances, ids), each (n_queries, k), best first; distances
+        ascend for both metrics (1 - cosine similarity for IP indexes).
+    """
+    is_ip = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    D, I = index.search(prepare_vectors(queries, "ip" if is_ip else "l2"), k)
+    if is_ip:
+        D = 1.0 - D
+    return D, I
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """Serialized size of an index, a proxy for its memory footprint."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def benchmark_backends(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    k: int = 20,
+    configs: Optional[List[Dict]] = None,
+) -> List[Dict]:
+    """
+    Measure build time, memory, recall@k and per-query latency of each
+    config against exact IndexFlatL2 results on the raw vectors.
+
+    Args:
+        embeddings (np.ndarray): Vectors to index.
+        queries (np.ndarray): Query vectors.
+        k (int): Neighbors per query.
+        configs (List[Dict]): build_index()/set_search_params() kwargs,
+            each with a "backend" key. Defaults to a small sweep.
+
+    Returns:
+        List[Dict]: One row per config with build_s, mb, recall, ms_per_query.
+    """
+    if configs is None:
+        configs = [{"backend": "flat"}, {"backend": "flat", "metric": "ip"}]
+        configs += [{"backend": b, "metric": m} for b in ("fp16", "sq8") for m in METRICS]
+        configs += [{"backend": "hnsw", "ef_search": ef} for ef in (16, 64, 256)]
+        configs += [{"backend": "ivf", "nprobe": p} for p in (1, 8, 32)]
+        configs += [{"backend": "ivfpq", "nprobe": p} for p in (8, 32)]
+
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    k = min(k, len(embeddings))
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(np.ascontiguousarray(embeddings, dtype="float32"))
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for cfg in configs:
+        cfg = dict(cfg)
+        search_kw = {name: cfg.pop(name) for name in ("nprobe", "ef_search") if name in cfg}
+
+        t0 = time.perf_counter()
+        index = build_index(embeddings, **cfg)
+        build_s = time.perf_counter() - t0
+        set_search_params(index, **search_kw)
+
+        t0 = time.perf_counter()
+        _, found = search(index, queries, k)
+        search_s = time.perf_counter() - t0
+
+        hits = sum(len(set(f) & set(t)) for f, t in zip(found.tolist(), truth.tolist()))
+        rows.append({
+            "metric": "l2",
+            **cfg,
+            **search_kw,
+            "build_s": build_s,
+            "mb": index_bytes(index) / 2**20,
+            f"recall@{k}": hits / (k * len(queries)),
+            "ms_per_query": 1000 * search_s / len(queries),
+        })
+    return rows
+
+
+def print_report(rows: List[Dict]) -> None:
+    """
+    Print benchmark_backends() rows as an aligned table; memory and recall
+    changes are relative to the first row (the exact L2 flat index).
+    """
+    recall_key = next(key for key in rows[0] if key.startswith("recall@"))
+    base = rows[0]
+    print(f"{'backend':<8} {'metric':<6} {'params':<16} {'build s':>9} {'MB':>8} {'x smaller':>9} "
+          f"{recall_key:>10} {'Δ recall':>9} {'ms/query':>9}")
+    for row in rows:
+        params = " ".join(f"{name}={row[name]}" for name in ("nprobe", "ef_search") if name in row)
+        print(f"{row['backend']:<8} {row['metric']:<6} {params:<16} {row['build_s']:>9.3f} "
+              f"{row['mb']:>8.2f} {base['mb'] / max(row['mb'], 1e-9):>9.1f} "
+              f"{row[recall_key]:>10.3f} {row[recall_key] - base[recall_key]:>+9.3f} "
+              f"{row['ms_per_query']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of FAISS backends.")
+    parser.add_argument("--cache-entry", help="Index cache entry directory to take embeddings from")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use N random vectors instead (for large-corpus sizing)")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of query vectors")
+    parser.add_argument("-k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        embeddings = rng.standard_normal((args.synthetic, args.dim), dtype="float32")
+    elif args.cache_entry:
+        from index_cache import ChunkIndex
+        store = ChunkIndex.load(args.cache_entry)
+        if store is None:
+            parser.error(f"No readable index cache entry at {args.cache_entry}")
+        embeddings = store.embeddings
+    else:
+        parser.error("Pass --cache-entry DIR or --synthetic N")
+
+    # Queries: perturbed copies of indexed vectors, so neighbors are meaningful
+    picks = rng.choice(len(embeddings), size=min(args.queries, len(embeddings)), replace=False)
+    noise = rng.standard_normal((len(picks), embeddings.shape[1]), dtype="float32")
+    queries = embeddings[picks] + 0.1 * embeddings.std() * noise
+
+    print(f"📊 {len(embeddings)} vectors, dim {embeddings.shape[1]}, {len(queries)} queries")
+    print_report(benchmark_backends(embeddings, queries, k=args.k))
+
+
+if __name__ == "__main__":
+    main()
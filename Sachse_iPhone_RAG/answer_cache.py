@@ -0,0 +1,207 @@
+"""
+Answer Cache
+------------
+Two-level cache in front of answer_question():
+
+  1. Exact: keyed on the normalized question text (case and whitespace
+     folded), checked before any model work.
+  2. Semantic: compares the query embedding that retrieval computes anyway
+     against past questions and reuses the stored answer when the cosine
+     similarity reaches a threshold.
+
+Entries are evicted least-recently-used beyond `max_entries` and expire
+after `ttl_seconds`. They are persisted in SQLite and tagged with an index
+version; opening the cache with a different version (the document or the
+index parameters changed) drops every entry.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    q = re.sub(r"\s+", " ", question).strip().lower()
+    return q.rstrip(" ?!.")
+
+
+class AnswerCache:
+    """
+    LRU/TTL answer cache with exact and embedding-similarity lookups.
+
+    Args:
+        path (str): SQLite file for persistence (":memory:" to disable).
+        index_version (str): Identifier of the document index; a mismatch
+            with the persisted version clears the cache.
+        max_entries (int): LRU capacity.
+        ttl_seconds (float): Entry lifetime; None keeps entries forever.
+        similarity_threshold (float): Minimum cosine similarity for a
+            semantic hit; None disables the semantic level.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        index_version: str,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        similarity_threshold: Optional[float] = 0.95,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+        # key -> (answer, unit-norm embedding or None, created timestamp)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._matrix = None  # stacked embeddings for the semantic level
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT, embedding BLOB, created REAL, last_used REAL)"
+        )
+        self.index_version = index_version
+        self._load()
+
+    # --- persistence ---
+
+    def _load(self) -> None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+        if row is None or row[0] != self.index_version:
+            self._reset_db()
+            return
+
+        now = time.time()
+        rows = self._db.execute(
+            "SELECT key, answer, embedding, created FROM answers ORDER BY last_used"
+        ).fetchall()
+        for key, answer, blob, created in rows:
+            if self._expired(created, now):
+                continue
+            vec = np.frombuffer(blob, dtype="float32") if blob is not None else None
+            self._entries[key] = (answer, vec, created)
+        self._evict()
+        self._db.execute("DELETE FROM answers WHERE key NOT IN (%s)" % ",".join("?" * len(self._entries)),
+                         list(self._entries))
+        self._db.commit()
+
+    def _reset_db(self) -> None:
+        self._db.execute("DELETE FROM answers")
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('index_version', ?)", (self.index_version,)
+        )
+        self._db.commit()
+
+    def invalidate(self, index_version: str) -> None:
+        """Drop every entry and start over for a new index version."""
+        with self._lock:
+            self.index_version = index_version
+            self._entries.clear()
+            self._matrix = None
+            self._reset_db()
+
+    # --- eviction ---
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _evict(self) -> list:
+        dropped = []
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            dropped.append(key)
+        if dropped:
+            self._matrix = None
+        return dropped
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._matrix = None
+        self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+        self._db.commit()
+
+    def _touch(self, key: str) -> str:
+        self._entries.move_to_end(key)
+        self._db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        return self._entries[key][0]
+
+    # --- lookups ---
+
+    def get_exact(self, question: str) -> Optional[str]:
+        """Return the cached answer for an identical (normalized) question."""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[2], time.time()):
+                self._drop(key)
+                return None
+            self.stats["exact_hits"] += 1
+            return self._touch(key)
+
+    def get_similar(self, q_vec: np.ndarray) -> Optional[str]:
+        """
+        Return the answer of the most similar past question if its cosine
+        similarity with `q_vec` reaches the threshold; count a miss otherwise.
+        """
+        with self._lock:
+            if self.similarity_threshold is None or not self._entries:
+                self.stats["misses"] += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_keys = [k for k, e in self._entries.items() if e[1] is not None]
+                self._matrix = (np.stack([self._entries[k][1] for k in self._matrix_keys])
+                                if self._matrix_keys else np.empty((0, len(q_vec)), dtype="float32"))
+
+            q = np.asarray(q_vec, dtype="float32").ravel()
+            q = q / (np.linalg.norm(q) or 1.0)
+            if len(self._matrix) == 0:
+                self.stats["misses"] += 1
+                return None
+
+            sims = self._matrix @ q
+            best = int(np.argmax(sims))
+            key = self._matrix_keys[best]
+            if sims[best] < self.similarity_threshold or self._expired(self._entries[key][2], time.time()):
+                self.stats["misses"] += 1
+                return None
+            self.stats["semantic_hits"] += 1
+            return self._touch(key)
+
+    def put(self, question: str, q_vec: Optional[np.ndarray], answer: str) -> None:
+        """Store an answer under the normalized question and its embedding."""
+        key = normalize_question(question)
+        vec = None
+        if q_vec is not None:
+            vec = np.asarray(q_vec, dtype="float32").ravel()
+            vec = vec / (np.linalg.norm(vec) or 1.0)
+        now = time.time()
+
+        with self._lock:
+            self._entries[key] = (answer, vec, now)
+            self._entries.move_to_end(key)
+            self._matrix = None
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, embedding, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, answer, vec.tobytes() if vec is not None else None, now, now),
+            )
+            for dropped in self._evict():
+                self._db.execute("DELETE FROM answers WHERE key = ?", (dropped,))
+            self._db.commit()
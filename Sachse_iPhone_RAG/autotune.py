@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Autotune
+--------
+Sweeps chunk_size, chunk_overlap, top_k and top_m over a labeled question
+set and prints the Pareto frontier of latency, retrieval quality and
+prompt cost, so the settings at the top of RAG_app.py can be picked from
+measurements instead of guessed.
+
+For every configuration and question the sweep runs the path
+answer_question() takes up to the LLM call: encode the question, retrieve
+top_k chunks, rerank them to top_m and pack the context (build_context()).
+It records:
+
+  - p95_ms:        95th percentile of that path's wall time;
+  - recall:        share of questions whose final context contains the
+                   question's "expected" phrase (whitespace and case ignored);
+  - prompt_tokens: mean tokens of the chat prompt (system + user message).
+
+A configuration is on the frontier when no other one is at least as good on
+all three and better on one.
+
+Each chunking (chunk_size, chunk_overlap) is split, embedded and indexed
+once, through the index cache in index_cache_dir: a chunking that was
+indexed before, by RAG_app.py or an earlier sweep, is loaded instead of
+re-embedded, and every top_k / top_m combination reuses that one index.
+Per question, each top_k is retrieved and reranked once (its candidates and
+reranking cost differ), and every top_m is a prefix of that reranking.
+Chunkings are spread over spawned worker processes, each with its own
+models and torch threads, so latencies are comparable within one sweep;
+use --workers 1 for standalone numbers.
+
+Usage:
+    python autotune.py
+    python autotune.py --chunk-sizes 150 300 500 --overlaps 50 100 --top-k 10 20 --top-m 5 8 --workers 3
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bump when the report layout changes
+SCHEMA_VERSION = 1
+
+QUESTIONS_PATH = "benchmark_questions.json"
+
+# Lower is better for these, higher for recall
+OBJECTIVES = (("p95_ms", -1), ("recall", 1), ("prompt_tokens", -1))
+
+# RAG_app settings for every sweep: only the measured path runs, uncached
+SWEEP_SETTINGS = {
+    "answer_cache_path": ":memory:",
+    "answer_cache_size": 0,
+    "rerank_cache_size": 0,
+    "context_log": False,
+}
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def _init_worker(settings: dict, threads: int) -> None:
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    import RAG_app
+    for name, value in settings.items():
+        setattr(RAG_app, name, value)
+    # Load the models once per worker, outside any measurement
+    RAG_app.pipeline.embedder
+    RAG_app.pipeline.reranker
+
+
+def evaluate_chunking(
+    chunk_size: int,
+    chunk_overlap: int,
+    top_ks: Sequence[int],
+    top_ms: Sequence[int],
+    questions: List[Tuple[str, str]],
+    repeats: int = 2,
+) -> dict:
+    """
+    Measure every (top_k, top_m) combination for one chunking.
+
+    Args:
+        chunk_size (int): RAG_app.chunk_size for this run.
+        chunk_overlap (int): RAG_app.chunk_overlap for this run.
+        top_ks (Sequence[int]): Retrieval depths.
+        top_ms (Sequence[int]): Reranked chunks kept.
+        questions (List[Tuple[str, str]]): (question, expected phrase) pairs.
+        repeats (int): Timed passes over the questions (after one untimed pass).
+
+    Returns:
+        dict: chunking info ("chunks", "build_s") and one row per combination.
+    """
+    import RAG_app
+
+    RAG_app.chunk_size, RAG_app.chunk_overlap = chunk_size, chunk_overlap
+    pipeline = RAG_app.pipeline
+    pipeline.reset_index()
+    t0 = time.perf_counter()
+    chunk_index = pipeline.chunk_index
+    build_s = time.perf_counter() - t0
+    count_tokens = pipeline.token_counter
+
+    combos = [(k, m) for k in top_ks for m in top_ms]
+    seconds: Dict[tuple, List[float]] = {c: [] for c in combos}
+    hits = {c: 0 for c in combos}
+    candidate_hits = {k: 0 for k in top_ks}
+    tokens = {c: 0 for c in combos}
+    max_m = max(top_ms)
+
+    # The first pass is untimed (tokenizer and allocator warm-up) and supplies the quality numbers
+    for rep in range(repeats + 1):
+        for question, expected in questions:
+            gold = _squash(expected)
+            for k in top_ks:
+                t0 = time.perf_counter()
+                q_vec = RAG_app.encode_questions([question])[0]
+                sources, distances = RAG_app.retrieve_chunks(
+                    question, k, q_vec=q_vec, with_distances=True, with_sources=True)
+                # Best-first, so each top_m is a prefix of one reranking
+                relevant = RAG_app.rerank_chunks(question, [s.text for s in sources], m=max_m, distances=distances)
+                retrieve_s = time.perf_counter() - t0
+
+                if rep == 0:
+                    candidate_hits[k] += any(gold in _squash(s.text) for s in sources)
+                for m in top_ms:
+                    t1 = time.perf_counter()
+                    context = RAG_app.build_context(q_vec, sources, relevant[:m])
+                    elapsed = retrieve_s + time.perf_counter() - t1
+                    if rep:
+                        seconds[(k, m)].append(elapsed)
+                        continue
+                    hits[(k, m)] += any(gold in _squash(c) for c in context)
+                    messages = RAG_app._completion_args(question, context)["messages"]
+                    tokens[(k, m)] += sum(count_tokens(msg["content"]) for msg in messages)
+
+    n = len(questions)
+    rows = []
+    for k, m in combos:
+        ms = 1000 * np.asarray(seconds[(k, m)] or [0.0])
+        rows.append({
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "top_k": k,
+            "top_m": m,
+            "recall": hits[(k, m)] / n,
+            "candidate_recall": candidate_hits[k] / n,
+            "prompt_tokens": tokens[(k, m)] / n,
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+        })
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunks": len(chunk_index.chunks),
+        "build_s": build_s,
+        "rows": rows,
+    }
+
+
+def pareto_front(rows: List[dict], objectives=OBJECTIVES) -> List[dict]:
+    """Rows that no other row matches or beats on every objective and beats on one."""
+    def dominates(a, b):
+        better = False
+        for key, sign in objectives:
+            if sign * a[key] < sign * b[key]:
+                return False
+            better |= sign * a[key] > sign * b[key]
+        return better
+
+    return [r for r in rows if not any(dominates(o, r) for o in rows if o is not r)]
+
+
+def run_sweep(
+    questions: List[Tuple[str, str]],
+    chunk_sizes: Sequence[int],
+    overlaps: Sequence[int],
+    top_ks: Sequence[int],
+    top_ms: Sequence[int],
+    repeats: int = 2,
+    workers: Optional[int] = None,
+    settings: Optional[dict] = None,
+) -> dict:
+    """
+    Evaluate every combination, one chunking per task across `workers`
+    processes, and mark the Pareto-optimal rows.
+
+    Returns:
+        dict: JSON-serializable report ("chunkings", "rows" with a "pareto" flag).
+    """
+    chunkings = [(s, o) for s in chunk_sizes for o in overlaps if o < s]
+    if not chunkings:
+        raise ValueError("no chunking with chunk_overlap < chunk_size")
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus // 2, len(chunkings)))
+    threads = max(1, cpus // workers)
+    settings = {**SWEEP_SETTINGS, **(settings or {})}
+    args = (top_ks, top_ms, questions, repeats)
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        _init_worker(settings, 0)
+        results = [evaluate_chunking(s, o, *args) for s, o in chunkings]
+    else:
+        # spawn: forking a process that already initialized torch can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(settings, threads)) as pool:
+            futures = [pool.submit(evaluate_chunking, s, o, *args) for s, o in chunkings]
+            results = [f.result() for f in futures]
+    seconds = time.perf_counter() - t0
+
+    rows = [row for result in results for row in result.pop("rows")]
+    front = {id(r) for r in pareto_front(rows)}
+    for row in rows:
+        row["pareto"] = id(row) in front
+    return {
+        "schema": SCHEMA_VERSION,
+        "questions": len(questions),
+        "repeats": repeats,
+        "workers": workers,
+        "threads_per_worker": threads if workers > 1 else None,
+        "seconds": seconds,
+        "chunkings": results,
+        "rows": rows,
+    }
+
+
+def print_rows(rows: List[dict], current: tuple) -> None:
+    print(f"{'size':>6}{'overlap':>9}{'top_k':>7}{'top_m':>7}{'recall':>8}{'cand.':>7}"
+          f"{'tokens':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in rows:
+        key = (r["chunk_size"], r["chunk_overlap"], r["top_k"], r["top_m"])
+        mark = "  ← current" if key == current else ""
+        print(f"{r['chunk_size']:>6}{r['chunk_overlap']:>9}{r['top_k']:>7}{r['top_m']:>7}"
+              f"{r['recall']:>8.2f}{r['candidate_recall']:>7.2f}{r['prompt_tokens']:>8.0f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{mark}")
+
+
+def main():
+    import RAG_app
+
+    parser = argparse.ArgumentParser(description="Sweep chunking and retrieval depth; print the Pareto frontier.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH,
+                        help='JSON list of {"question": ..., "expected": phrase in the gold chunk}')
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[150, 300, 500, 800])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 20, 40])
+    parser.add_argument("--top-m", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--repeats", type=int, default=2, help="Timed passes over the question set")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: half the cores)")
+    parser.add_argument("--out", default="autotune_results.json", help="Where to write the JSON report")
+    parser.add_argument("--all", action="store_true", help="Print every configuration, not just the frontier")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [(q["question"], q["expected"]) for q in json.load(f)]
+
+    # The current configuration, and index / model settings the workers must share
+    current = (RAG_app.chunk_size, RAG_app.chunk_overlap, RAG_app.top_k, RAG_app.top_m)
+    settings = {"index_cache_dir": RAG_app.index_cache_dir, "model_backend": RAG_app.model_backend}
+
+    report = run_sweep(questions, args.chunk_sizes, args.overlaps, args.top_k, args.top_m,
+                       args.repeats, args.workers, settings)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+
+    print(f"📊 {len(report['rows'])} configurations, {len(questions)} questions, "
+          f"{report['workers']} workers, {report['seconds']:.1f}s")
+    for c in report["chunkings"]:
+        print(f"   chunk_size {c['chunk_size']:>4}, overlap {c['chunk_overlap']:>3}: "
+              f"{c['chunks']:>5} chunks, index ready in {c['build_s']:.2f}s")
+
+    rows = sorted(report["rows"], key=lambda r: (r["p95_ms"], -r["recall"], r["prompt_tokens"]))
+    front = [r for r in rows if r["pareto"]]
+    print(f"\n📊 Pareto frontier ({len(front)} of {len(rows)}; lower p95 and tokens, higher recall):")
+    print_rows(rows if args.all else front, current)
+    if not args.all and not any((r["chunk_size"], r["chunk_overlap"], r["top_k"], r["top_m"]) == current
+                                for r in front):
+        print("\n⚠️ The current configuration is not on the frontier:")
+        print_rows([r for r in rows if (r["chunk_size"], r["chunk_overlap"], r["top_k"], r["top_m"]) == current],
+                   current)
+    print(f"✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
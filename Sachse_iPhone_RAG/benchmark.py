@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark
+---------
+Reproducible end-to-end benchmark of RAG_app.py, meant to be run on every
+commit and diffed against the previous run.
+
+  1. Starts stub_llm_server.py on a background thread and points the OpenAI
+     client at it, so answers are deterministic and no API key is needed.
+  2. Builds the index for Selected_Document.txt from scratch in a temporary
+     cache directory and records build time and peak memory.
+  3. Retrieves and reranks a fixed gold question set
+     (benchmark_questions.json). The gold chunks of a question are those
+     containing its "expected" phrase (whitespace and case ignored), so the
+     gold set survives changes to the chunker.
+       - recall@k:    share of questions with a gold chunk among the top_k
+                      retrieved candidates
+       - precision@m: share of the top_m reranked chunks that are gold
+  4. Answers every question `--repeats` times through answer_question(),
+     with the answer and rerank caches disabled, and reports p50/p99 per
+     pipeline stage from the spans in profiling.py.
+
+The JSON report has sorted keys and rounded numbers so that two runs can be
+compared with `diff` or with --compare, which exits with status 1 when
+quality drops or a stage's p50 grows by more than --tolerance.
+
+Usage:
+    python benchmark.py --out baseline.json
+    python benchmark.py --out new.json --compare baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# Bump when the report layout changes, so --compare can refuse old files
+SCHEMA_VERSION = 1
+
+QUESTIONS_PATH = "benchmark_questions.json"
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def load_questions(path: str) -> List[dict]:
+    """Gold questions: a JSON list of {"question": ..., "expected": ...}."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _rounded(value, digits: int = 4):
+    if isinstance(value, float):
+        return round(value, digits)
+    if isinstance(value, dict):
+        return {k: _rounded(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rounded(v, digits) for v in value]
+    return value
+
+
+def _stage_table(summaries: Dict[str, dict]) -> Dict[str, dict]:
+    """profiler.to_json() rows in milliseconds."""
+    return {
+        name: {
+            "count": s["count"],
+            "mean_ms": 1000 * s["mean_s"],
+            "p50_ms": 1000 * s["p50_s"],
+            "p99_ms": 1000 * s["p99_s"],
+        }
+        for name, s in summaries.items()
+    }
+
+
+def run_benchmark(questions: List[dict], repeats: int = 3, llm_latency: float = 0.0) -> dict:
+    """
+    Run the benchmark in this process and return the report.
+
+    Args:
+        questions (List[dict]): Gold questions (see load_questions()).
+        repeats (int): Times every question is answered for the latency stats.
+        llm_latency (float): Seconds the stub LLM waits per request.
+
+    Returns:
+        dict: JSON-serializable report.
+    """
+    import stub_llm_server
+
+    stub = stub_llm_server.start_in_thread(port=0, latency=llm_latency, token_latency=0.0)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+
+    import RAG_app
+    from profiling import profiler
+
+    # Cold, isolated build; no cached answers or cross-encoder scores
+    cache_dir = tempfile.mkdtemp(prefix="rag-bench-")
+    RAG_app.index_cache_dir = cache_dir
+    RAG_app.answer_cache_path = ":memory:"
+    RAG_app.answer_cache_size = 0
+    RAG_app.rerank_cache_size = 0
+    RAG_app.context_log = False
+    pipeline = RAG_app.pipeline
+
+    try:
+        profiler.enabled = True
+        pipeline.embedder  # model loading is not part of the build time
+        profiler.reset()
+
+        t0 = time.perf_counter()
+        chunk_index = pipeline.chunk_index
+        build_s = time.perf_counter() - t0
+        index = {
+            "build_s": build_s,
+            "chunks": len(chunk_index.chunks),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages_ms": {name: row["mean_ms"] for name, row in _stage_table(profiler.to_json()).items()},
+        }
+
+        pipeline.warm_up(background=False)
+        texts = [q["question"] for q in questions]
+        expected = [_squash(q["expected"]) for q in questions]
+
+        # Quality: the candidates and reranked chunks answer_question() works from
+        profiler.enabled = False
+        q_arr = RAG_app.encode_questions(texts)
+        candidates = RAG_app.retrieve_chunks_batch(texts, k=RAG_app.top_k, q_arr=q_arr)
+        reranked = RAG_app.rerank_chunks_batch(texts, candidates, m=RAG_app.top_m)
+
+        per_question = []
+        for text, gold, cands, best in zip(texts, expected, candidates, reranked):
+            per_question.append({
+                "question": text,
+                "hit": any(gold in _squash(c) for c in cands),
+                "precision": sum(gold in _squash(c) for c in best) / RAG_app.top_m,
+            })
+        n = max(len(per_question), 1)
+        quality = {
+            f"recall@{RAG_app.top_k}": sum(q["hit"] for q in per_question) / n,
+            f"precision@{RAG_app.top_m}": sum(q["precision"] for q in per_question) / n,
+        }
+
+        # Latency: one untimed pass (tokenizers, first requests), then the measured ones
+        for text in texts:
+            RAG_app.answer_question(text)
+        profiler.enabled = True
+        profiler.reset()
+        for _ in range(repeats):
+            for text in texts:
+                RAG_app.answer_question(text)
+        stages = _stage_table(profiler.to_json())
+    finally:
+        profiler.enabled = False
+        stub.shutdown()
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "app": "Sachse_iPhone_RAG",
+        "config": {
+            "chunk_size": RAG_app.chunk_size,
+            "chunk_overlap": RAG_app.chunk_overlap,
+            "chunk_unit": RAG_app.chunk_unit,
+            "dedup_threshold": RAG_app.dedup_threshold,
+            "model_name": RAG_app.model_name,
+            "cross_encoder_name": RAG_app.cross_encoder_name,
+            "index_backend": RAG_app.index_backend,
+            "index_metric": RAG_app.index_metric,
+            "hybrid_search": RAG_app.hybrid_search,
+            "context_packing": RAG_app.context_packing,
+            "top_k": RAG_app.top_k,
+            "top_m": RAG_app.top_m,
+            "questions": len(questions),
+            "repeats": repeats,
+            "llm_latency_s": llm_latency,
+        },
+        "env": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "index": index,
+        "quality": quality,
+        "latency_ms": stages,
+        "peak_rss_mb": peak_rss_mb(),
+        "per_question": per_question,
+    }
+    return _rounded(report)
+
+
+# --- Comparison ---
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25) -> List[str]:
+    """
+    Print current vs baseline and return the regressions found: any drop
+    in a quality metric, or a build time or stage p50 more than
+    `tolerance` (relative) above the baseline. Growth below a small
+    absolute floor (50 ms of build time, 0.5 ms per stage) is timer noise
+    and never counts.
+    """
+    if baseline.get("schema") != current.get("schema"):
+        return [f"baseline schema {baseline.get('schema')} != {current.get('schema')}"]
+
+    # (name, baseline, current, allowed growth floor; None = higher is better)
+    rows = [(f"quality.{name}", baseline["quality"].get(name), value, None)
+            for name, value in current["quality"].items()]
+    rows.append(("index.build_s", baseline["index"]["build_s"], current["index"]["build_s"], 0.05))
+    rows += [(f"latency_ms.{name}.p50_ms", baseline["latency_ms"].get(name, {}).get("p50_ms"), s["p50_ms"], 0.5)
+             for name, s in current["latency_ms"].items()]
+
+    regressions = []
+    print(f"{'metric':<34}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, old, new, floor in rows:
+        if old is None:
+            print(f"{name:<34}{'-':>12}{new:>12.4f}{'new':>10}")
+            continue
+        change = (new - old) / old if old else 0.0
+        print(f"{name:<34}{old:>12.4f}{new:>12.4f}{change:>+10.1%}")
+        if floor is None and new < old:
+            regressions.append(f"{name} dropped from {old} to {new}")
+        elif floor is not None and change > tolerance and new - old > floor:
+            regressions.append(f"{name} grew {change:+.0%} ({old} -> {new})")
+    return regressions
+
+
+def print_summary(report: dict) -> None:
+    index = report["index"]
+    rss = f", peak RSS {index['peak_rss_mb']:.0f} MB" if index["peak_rss_mb"] is not None else ""
+    print(f"📊 Index: {index['chunks']} chunks built in {index['build_s']:.2f}s{rss}")
+    print("📊 " + ", ".join(f"{name} {value:.3f}" for name, value in report["quality"].items()))
+    print(f"{'stage':<18}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, s in report["latency_ms"].items():
+        print(f"{name:<18}{s['count']:>7}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end RAG benchmark with a stub LLM.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH,
+                        help='JSON list of {"question": ..., "expected": phrase in the gold chunk}')
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the question set")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the stub LLM waits per request")
+    parser.add_argument("--out", default="benchmark_results.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", metavar="BASELINE", help="Report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative growth of build time and stage p50 latencies")
+    args = parser.parse_args()
+
+    report = run_benchmark(load_questions(args.questions), args.repeats, args.llm_latency)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + "\n")
+    print_summary(report)
+    print(f"✅ Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
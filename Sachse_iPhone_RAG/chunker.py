@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Chunker
+-------
+Offset-based text chunker that replaces langchain's
+RecursiveCharacterTextSplitter in RAG_app.py.
+
+The old splitter was configured with separators ["", "\\n", " ", ""]; the
+leading empty separator split the document into single characters and
+merged them back, copying every character into about three chunk strings.
+Chunker instead:
+
+  - finds unit boundaries (whitespace-delimited words, or the tokens of the
+    embedder's tokenizer) and sentence ends in one vectorized pass over the
+    text;
+  - packs units into chunks with two pointers that only move forward: each
+    chunk ends at the last sentence end that fits (if that keeps it at least
+    half full, else at the last unit that fits) and the next chunk starts at
+    the first sentence (or unit) inside the overlap window;
+  - returns chunks as (start, end) character offsets into the original
+    text. Strings are only cut out by split_text(), when they are embedded.
+
+chunk_size and chunk_overlap count characters (unit="chars") or tokens
+(unit="tokens"). A single unit longer than chunk_size becomes its own chunk.
+
+Usage (benchmark against the langchain splitter on a ~10 MB document):
+    python chunker.py --bench --size-mb 10
+    python chunker.py --bench --size-mb 10 --tokens
+"""
+
+import argparse
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Characters that end a sentence when they end a unit
+_SENTENCE_END = np.array([ord(c) for c in ".!?"], dtype="uint32")
+_WHITESPACE = np.array([ord(c) for c in " \t\n\r\f\v\u00a0\u2009\u3000"], dtype="uint32")
+
+UNITS = ("chars", "tokens")
+
+
+def _codepoints(text: str) -> np.ndarray:
+    """The text as one uint32 code point per character (indices match str offsets)."""
+    return np.frombuffer(text.encode("utf-32-le"), dtype="uint32")
+
+
+def word_units(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(starts, ends) of the whitespace-delimited words in a code point array."""
+    # One bool pass per whitespace code point; np.isin would build int64 temporaries
+    is_word = np.ones(len(codes), dtype=bool)
+    for c in _WHITESPACE.tolist():
+        is_word &= codes != c
+    edges = np.diff(np.concatenate(([False], is_word, [False])).astype("int8"))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def token_units(text: str, tokenizer) -> Tuple[np.ndarray, np.ndarray]:
+    """(starts, ends) of the tokenizer's tokens, from its offset mapping."""
+    enc = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    offsets = np.asarray(enc["offset_mapping"], dtype="int64").reshape(-1, 2)
+    offsets = offsets[offsets[:, 1] > offsets[:, 0]]  # drop empty (special/byte) pieces
+    return offsets[:, 0], offsets[:, 1]
+
+
+def sentence_ends(codes: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Bool per unit: a sentence ends after it (the unit ends in . ! or ?, or a
+    newline separates it from the next unit). The last unit always ends one.
+    """
+    n = len(starts)
+    flags = np.zeros(n, dtype=bool)
+    if not n:
+        return flags
+    flags[:] = np.isin(codes[ends - 1], _SENTENCE_END)
+    newlines = np.flatnonzero(codes == 10)
+    flags[:-1] |= np.searchsorted(newlines, starts[1:]) > np.searchsorted(newlines, ends[:-1])
+    flags[-1] = True
+    return flags
+
+
+class Chunker:
+    """
+    Splits text into overlapping chunks on sentence and unit boundaries.
+
+    Args:
+        chunk_size (int): Maximum chunk length in characters or tokens.
+        chunk_overlap (int): Maximum overlap between consecutive chunks.
+        unit (str): "chars" (words measured in characters) or "tokens".
+        tokenizer: Hugging Face tokenizer with offset mapping (unit="tokens").
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int = 0, unit: str = "chars", tokenizer=None):
+        if unit not in UNITS:
+            raise ValueError(f"Unknown unit {unit!r}; expected one of {UNITS}")
+        if unit == "tokens" and tokenizer is None:
+            raise ValueError('unit="tokens" needs a tokenizer')
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap must be in [0, chunk_size)")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.unit = unit
+        self.tokenizer = tokenizer
+
+    def describe(self) -> List[str]:
+        """Settings that change the output, for index cache keys."""
+        return ["offset-chunker", self.unit]
+
+    def spans(self, text: str) -> np.ndarray:
+        """
+        Chunk `text`.
+
+        Returns:
+            np.ndarray: (n_chunks, 2) int64 array of (start, end) character offsets.
+        """
+        codes = _codepoints(text)
+        if self.unit == "tokens":
+            # Sizes count tokens: unit i covers positions [i, i + 1)
+            starts, ends = token_units(text, self.tokenizer)
+        else:
+            starts, ends = word_units(codes)
+
+        n = len(starts)
+        if not n:
+            return np.empty((0, 2), dtype="int64")
+
+        sent_end = sentence_ends(codes, starts, ends)
+        # Exclusive unit indices where a sentence ends / starts
+        end_marks = (np.flatnonzero(sent_end) + 1).tolist()
+        start_marks = [0] + end_marks[:-1]
+
+        # bisect over int64 memoryviews: O(log n) lookups per chunk without numpy
+        # call overhead or a copy of the offset arrays
+        starts = memoryview(np.ascontiguousarray(starts, dtype="int64"))
+        ends = memoryview(np.ascontiguousarray(ends, dtype="int64"))
+        if self.unit == "tokens":
+            pos_start, pos_end = range(n), range(1, n + 1)
+        else:
+            pos_start, pos_end = starts, ends
+        size, overlap = self.chunk_size, self.chunk_overlap
+        out = []
+        i = prev_end = 0
+        while True:
+            # Furthest unit end that keeps the chunk within size (at least one unit)
+            j = max(i + 1, bisect_right(pos_end, pos_start[i] + size))
+            end = j
+            if j < n:
+                # Prefer the last sentence end inside the window if it moves past the
+                # previous chunk and keeps this one at least half full
+                s = bisect_right(end_marks, j) - 1
+                if s >= 0 and end_marks[s] > max(i, prev_end) and \
+                        pos_end[end_marks[s] - 1] - pos_start[i] >= size // 2:
+                    end = end_marks[s]
+            out.append((starts[i], ends[end - 1]))
+            if end >= n:
+                break
+
+            # Next chunk starts inside the overlap window, at a sentence start if there is one
+            lo = min(end, max(i + 1, bisect_left(pos_start, pos_end[end - 1] - overlap)))
+            s = bisect_left(start_marks, lo)
+            i = start_marks[s] if s < len(start_marks) and start_marks[s] < end else lo
+            prev_end = end
+        return np.asarray(out, dtype="int64").reshape(-1, 2)
+
+    def split_text(self, text: str) -> List[str]:
+        """Chunk strings (drop-in for a langchain splitter's split_text)."""
+        return [text[s:e] for s, e in self.spans(text).tolist()]
+
+
+# --- Benchmark ---
+
+def _measure(fn):
+    """
+    Run fn twice: once timed, once under tracemalloc (which slows it down).
+
+    Returns:
+        tuple: (result, seconds, peak traced MB)
+    """
+    t0 = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - t0
+    del result
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark(text: str, chunk_size: int, chunk_overlap: int, tokenizer=None,
+              langchain_separators: Optional[List[str]] = None) -> List[dict]:
+    """Time (and trace peak memory of) Chunker and, if installed, the langchain splitter."""
+    unit = "tokens" if tokenizer is not None else "chars"
+    chunker = Chunker(chunk_size, chunk_overlap, unit, tokenizer)
+    rows = []
+
+    spans, secs, peak = _measure(lambda: chunker.spans(text))
+    rows.append({"splitter": f"Chunker.spans ({unit})", "chunks": len(spans), "seconds": secs, "peak_mb": peak})
+    chunks, secs, peak = _measure(lambda: chunker.split_text(text))
+    rows.append({"splitter": f"Chunker.split_text ({unit})", "chunks": len(chunks), "seconds": secs, "peak_mb": peak})
+
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        try:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+        except ImportError:
+            print("⚠️ langchain not installed; skipping RecursiveCharacterTextSplitter")
+            return rows
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+        separators=langchain_separators or ["", "\n", " ", ""],
+    )
+    chunks, secs, peak = _measure(lambda: splitter.split_text(text))
+    rows.append({"splitter": "RecursiveCharacterTextSplitter", "chunks": len(chunks), "seconds": secs, "peak_mb": peak})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offset-based chunker and splitter benchmark.")
+    parser.add_argument("--bench", action="store_true", help="Benchmark against the langchain splitter")
+    parser.add_argument("--doc", default="Selected_Document.txt", help="Text repeated to build the test document")
+    parser.add_argument("--size-mb", type=float, default=10.0)
+    parser.add_argument("--chunk-size", type=int, default=150)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--tokens", action="store_true", help="Size chunks with the embedder's tokenizer")
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+        return
+
+    with open(args.doc, "r", encoding="utf-8") as f:
+        base = f.read()
+    target = int(args.size_mb * 2**20)
+    text = (base * (target // max(len(base), 1) + 1))[:target]
+
+    tokenizer = None
+    if args.tokens:
+        import RAG_app
+        tokenizer = RAG_app.pipeline.embedder.tokenizer
+
+    print(f"📊 {len(text) / 2**20:.1f} MB document, chunk_size {args.chunk_size}, overlap {args.chunk_overlap}")
+    print(f"{'splitter':<34}{'chunks':>10}{'seconds':>10}{'peak MB':>10}")
+    for r in benchmark(text, args.chunk_size, args.chunk_overlap, tokenizer):
+        print(f"{r['splitter']:<34}{r['chunks']:>10}{r['seconds']:>10.2f}{r['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
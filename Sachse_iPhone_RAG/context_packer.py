@@ -0,0 +1,169 @@
+"""
+Context Packer
+--------------
+Builds the LLM context from the reranked chunks instead of joining all
+top_m of them. With chunk_overlap=100 and chunk_size=150, neighbouring
+chunks share about two thirds of their text, so a plain join pays for the
+same tokens several times.
+
+pack_context():
+
+  1. orders the candidates by maximal marginal relevance (MMR) over their
+     embeddings: each pick maximizes
+     lambda * sim(question, chunk) - (1 - lambda) * max sim(chunk, picked),
+     so near-duplicates of an already picked chunk fall behind;
+  2. adds them in that order while the context fits the token budget,
+     merging chunks that overlap or touch in the same document back into
+     one contiguous passage (using their character offsets), so shared
+     text is sent once. If the first pick alone is over the budget, it is
+     cut to fit rather than leaving the context empty;
+  3. returns the passages, most relevant first, plus the token counts of
+     the packed and the naive context.
+
+Tokens are counted with tiktoken for the chat model when it is installed,
+otherwise with the embedder's tokenizer.
+"""
+
+from typing import Callable, List, NamedTuple, Sequence
+
+import numpy as np
+
+
+class PackedContext(NamedTuple):
+    passages: List[str]
+    tokens: int        # tokens of the packed context
+    naive_tokens: int  # tokens of all candidates joined as before
+
+    @property
+    def saved(self) -> int:
+        return self.naive_tokens - self.tokens
+
+
+def make_token_counter(model: str, fallback_tokenizer=None) -> Callable[[str], int]:
+    """
+    Count tokens the way the chat model does (tiktoken), falling back to a
+    Hugging Face tokenizer and, without either, to a word count.
+    """
+    try:
+        import tiktoken
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(enc.encode(text, disallowed_special=()))
+    except ImportError:
+        pass
+    if fallback_tokenizer is not None:
+        return lambda text: len(fallback_tokenizer.encode(text, add_special_tokens=False))
+    return lambda text: len(text.split())
+
+
+def mmr_order(query_vec: np.ndarray, vectors: np.ndarray, lambda_: float = 0.7) -> List[int]:
+    """
+    Indices of `vectors` in maximal-marginal-relevance order (cosine
+    similarities; lambda_=1 is pure relevance, 0 pure diversity).
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    v = np.asarray(vectors, dtype="float32")
+    v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_vec, dtype="float32").ravel()
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+    relevance = v @ q
+    pairwise = v @ v.T
+    redundancy = np.full(n, -np.inf, dtype="float32")
+    remaining = list(range(n))
+    order = []
+    while remaining:
+        red = np.where(np.isfinite(redundancy[remaining]), redundancy[remaining], 0.0)
+        scores = lambda_ * relevance[remaining] - (1 - lambda_) * red
+        pick = remaining.pop(int(np.argmax(scores)))
+        order.append(pick)
+        redundancy = np.maximum(redundancy, pairwise[pick])
+    return order
+
+
+def merge_spans(chunks: Sequence) -> List[tuple]:
+    """
+    Merge chunks (anything with text, doc_id, start, end) that overlap or
+    touch within a document.
+
+    Returns:
+        List[tuple]: (doc_id, start, end, text, rank) passages in document
+        order, where rank is the smallest input position merged into it.
+    """
+    merged = []
+    order = sorted(range(len(chunks)), key=lambda i: (chunks[i].doc_id, chunks[i].start))
+    for i in order:
+        c = chunks[i]
+        if merged and merged[-1][0] == c.doc_id and c.start <= merged[-1][2]:
+            doc_id, start, end, text, rank = merged[-1]
+            if c.end > end:
+                text += c.text[end - c.start:]
+                end = c.end
+            merged[-1] = (doc_id, start, end, text, min(rank, i))
+        else:
+            merged.append((c.doc_id, c.start, c.end, c.text, i))
+    return merged
+
+
+def truncate_to_budget(text: str, budget: int, count_tokens: Callable[[str], int]) -> str:
+    """Longest prefix of `text` within `budget` tokens, cut at a word boundary when there is one."""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo < len(text):
+        space = text.rfind(" ", 0, lo + 1)
+        lo = space if space > 0 else lo
+    return text[:lo].rstrip()
+
+
+def pack_context(
+    query_vec: np.ndarray,
+    chunks: Sequence,
+    vectors: np.ndarray,
+    budget: int,
+    count_tokens: Callable[[str], int],
+    lambda_: float = 0.7,
+    separator: str = "\n\n",
+) -> PackedContext:
+    """
+    Select, merge and budget the context passages.
+
+    Args:
+        query_vec (np.ndarray): Question embedding.
+        chunks (Sequence): Reranked chunks with text, doc_id, start, end
+            (e.g. corpus.SourceChunk), best first.
+        vectors (np.ndarray): Embeddings of `chunks`, row-aligned.
+        budget (int): Maximum context tokens.
+        count_tokens (Callable): Token counter for the chat model.
+        lambda_ (float): MMR relevance/diversity trade-off.
+        separator (str): Joins the passages in the prompt.
+
+    Returns:
+        PackedContext: Passages (most relevant first) and token counts.
+    """
+    naive_tokens = count_tokens(separator.join(c.text for c in chunks))
+
+    picked, passages, tokens = [], [], 0
+    for i in mmr_order(query_vec, vectors, lambda_):
+        # Most relevant passage first: by the earliest MMR pick it contains
+        trial = sorted(merge_spans(picked + [chunks[i]]), key=lambda p: p[4])
+        texts = [p[3] for p in trial]
+        trial_tokens = count_tokens(separator.join(texts))
+        if trial_tokens > budget:
+            if not picked:
+                # The best chunk alone is over budget: send its beginning, not an empty context
+                cut = truncate_to_budget(texts[0], budget, count_tokens)
+                passages, tokens = ([cut], count_tokens(cut)) if cut else ([], 0)
+                break
+            continue
+        picked.append(chunks[i])
+        passages, tokens = texts, trial_tokens
+    return PackedContext(passages, tokens, naive_tokens)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Corpus Index
+------------
+Indexes a whole directory of extracted documents instead of a single
+Selected_Document.txt.
+
+`ingest` walks the directory, chunks every text file with the chunker of
+RAG_app.py, records per-chunk source metadata (document id and character
+offsets) and writes one FAISS shard per `docs_per_shard` documents. At query
+time ShardedIndex searches all shards in parallel and merges their hits into
+one global top-k.
+
+Layout of an index directory:
+
+    manifest.json            parameters, document list and shard list
+    shard_0000/index.faiss   IndexIDMap with corpus-wide chunk ids
+    shard_0000/chunks.jsonl  one {"id", "doc_id", "start", "end", "text"} per line
+
+With `--on-disk` nothing corpus-sized is held in memory: each shard streams
+its embeddings and chunk text to flat files and gets an IVF index whose
+inverted lists stay on disk (see disk_store.py):
+
+    shard_0000/embeddings.f32, chunks.bin, chunks.off, sources.i64, docs.json
+    shard_0000/index.ondisk + index.ivfdata
+
+Usage:
+    python corpus.py ingest ./extracted --out .rag_corpus --docs-per-shard 100
+    python corpus.py ingest ./extracted --out .rag_corpus --on-disk --block-size 16384
+    python corpus.py query --index .rag_corpus "What was the second iPhone?"
+
+To serve the corpus from RAG_app.py, set `corpus_index_dir = ".rag_corpus"`.
+"""
+
+import argparse
+import bisect
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import faiss
+
+from ann_index import build_index, prepare_vectors, search, set_search_params
+import disk_store
+from parallel_embed import collect_blocks, iter_blocks
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.jsonl"
+
+TEXT_EXTENSIONS = (".txt", ".md")
+
+
+class SourceChunk(NamedTuple):
+    """A chunk of text and where it came from."""
+    text: str
+    doc_id: str
+    start: int  # character offset of the chunk in its document
+    end: int
+
+
+def iter_documents(corpus_dir: str) -> Iterable[Tuple[str, str]]:
+    """Yield (doc_id, path) for every text file below corpus_dir, in a stable order."""
+    for root, dirs, files in os.walk(corpus_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(TEXT_EXTENSIONS):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, corpus_dir).replace(os.sep, "/"), path
+
+
+def _write_shard(path: str, records: List[dict], embeddings: np.ndarray, backend: str,
+                 metric: str = "l2") -> None:
+    os.makedirs(path, exist_ok=True)
+    ids = np.array([r["id"] for r in records], dtype="int64")
+    index = faiss.IndexIDMap(build_index(embeddings, backend, add=False, metric=metric))
+    index.add_with_ids(prepare_vectors(embeddings, metric), ids)
+    faiss.write_index(index, os.path.join(path, INDEX_FILE))
+    with open(os.path.join(path, CHUNKS_FILE), "w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+class _DiskShardWriter:
+    """
+    Streams one on-disk shard: chunk text goes straight to a ChunkTextWriter,
+    embeddings are encoded `block_size` chunks at a time and appended to an
+    EmbeddingWriter, and the IVF index is built from the memory-mapped
+    matrix on close.
+    """
+
+    def __init__(self, path: str, first_id: int, encode: Callable[[List[str]], np.ndarray],
+                 dim: int, block_size: int):
+        self.path = path
+        self.first_id = first_id
+        self.encode = encode
+        self.block_size = block_size
+        self.texts = disk_store.ChunkTextWriter(path)
+        self.vectors = disk_store.EmbeddingWriter(path, dim)
+        self._pending: List[str] = []
+
+    def append(self, text: str, doc_id: str, start: int, end: int) -> None:
+        self.texts.append(text, doc_id, start, end)
+        self._pending.append(text)
+        if len(self._pending) >= self.block_size:
+            self._encode_pending()
+
+    def _encode_pending(self) -> None:
+        if self._pending:
+            for block in iter_blocks(self.encode(self._pending)):
+                self.vectors.append(block)
+            self._pending = []
+
+    def close(self) -> None:
+        self._encode_pending()
+        self.texts.close()
+        self.vectors.close()
+        disk_store.build_ondisk_ivf(self.path, disk_store.open_embeddings(self.path),
+                                    first_id=self.first_id, block_size=self.block_size)
+
+
+def ingest(
+    corpus_dir: str,
+    out_dir: str,
+    chunk_spans: Callable[[str], np.ndarray],
+    encode: Callable[[List[str]], np.ndarray],
+    params: dict,
+    docs_per_shard: int = 100,
+    backend: str = "flat",
+    metric: str = "l2",
+    on_disk: bool = False,
+    dim: Optional[int] = None,
+    block_size: int = 16384,
+) -> dict:
+    """
+    Chunk, embed and index every document in corpus_dir.
+
+    Args:
+        corpus_dir (str): Directory of extracted .txt/.md files.
+        out_dir (str): Where to write the sharded index.
+        chunk_spans (Callable): Chunks a document into (start, end) offsets
+            (e.g. Chunker.spans).
+        encode (Callable): Embeds a list of chunks; may return an iterator of
+            blocks in order (EmbeddingPool.iter_encode), consumed as they arrive.
+        params (dict): Indexing parameters to record in the manifest
+            (model name, chunk size/overlap, ...).
+        docs_per_shard (int): Documents per FAISS shard.
+        backend (str): ann_index backend for each shard (in-memory shards only;
+            on-disk shards are always IVFFlat).
+        metric (str): "l2" or "ip" (in-memory shards only; on-disk shards use L2).
+        on_disk (bool): Stream shards to disk instead of holding each one in memory.
+        dim (int): Embedding dimension (required with on_disk).
+        block_size (int): Chunks encoded / vectors indexed per block (on_disk only).
+
+    Returns:
+        dict: The manifest that was written.
+    """
+    if on_disk and not dim:
+        raise ValueError("on_disk ingestion needs the embedding dimension (dim)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"params": params, "backend": "ivf" if on_disk else backend,
+                "metric": "l2" if on_disk else metric,
+                "storage": "disk" if on_disk else "memory", "documents": [], "shards": []}
+    next_id = 0
+    shard_first_id = 0
+    records: List[dict] = []
+    writer: Optional[_DiskShardWriter] = None
+    shard_docs = 0
+
+    def flush():
+        nonlocal records, writer, shard_docs, shard_first_id
+        count = next_id - shard_first_id
+        if not count:
+            return
+        name = f"shard_{len(manifest['shards']):04d}"
+        if writer is not None:
+            writer.close()
+            writer = None
+        else:
+            embeddings = collect_blocks(encode([r["text"] for r in records]), len(records))
+            _write_shard(os.path.join(out_dir, name), records, embeddings, backend, metric)
+            records = []
+        manifest["shards"].append({"name": name, "first_id": shard_first_id,
+                                   "chunks": count, "documents": shard_docs})
+        print(f"✅ Wrote {name}: {shard_docs} documents, {count} chunks")
+        shard_docs, shard_first_id = 0, next_id
+
+    for doc_id, path in iter_documents(corpus_dir):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        spans = chunk_spans(text).tolist()
+        if on_disk and writer is None and spans:
+            writer = _DiskShardWriter(os.path.join(out_dir, f"shard_{len(manifest['shards']):04d}"),
+                                      next_id, encode, dim, block_size)
+        for start, end in spans:
+            chunk = text[start:end]
+            if writer is not None:
+                writer.append(chunk, doc_id, start, end)
+            else:
+                records.append({"id": next_id, "doc_id": doc_id, "start": start, "end": end, "text": chunk})
+            next_id += 1
+        manifest["documents"].append({"doc_id": doc_id, "chars": len(text), "chunks": len(spans)})
+        shard_docs += 1
+        if shard_docs >= docs_per_shard:
+            flush()
+    flush()
+
+    manifest["total_chunks"] = next_id
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class _DiskRecords:
+    """SourceChunk view over a disk_store.ChunkTextStore (text is read on access)."""
+
+    def __init__(self, store: disk_store.ChunkTextStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, i: int) -> SourceChunk:
+        return SourceChunk(self.store.text(i), *self.store.source(i))
+
+
+class ChunkRecords:
+    """
+    Maps corpus-wide chunk ids to SourceChunks. Ids are consecutive within a
+    shard, so each lookup is a bisect over the shards' first ids.
+    """
+
+    def __init__(self):
+        self._first_ids: List[int] = []
+        self._shards: list = []
+
+    def add_shard(self, first_id: int, records) -> None:
+        """Register a shard's records (any sequence indexed from 0)."""
+        self._first_ids.append(first_id)
+        self._shards.append(records)
+
+    def _locate(self, chunk_id: int):
+        s = bisect.bisect_right(self._first_ids, chunk_id) - 1
+        if s < 0 or chunk_id - self._first_ids[s] >= len(self._shards[s]):
+            return None, -1
+        return self._shards[s], chunk_id - self._first_ids[s]
+
+    def __contains__(self, chunk_id: int) -> bool:
+        return self._locate(chunk_id)[0] is not None
+
+    def __getitem__(self, chunk_id: int) -> SourceChunk:
+        shard, i = self._locate(chunk_id)
+        if shard is None:
+            raise KeyError(chunk_id)
+        return shard[i]
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self._shards)
+
+
+class ShardedIndex:
+    """
+    Read-only view over an ingested corpus: searches every shard in
+    parallel and merges the hits into a global top-k. On-disk shards keep
+    their inverted lists and chunk text memory-mapped.
+    """
+
+    def __init__(self, index_dir: str, search_params: Optional[dict] = None, workers: Optional[int] = None):
+        with open(os.path.join(index_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.index_dir = index_dir
+        self.on_disk = self.manifest.get("storage") == "disk"
+        self.shards: List[faiss.Index] = []
+        self.records = ChunkRecords()
+        first_id = 0
+        for shard in self.manifest["shards"]:
+            path = os.path.join(index_dir, shard["name"])
+            first_id = shard.get("first_id", first_id)
+            if self.on_disk:
+                index = disk_store.load_ondisk_index(path)
+                records = _DiskRecords(disk_store.ChunkTextStore(path))
+            else:
+                index = faiss.read_index(os.path.join(path, INDEX_FILE))
+                with open(os.path.join(path, CHUNKS_FILE), "r", encoding="utf-8") as f:
+                    records = [SourceChunk(r["text"], r["doc_id"], r["start"], r["end"])
+                               for r in map(json.loads, f)]
+            set_search_params(index, **(search_params or {}))
+            self.shards.append(index)
+            self.records.add_shard(first_id, records)
+            first_id += shard["chunks"]
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(8, max(1, len(self.shards))))
+
+    @property
+    def ntotal(self) -> int:
+        return sum(s.ntotal for s in self.shards)
+
+    def version(self) -> str:
+        """Identifies this corpus build (changes whenever it is re-ingested)."""
+        stat = os.stat(os.path.join(self.index_dir, MANIFEST_FILE))
+        return f"corpus:{os.path.abspath(self.index_dir)}:{stat.st_mtime_ns}"
+
+    def search(self, q_arr: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search all shards in parallel (FAISS releases the GIL) and keep the
+        best k hits per query across shards.
+
+        Returns:
+            tuple: (ascending distances, chunk ids), each of shape (n_queries, k);
+            missing hits have id -1.
+        """
+        q_arr = np.ascontiguousarray(q_arr, dtype="float32")
+        if not self.shards:
+            return (np.full((len(q_arr), k), np.inf, dtype="float32"),
+                    np.full((len(q_arr), k), -1, dtype="int64"))
+
+        # ann_index.search returns ascending distances for both metrics
+        results = list(self._pool.map(lambda shard: search(shard, q_arr, k), self.shards))
+        D = np.hstack([d for d, _ in results])
+        I = np.hstack([i for _, i in results])
+
+        order = np.argsort(D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest and query a multi-document corpus.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="Chunk, embed and shard a directory of text files")
+    p_ingest.add_argument("corpus_dir")
+    p_ingest.add_argument("--out", default=".rag_corpus", help="Index output directory")
+    p_ingest.add_argument("--docs-per-shard", type=int, default=100)
+    p_ingest.add_argument("--on-disk", action="store_true",
+                          help="Stream embeddings, text and IVF lists to disk (corpora larger than RAM)")
+    p_ingest.add_argument("--block-size", type=int, default=16384,
+                          help="Chunks encoded / vectors indexed per block with --on-disk")
+    p_ingest.add_argument("--workers", type=int, default=0,
+                          help="Embedding worker processes (see parallel_embed.py); 0 = in-process")
+
+    p_query = sub.add_parser("query", help="Retrieve chunks (with sources) from an ingested corpus")
+    p_query.add_argument("question")
+    p_query.add_argument("--index", default=".rag_corpus")
+    p_query.add_argument("-k", type=int, default=5)
+
+    args = parser.parse_args()
+
+    # Reuse the models and parameters configured in RAG_app.py
+    import RAG_app
+
+    if args.command == "ingest":
+        pool = None
+        if args.workers:
+            from parallel_embed import EmbeddingPool
+            pool = EmbeddingPool(RAG_app.model_name, workers=args.workers, batch_size=RAG_app.encode_batch_size)
+            encode = pool.iter_encode
+        else:
+            def encode(chunks):
+                return RAG_app.pipeline.embedder.encode(
+                    chunks, batch_size=RAG_app.encode_batch_size, show_progress_bar=False)
+
+        try:
+            t0 = time.perf_counter()
+            manifest = ingest(
+                args.corpus_dir,
+                args.out,
+                chunk_spans=RAG_app.pipeline.splitter.spans,
+                encode=encode,
+                params={
+                    "model_name": RAG_app.model_name,
+                    "chunk_size": RAG_app.chunk_size,
+                    "chunk_overlap": RAG_app.chunk_overlap,
+                    "splitter": RAG_app.pipeline.splitter.describe(),
+                },
+                docs_per_shard=args.docs_per_shard,
+                backend=RAG_app.index_backend,
+                metric=RAG_app.index_metric,
+                on_disk=args.on_disk,
+                dim=RAG_app.pipeline.embedder.get_sentence_embedding_dimension() if args.on_disk else None,
+                block_size=args.block_size,
+            )
+            elapsed = time.perf_counter() - t0
+        finally:
+            # Also on failure: the spawned workers would otherwise outlive ingest
+            if pool is not None:
+                pool.close()
+        print(f"✅ Ingested {len(manifest['documents'])} documents into {len(manifest['shards'])} shards "
+              f"({manifest['total_chunks']} chunks) in {elapsed:.1f}s")
+    else:
+        RAG_app.corpus_index_dir = args.index
+        for hit in RAG_app.retrieve_chunks(args.question, k=args.k, with_sources=True):
+            print(f"[{hit.doc_id}:{hit.start}-{hit.end}] {hit.text}")
+
+
+if __name__ == "__main__":
+    main()
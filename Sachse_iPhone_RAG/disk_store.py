@@ -0,0 +1,207 @@
+"""
+Disk Store
+----------
+On-disk storage for corpora larger than RAM, used by `corpus.py ingest
+--on-disk`:
+
+  - EmbeddingWriter appends float32 vectors to a raw file in fixed-size
+    blocks as they are encoded; open_embeddings() maps it back as a
+    read-only np.memmap, so the full matrix is never resident.
+  - ChunkTextWriter / ChunkTextStore keep chunk text in one flat UTF-8 file
+    plus an int64 offset table, and read a chunk only when it is asked for.
+  - build_ondisk_ivf() trains an IVF index on a sample of the vectors, adds
+    them block by block to small per-block indexes and merges those into
+    OnDiskInvertedLists, which FAISS then memory-maps at search time.
+
+Peak memory during ingestion is one encoding block plus the IVF centroids,
+independent of corpus size.
+"""
+
+import json
+import os
+from typing import Iterator, List, Optional
+
+import numpy as np
+import faiss
+from faiss.contrib.ondisk import merge_ondisk
+
+from ann_index import _default_nlist
+
+EMBEDDINGS_FILE = "embeddings.f32"
+EMBEDDINGS_META = "embeddings.json"
+TEXT_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.off"
+SOURCES_FILE = "sources.i64"
+DOCS_FILE = "docs.json"
+TRAINED_FILE = "trained.index"
+INDEX_FILE = "index.ondisk"
+IVFDATA_FILE = "index.ivfdata"
+
+
+class EmbeddingWriter:
+    """Append-only float32 matrix on disk, written one block at a time."""
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.dim = dim
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(os.path.join(directory, EMBEDDINGS_FILE), "wb")
+
+    def append(self, block: np.ndarray) -> None:
+        block = np.ascontiguousarray(block, dtype="float32").reshape(-1, self.dim)
+        self._file.write(block.tobytes())
+        self.rows += len(block)
+
+    def close(self) -> None:
+        self._file.close()
+        with open(os.path.join(self.directory, EMBEDDINGS_META), "w", encoding="utf-8") as f:
+            json.dump({"rows": self.rows, "dim": self.dim}, f)
+
+
+def open_embeddings(directory: str) -> np.ndarray:
+    """Memory-map an embedding matrix written by EmbeddingWriter (read-only)."""
+    with open(os.path.join(directory, EMBEDDINGS_META), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["rows"] == 0:
+        return np.empty((0, meta["dim"]), dtype="float32")
+    return np.memmap(os.path.join(directory, EMBEDDINGS_FILE), dtype="float32", mode="r",
+                     shape=(meta["rows"], meta["dim"]))
+
+
+class ChunkTextWriter:
+    """
+    Streams chunk text and its source (document, start, end) to flat files:
+    the UTF-8 text back to back, an int64 byte-offset table and an int64
+    (doc index, start, end) table.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.count = 0
+        self.doc_ids: List[str] = []
+        self._doc_index = {}
+        os.makedirs(directory, exist_ok=True)
+        self._text = open(os.path.join(directory, TEXT_FILE), "wb")
+        self._offsets = open(os.path.join(directory, OFFSETS_FILE), "wb")
+        self._sources = open(os.path.join(directory, SOURCES_FILE), "wb")
+        self._pos = 0
+        self._offsets.write(np.array([0], dtype="int64").tobytes())
+
+    def append(self, text: str, doc_id: str, start: int, end: int) -> None:
+        data = text.encode("utf-8")
+        self._text.write(data)
+        self._pos += len(data)
+        self._offsets.write(np.array([self._pos], dtype="int64").tobytes())
+
+        if doc_id not in self._doc_index:
+            self._doc_index[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+        self._sources.write(np.array([self._doc_index[doc_id], start, end], dtype="int64").tobytes())
+        self.count += 1
+
+    def close(self) -> None:
+        for f in (self._text, self._offsets, self._sources):
+            f.close()
+        with open(os.path.join(self.directory, DOCS_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.doc_ids, f, ensure_ascii=False)
+
+
+class ChunkTextStore:
+    """
+    Read side of ChunkTextWriter. Only the offset tables are mapped; chunk
+    text is decoded from the memory-mapped text file on access.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, DOCS_FILE), "r", encoding="utf-8") as f:
+            self.doc_ids = json.load(f)
+        self._offsets = np.memmap(os.path.join(directory, OFFSETS_FILE), dtype="int64", mode="r")
+        n = len(self._offsets) - 1
+        self._sources = (np.memmap(os.path.join(directory, SOURCES_FILE), dtype="int64", mode="r",
+                                   shape=(n, 3)) if n else np.empty((0, 3), dtype="int64"))
+        size = os.path.getsize(os.path.join(directory, TEXT_FILE))
+        self._text = (np.memmap(os.path.join(directory, TEXT_FILE), dtype="uint8", mode="r")
+                      if size else np.empty(0, dtype="uint8"))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def text(self, i: int) -> str:
+        lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._text[lo:hi].tobytes().decode("utf-8")
+
+    def source(self, i: int):
+        """(doc_id, start, end) of chunk i."""
+        doc, start, end = (int(v) for v in self._sources[i])
+        return self.doc_ids[doc], start, end
+
+
+def iter_blocks(matrix: np.ndarray, block_size: int) -> Iterator[np.ndarray]:
+    for start in range(0, len(matrix), block_size):
+        yield np.ascontiguousarray(matrix[start:start + block_size], dtype="float32")
+
+
+def build_ondisk_ivf(
+    directory: str,
+    embeddings: np.ndarray,
+    first_id: int = 0,
+    nlist: Optional[int] = None,
+    block_size: int = 65536,
+    train_size: int = 100000,
+) -> faiss.Index:
+    """
+    Build an IVFFlat index whose inverted lists live in `directory`.
+
+    Args:
+        directory (str): Output directory for the index and its .ivfdata.
+        embeddings (np.ndarray): Usually the memmap from open_embeddings().
+        first_id (int): Id of row 0 (rows get consecutive ids).
+        nlist (int): Inverted lists (default: ~4*sqrt(n), see ann_index).
+        block_size (int): Rows added per intermediate block index.
+        train_size (int): Maximum rows sampled for k-means training.
+
+    Returns:
+        faiss.Index: The index, reopened with its inverted lists memory-mapped.
+    """
+    n, dim = embeddings.shape
+    nlist = max(1, min(nlist or _default_nlist(n), max(n, 1)))
+
+    quantizer = faiss.IndexFlatL2(dim)
+    trained = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    if n:
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(n, size=min(n, train_size), replace=False))
+        trained.train(np.ascontiguousarray(embeddings[sample], dtype="float32"))
+    trained_path = os.path.join(directory, TRAINED_FILE)
+    faiss.write_index(trained, trained_path)
+
+    block_paths = []
+    for b, block in enumerate(iter_blocks(embeddings, block_size)):
+        index = faiss.read_index(trained_path)
+        start = first_id + b * block_size
+        index.add_with_ids(block, np.arange(start, start + len(block), dtype="int64"))
+        path = os.path.join(directory, f"block_{b:04d}.index")
+        faiss.write_index(index, path)
+        block_paths.append(path)
+        del index
+
+    merged = faiss.read_index(trained_path)
+    if block_paths:
+        merge_ondisk(merged, block_paths, os.path.join(directory, IVFDATA_FILE))
+    faiss.write_index(merged, os.path.join(directory, INDEX_FILE))
+
+    for path in block_paths:
+        os.remove(path)
+    os.remove(trained_path)
+    return load_ondisk_index(directory)
+
+
+def load_ondisk_index(directory: str) -> faiss.Index:
+    """
+    Open an index from build_ondisk_ivf() without loading its inverted
+    lists; the .ivfdata file is looked up next to the index, so the whole
+    directory can be moved.
+    """
+    # OnDiskInvertedLists map their .ivfdata themselves; no IO_FLAG_MMAP needed
+    return faiss.read_index(os.path.join(directory, INDEX_FILE), faiss.IO_FLAG_ONDISK_SAME_DIR)
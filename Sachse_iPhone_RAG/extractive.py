@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Extractive Answers
+------------------
+Answer factual questions locally with a sentence (or span) of the reranked
+chunks, and call the chat model only when no sentence is a confident match.
+
+Two extractors, both offline once their model is on disk:
+
+  - extract_sentence(): splits the best reranked chunks into sentences and
+    scores every (question, sentence) pair with the cross-encoder that
+    already reranked the chunks. Confidence is the sigmoid of the score
+    (ms-marco cross-encoders output logits).
+  - extract_span(): runs a small extractive QA model (a transformers
+    "question-answering" pipeline, e.g. distilbert-base-cased-distilled-squad)
+    over the same chunks; confidence is the model's span probability.
+
+RAG_app.py (extractive_mode):
+
+  - "off":   always call the chat model (default);
+  - "auto":  answer with the extraction when its confidence reaches
+             extractive_threshold, otherwise call the chat model;
+  - "local": always answer with the extraction, never call the chat model.
+
+ExtractiveStats counts how each answer was served (answer cache, local
+extraction, chat model) and keeps a latency histogram per path.
+
+The threshold is the quality/latency knob. --report replays the benchmark
+questions without any LLM call and prints, per threshold, the share served
+locally, the share of those containing the expected phrase and the local
+latency:
+    python extractive.py --report
+    python extractive.py --report --thresholds 0.8 0.9 0.95 0.99 --questions benchmark_questions.json
+"""
+
+import argparse
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from profiling import Histogram
+
+MIN_SENTENCE_CHARS = 20
+MAX_SENTENCE_CHARS = 300
+
+# Sentence ends: ., ! or ? (optionally closing a quote or bracket), then
+# whitespace and something that can start a sentence
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]?\s+(?=[A-Z0-9\"'(“])")
+
+
+class Extraction(NamedTuple):
+    """A candidate answer taken from the context."""
+    text: str
+    confidence: float  # 0..1
+    chunk: int         # index of the chunk it came from
+
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS, max_chars: int = MAX_SENTENCE_CHARS) -> List[str]:
+    """
+    Split a chunk into sentences. Fragments shorter than `min_chars` are
+    joined to the next sentence; sentences longer than `max_chars` (tables,
+    lists without punctuation) are cut at word boundaries.
+    """
+    sentences, pending = [], ""
+    for part in _SENTENCE_END.split(re.sub(r"\s+", " ", text).strip()):
+        part = f"{pending} {part}".strip() if pending else part
+        if len(part) < min_chars:
+            pending = part
+            continue
+        pending = ""
+        while len(part) > max_chars:
+            cut = part.rfind(" ", 0, max_chars)
+            cut = cut if cut > min_chars else max_chars
+            sentences.append(part[:cut].strip())
+            part = part[cut:].strip()
+        if part:
+            sentences.append(part)
+    if pending:
+        if sentences and len(sentences[-1]) + len(pending) < max_chars:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x)) if x >= 0 else math.exp(x) / (1.0 + math.exp(x))
+
+
+def extract_sentence(
+    question: str,
+    chunks: Sequence[str],
+    score_pairs: Callable[[List[Tuple[str, str]]], Sequence[float]],
+    max_chunks: int = 3,
+) -> Optional[Extraction]:
+    """
+    The sentence of the first `max_chunks` chunks that the cross-encoder
+    scores highest for the question.
+
+    Args:
+        question (str): The user question.
+        chunks (Sequence[str]): Reranked chunks, best first.
+        score_pairs (Callable): Cross-encoder scores (logits) for (question, text) pairs.
+        max_chunks (int): How many of the best chunks to search.
+
+    Returns:
+        Extraction: The best sentence, or None when the chunks have no text.
+    """
+    candidates = [(i, s) for i, chunk in enumerate(chunks[:max_chunks]) for s in split_sentences(chunk)]
+    if not candidates:
+        return None
+    scores = score_pairs([(question, s) for _, s in candidates])
+    best = max(range(len(candidates)), key=lambda j: scores[j])
+    chunk, sentence = candidates[best]
+    return Extraction(sentence, _sigmoid(float(scores[best])), chunk)
+
+
+def extract_span(question: str, chunks: Sequence[str], qa_model, max_chunks: int = 3) -> Optional[Extraction]:
+    """
+    The answer span an extractive QA model finds in the first `max_chunks` chunks.
+
+    Args:
+        question (str): The user question.
+        chunks (Sequence[str]): Reranked chunks, best first.
+        qa_model: A transformers "question-answering" pipeline.
+        max_chunks (int): How many of the best chunks to search.
+
+    Returns:
+        Extraction: The most probable span, or None when the chunks have no text.
+    """
+    contexts = [c for c in chunks[:max_chunks] if c.strip()]
+    if not contexts:
+        return None
+    results = qa_model(question=[question] * len(contexts), context=contexts, top_k=1)
+    if isinstance(results, dict):
+        results = [results]
+    best = max(range(len(results)), key=lambda j: results[j]["score"])
+    return Extraction(results[best]["answer"].strip(), float(results[best]["score"]), best)
+
+
+class ExtractiveStats:
+    """How answers were served ("cache", "local", "llm") and their latency per path."""
+
+    PATHS = ("cache", "local", "llm")
+
+    def __init__(self):
+        self.paths = Counter()
+        self.latency = {p: Histogram() for p in self.PATHS}
+        self._lock = threading.Lock()
+
+    def record(self, path: str, seconds: float) -> None:
+        with self._lock:
+            self.paths[path] += 1
+            self.latency[path].observe(seconds)
+
+    def to_json(self) -> dict:
+        with self._lock:
+            total = sum(self.paths.values())
+            return {p: {"share": self.paths[p] / total if total else 0.0, **self.latency[p].summary()}
+                    for p in self.PATHS}
+
+    def report(self) -> str:
+        """One-line summary: share of answers per path and their p50 / p95 latency."""
+        stats = self.to_json()
+        parts = [f"{p} {100 * s['share']:.0f}% (p50 {1000 * s['p50_s']:.0f} ms, p95 {1000 * s['p95_s']:.0f} ms)"
+                 for p, s in stats.items() if s["count"]]
+        return f"answers over {sum(self.paths.values())} queries: " + (", ".join(parts) or "none")
+
+
+# --- Report ---
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def extraction_report(questions: List[Tuple[str, str]], thresholds: Sequence[float]) -> Tuple[List[dict], dict]:
+    """
+    Run retrieval, reranking and extraction for every question (no LLM) and
+    evaluate each threshold.
+
+    Returns:
+        tuple: (one row per threshold, timing summary in ms)
+    """
+    import numpy as np
+
+    import RAG_app
+
+    def run(question):
+        t0 = time.perf_counter()
+        q_vec = RAG_app.encode_questions([question])[0]
+        sources, distances = RAG_app.retrieve_chunks(
+            question, q_vec=q_vec, with_distances=True, with_sources=True)
+        relevant = RAG_app.rerank_chunks(question, [s.text for s in sources], m=RAG_app.top_m, distances=distances)
+        t1 = time.perf_counter()
+        extraction = RAG_app.extract_answer(question, relevant)
+        return extraction, t1 - t0, time.perf_counter() - t1
+
+    run(questions[0][0])  # load the models and the index outside the measurement
+    found, retrieve_ms, extract_ms = [], [], []
+    for question, expected in questions:
+        extraction, retrieve_s, extract_s = run(question)
+        retrieve_ms.append(1000 * retrieve_s)
+        extract_ms.append(1000 * extract_s)
+        if extraction is not None:
+            found.append((extraction.confidence, _squash(expected) in _squash(extraction.text),
+                          retrieve_s + extract_s))
+
+    rows = []
+    for threshold in thresholds:
+        served = [(ok, s) for conf, ok, s in found if conf >= threshold]
+        rows.append({
+            "threshold": threshold,
+            "local": len(served) / len(questions),
+            "correct": sum(ok for ok, _ in served) / len(served) if served else float("nan"),
+            "p50_ms": 1000 * float(np.percentile([s for _, s in served], 50)) if served else float("nan"),
+        })
+    timing = {
+        "retrieve_p50": float(np.percentile(retrieve_ms, 50)),
+        "extract_p50": float(np.percentile(extract_ms, 50)),
+        "extract_p95": float(np.percentile(extract_ms, 95)),
+    }
+    return rows, timing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extractive answer report (no LLM calls).")
+    parser.add_argument("--report", action="store_true", help="Local-answer share and accuracy per threshold")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--questions", default="benchmark_questions.json",
+                        help='JSON list of {"question": ..., "expected": ...}')
+    parser.add_argument("--model", help="Extractive QA model instead of cross-encoder sentence scoring")
+    args = parser.parse_args()
+
+    if not args.report:
+        parser.print_help()
+        return
+
+    import RAG_app
+    RAG_app.extractive_model = args.model or RAG_app.extractive_model
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [(q["question"], q["expected"]) for q in json.load(f)]
+
+    rows, timing = extraction_report(questions, args.thresholds)
+    print(f"📊 {len(questions)} questions, extractor: {RAG_app.extractive_model or 'cross-encoder sentences'}; "
+          f"retrieval p50 {timing['retrieve_p50']:.1f} ms, extraction p50 {timing['extract_p50']:.1f} ms "
+          f"(p95 {timing['extract_p95']:.1f} ms)")
+    print(f"{'threshold':<11}{'local':>8}{'correct':>9}{'p50 ms':>9}")
+    for r in rows:
+        print(f"{r['threshold']:<11.2f}{r['local']:>8.1%}{r['correct']:>9.1%}{r['p50_ms']:>9.1f}")
+    print("(local = share answered without the LLM; correct = share of those containing the expected phrase)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Index Cache
+-----------
+Persists the split chunks, the float32 embedding matrix and the serialized
+FAISS index to disk so a warm start of RAG_app.py skips splitting and
+embedding entirely.
+
+The index is content-addressed at the chunk level: every chunk's vector id
+is derived from a hash of its text, and the FAISS index is wrapped in an
+IndexIDMap. When Selected_Document.txt changes, only chunks with new hashes
+are embedded and vectors of chunks that disappeared are removed, so
+re-indexing cost scales with the size of the edit, not of the document.
+
+Each cache entry lives in its own directory under CACHE_DIR, named by a key
+derived from every parameter that changes how text becomes vectors (model
+name, chunk size/overlap and splitter settings). Changing any of them selects a
+different entry; the document hash stored inside an entry decides whether
+it can be used as-is or needs an incremental update.
+
+The FAISS backend and metric (see ann_index.py) are not part of the key:
+the cached embeddings are raw encoder output, so switching backends or
+metrics only rebuilds the index from them.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import faiss
+
+from ann_index import build_index, prepare_vectors, set_search_params
+from parallel_embed import iter_blocks
+from profiling import span
+
+CACHE_DIR = ".rag_cache"
+
+MANIFEST_FILE = "manifest.json"
+CHUNKS_FILE = "chunks.json"
+IDS_FILE = "ids.npy"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_FILE = "index.faiss"
+
+
+def cache_key(
+    model_name: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    splitter: Sequence[str],
+) -> str:
+    """
+    Build a stable cache key for a set of indexing parameters.
+
+    Args:
+        model_name (str): Embedding model identifier.
+        chunk_size (int): Splitter chunk size.
+        chunk_overlap (int): Splitter chunk overlap.
+        splitter (Sequence[str]): Splitter settings, e.g. Chunker.describe().
+
+    Returns:
+        str: Hex digest identifying this index configuration.
+    """
+    params = {
+        "model_name": model_name,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "splitter": list(splitter),
+    }
+    blob = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:32]
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 hex digest of a document's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(chunk: str) -> int:
+    """
+    Content-addressed FAISS id for a chunk: the first 63 bits of its SHA-1,
+    so it always fits FAISS's signed 64-bit ids.
+    """
+    digest = hashlib.sha1(chunk.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
+
+class ChunkIndex:
+    """
+    A FAISS IndexIDMap whose ids are chunk content hashes, together with the
+    ordered chunk list of the current document.
+
+    `chunks` and `chunk_by_id` are mutated in place by sync(). With the
+    "flat" backend so is `index`; other backends cannot cheaply remove
+    vectors (HNSW) or need re-training as the data drifts (IVF), so sync()
+    replaces `index` with one rebuilt from the cached embeddings.
+
+    Attributes:
+        chunks (List[str]): Chunks of the current document, in order.
+        chunk_by_id (Dict[int, str]): Vector id -> chunk text.
+        ids (np.ndarray): int64 ids, in index insertion order.
+        embeddings (np.ndarray): float32 vectors aligned with `ids`.
+        index (faiss.IndexIDMap): The searchable index.
+        doc_hash (str): text_hash() of the document last synced.
+        backend (str): ann_index backend name.
+        build_params (dict): Extra build_index() arguments.
+        search_params (dict): set_search_params() arguments (nprobe, ef_search).
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        backend: str = "flat",
+        build_params: Optional[dict] = None,
+        search_params: Optional[dict] = None,
+    ):
+        self.chunks: List[str] = []
+        self.chunk_by_id: Dict[int, str] = {}
+        self.ids = np.empty(0, dtype="int64")
+        self.embeddings = np.empty((0, dim), dtype="float32")
+        self.doc_hash = ""
+        self.backend = backend
+        self.build_params = build_params or {}
+        self.search_params = search_params or {}
+        self.rebuild()
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    @property
+    def metric(self) -> str:
+        return self.build_params.get("metric", "l2")
+
+    def rebuild(self) -> None:
+        """Rebuild `index` from the cached embeddings with the configured backend."""
+        inner = build_index(self.embeddings, self.backend, add=False, **self.build_params)
+        self.index = faiss.IndexIDMap(inner)
+        if len(self.ids):
+            self.index.add_with_ids(prepare_vectors(self.embeddings, self.metric), self.ids)
+        set_search_params(self.index, **self.search_params)
+
+    def sync(
+        self,
+        chunks: List[str],
+        encode: Callable[[List[str]], np.ndarray],
+        doc_hash: str = "",
+    ) -> Tuple[int, int]:
+        """
+        Bring the index in line with a new chunk list.
+
+        Only chunks whose hash is not already indexed are passed to `encode`;
+        vectors whose chunk no longer appears are removed. `encode` may
+        return one array or an iterator of blocks in order (e.g.
+        EmbeddingPool.iter_encode); blocks are written into the embedding
+        matrix and, for exact backends, added to the index as they arrive.
+
+        Args:
+            chunks (List[str]): New chunk list, in document order.
+            encode (Callable): Embeds a list of chunk texts.
+            doc_hash (str): Hash of the document the chunks came from.
+
+        Returns:
+            tuple: (number of vectors added, number of vectors removed)
+        """
+        wanted: Dict[int, str] = {}
+        for c in chunks:
+            wanted.setdefault(chunk_id(c), c)
+
+        stale = [i for i in self.chunk_by_id if i not in wanted]
+        fresh = [i for i in wanted if i not in self.chunk_by_id]
+
+        # Untrained exact backends take additions and removals in place
+        incremental = self.backend in ("flat", "fp16")
+
+        if stale:
+            stale_arr = np.array(stale, dtype="int64")
+            if incremental:
+                self.index.remove_ids(stale_arr)
+            keep = ~np.isin(self.ids, stale_arr)
+            self.ids = self.ids[keep]
+            self.embeddings = self.embeddings[keep]
+            for i in stale:
+                del self.chunk_by_id[i]
+
+        if fresh:
+            texts = [wanted[i] for i in fresh]
+            fresh_arr = np.array(fresh, dtype="int64")
+            start, done = len(self.ids), 0
+            embeddings = np.empty((start + len(texts), self.dim), dtype="float32")
+            embeddings[:start] = self.embeddings
+            try:
+                with span("index.embed"):
+                    for block in iter_blocks(encode(texts)):
+                        embeddings[start + done:start + done + len(block)] = block
+                        if incremental:
+                            self.index.add_with_ids(prepare_vectors(block, self.metric),
+                                                    fresh_arr[done:done + len(block)])
+                        done += len(block)
+                if done != len(texts):
+                    raise ValueError(f"encoder returned {done} vectors for {len(texts)} chunks")
+            except BaseException:
+                # Leave the index as it was before this call's additions
+                if incremental and done:
+                    self.index.remove_ids(fresh_arr[:done])
+                raise
+            self.ids = np.concatenate([self.ids, fresh_arr])
+            self.embeddings = embeddings
+            self.chunk_by_id.update(zip(fresh, texts))
+
+        if not incremental and (stale or fresh):
+            with span("index.add"):
+                self.rebuild()
+
+        self.chunks[:] = chunks
+        self.doc_hash = doc_hash
+        return len(fresh), len(stale)
+
+    def save(self, path: str) -> None:
+        """
+        Write the index atomically (temp directory + rename), so a crash
+        mid-write never leaves a half-populated entry behind.
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        try:
+            with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump({
+                    "doc_hash": self.doc_hash,
+                    "dim": self.dim,
+                    "backend": self.backend,
+                    "build_params": self.build_params,
+                }, f)
+            with open(os.path.join(tmp, CHUNKS_FILE), "w", encoding="utf-8") as f:
+                json.dump(self.chunks, f, ensure_ascii=False)
+            np.save(os.path.join(tmp, IDS_FILE), self.ids)
+            np.save(os.path.join(tmp, EMBEDDINGS_FILE), self.embeddings)
+            faiss.write_index(self.index, os.path.join(tmp, INDEX_FILE))
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.replace(tmp, path)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        backend: str = "flat",
+        build_params: Optional[dict] = None,
+        search_params: Optional[dict] = None,
+    ) -> Optional["ChunkIndex"]:
+        """
+        Load an index saved with save(); a missing or corrupt entry returns None.
+        If it was saved with a different backend, the index is rebuilt from
+        the cached embeddings (no re-embedding).
+        """
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            with open(os.path.join(path, CHUNKS_FILE), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            ids = np.load(os.path.join(path, IDS_FILE))
+            embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE))
+            index = faiss.read_index(os.path.join(path, INDEX_FILE))
+        except (OSError, ValueError, KeyError, RuntimeError):
+            return None
+
+        if not (len(ids) == embeddings.shape[0] == index.ntotal):
+            return None
+
+        by_hash = {chunk_id(c): c for c in chunks}
+        if any(int(i) not in by_hash for i in ids):
+            return None
+
+        self = cls.__new__(cls)
+        self.chunks = chunks
+        self.chunk_by_id = {int(i): by_hash[int(i)] for i in ids}
+        self.ids = ids
+        self.embeddings = embeddings
+        self.doc_hash = manifest["doc_hash"]
+        self.backend = backend
+        self.build_params = build_params or {}
+        self.search_params = search_params or {}
+
+        saved = (manifest.get("backend", "flat"), manifest.get("build_params", {}))
+        if saved == (self.backend, self.build_params):
+            self.index = index
+            set_search_params(self.index, **self.search_params)
+        else:
+            self.rebuild()
+        return self
+
+
+def load_or_build_index(
+    key: str,
+    text: str,
+    split: Callable[[str], List[str]],
+    encode: Callable[[List[str]], np.ndarray],
+    dim: int,
+    cache_dir: str = CACHE_DIR,
+    backend: str = "flat",
+    build_params: Optional[dict] = None,
+    search_params: Optional[dict] = None,
+) -> Tuple[ChunkIndex, int, int]:
+    """
+    Return the up-to-date ChunkIndex for `text`, reusing the cache entry for
+    `key` and only embedding chunks that are not already in it.
+
+    Args:
+        key (str): Cache key from cache_key().
+        text (str): Current document text.
+        split (Callable): Splits text into chunks (skipped on an exact hit).
+        encode (Callable): Embeds a list of chunks.
+        dim (int): Embedding dimension (used when no entry exists yet).
+        cache_dir (str): Root directory of the cache.
+        backend (str): ann_index backend for the FAISS index.
+        build_params (dict): Extra build_index() arguments.
+        search_params (dict): Query-time knobs (nprobe, ef_search).
+
+    Returns:
+        tuple: (ChunkIndex, vectors added, vectors removed); (idx, 0, 0) on a warm start.
+    """
+    path = os.path.join(cache_dir, key)
+    doc_hash = text_hash(text)
+
+    index_config = dict(backend=backend, build_params=build_params, search_params=search_params)
+    with span("index.load"):
+        store = ChunkIndex.load(path, **index_config)
+    if store is not None and store.doc_hash == doc_hash:
+        return store, 0, 0
+    if store is None:
+        store = ChunkIndex(dim, **index_config)
+
+    with span("index.split"):
+        chunks = split(text)
+    added, removed = store.sync(chunks, encode, doc_hash)
+
+    try:
+        with span("index.save"):
+            store.save(path)
+    except OSError as e:
+        print(f"⚠️ Could not write index cache: {e}")
+
+    return store, added, removed
@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+"""
+LLM Client
+----------
+One resilient entry point for chat completions, used by the sync, async and
+streaming paths of RAG_app.py instead of calling the OpenAI client directly.
+
+  - Connection pooling: one keep-alive httpx pool per mode (sync / async),
+    sized to the concurrency limit, so requests reuse TCP/TLS connections.
+  - Deadlines: every call gets `timeout` seconds in total, queueing and
+    retries included. A single attempt is abandoned (and retried) after
+    `attempt_timeout` seconds or when the deadline is up, whichever comes
+    first, so one hung request does not use up the whole budget. (For
+    streams this covers the wait for the response; tokens then arrive under
+    the same read timeout between chunks.)
+  - Retries: timeouts, connection errors, 408/409/429 and 5xx responses are
+    retried up to `max_retries` times with full-jitter exponential backoff
+    (a uniform delay in [0, min(backoff_max, backoff_base * 2**attempt)]),
+    or after the server's Retry-After when it sends one. When they run
+    out, RetriesExhausted (or DeadlineExceeded, if the next retry would
+    pass the deadline) is raised with the last upstream error as its
+    __cause__. Other errors are raised at once. The OpenAI client's own
+    retries are turned off.
+  - Concurrency: at most `max_concurrency` requests in flight; further
+    callers queue for a slot. The async slots and connection pool belong
+    to one event loop, so each loop gets its own (e.g. one per
+    asyncio.run()), and those of closed loops are dropped.
+  - Rate limit: a token bucket refilled at `rate_per_s` requests per second,
+    holding up to `burst` tokens; every attempt takes one.
+  - Circuit breaker: after `breaker_threshold` consecutive failed attempts
+    the circuit opens and calls fail fast with CircuitOpenError for
+    `breaker_reset_s` seconds; then a single trial call is let through, and
+    its outcome closes or re-opens the circuit.
+  - Metrics: queue wait (slot + rate limiter), upstream latency per attempt,
+    retries, errors by type and the circuit state, via stats().
+
+Usage (stub server with injected errors and slow responses, with and
+without the client's protections):
+    python llm_client.py --bench --requests 200 --concurrency 16 --error-rate 0.2 --slow-rate 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Iterator, Optional
+
+
+class LLMError(RuntimeError):
+    """A chat completion could not be obtained."""
+
+
+class CircuitOpenError(LLMError):
+    """The circuit breaker is open: upstream failed repeatedly, calls fail fast."""
+
+
+class DeadlineExceeded(LLMError):
+    """The call's deadline passed while queueing, backing off or waiting for upstream."""
+
+
+class RetriesExhausted(LLMError):
+    """Every attempt failed with a retryable error; the last one is the __cause__."""
+
+
+# --- Building blocks ---
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. reserve() takes a token now or in the future
+    and returns how long the caller must wait for it.
+
+    Args:
+        rate_per_s (float): Tokens added per second.
+        burst (float): Bucket capacity (requests allowed at once after idling).
+    """
+
+    def __init__(self, rate_per_s: float, burst: Optional[float] = None):
+        if rate_per_s <= 0:
+            raise ValueError("rate_per_s must be positive")
+        self.rate = rate_per_s
+        self.capacity = burst if burst is not None else max(1.0, rate_per_s)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float = float("inf")) -> Optional[float]:
+        """
+        Take a token, possibly one that is only refilled later.
+
+        Returns:
+            float: Seconds until the token is available (0 = now), or None
+            (nothing taken) when that would be longer than `max_wait`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a single half-open trial.
+
+    States: "closed" (calls pass), "open" (calls fail fast until `reset_s`
+    after the last failure), "half-open" (one trial call in flight).
+    """
+
+    def __init__(self, threshold: int = 5, reset_s: float = 30.0):
+        self.threshold = threshold
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if self._trial else "open"
+
+    def before_attempt(self) -> None:
+        """Raise CircuitOpenError unless an attempt may go upstream now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial or time.monotonic() - self._opened_at < self.reset_s:
+                raise CircuitOpenError(
+                    f"LLM circuit open after {self.failures} consecutive failures; "
+                    f"retrying upstream within {self.reset_s:g}s")
+            self._trial = True
+
+    def cancel_trial(self) -> None:
+        """The half-open trial ended without telling anything about upstream."""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self._opened_at is None and self.failures >= self.threshold):
+                if self._opened_at is None:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class _Samples:
+    """The last `size` values of a metric, for percentiles."""
+
+    def __init__(self, size: int = 10000):
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary_ms(self) -> dict:
+        if not self.values:
+            return {"count": 0}
+        ordered = sorted(self.values)
+
+        def pct(p):
+            return 1000 * ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+        return {
+            "count": self.count,
+            "mean": 1000 * self.total / self.count,
+            "p50": pct(50),
+            "p95": pct(95),
+            "p99": pct(99),
+            "max": 1000 * ordered[-1],
+        }
+
+
+def _retryable(error: Exception) -> bool:
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _loop_closed(error: BaseException) -> bool:
+    """The error (or its cause) is asyncio's "Event loop is closed"."""
+    while error is not None:
+        if isinstance(error, RuntimeError) and "Event loop is closed" in str(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """The Retry-After delay a 429/503 response asked for, in seconds."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:  # an HTTP date; use our own backoff
+        pass
+    return None
+
+
+# --- Client ---
+
+class LLMClient:
+    """
+    Chat completions with pooling, deadlines, retries, a concurrency limit,
+    rate limiting and a circuit breaker (see the module docstring).
+
+    Args:
+        api_key (str): OpenAI API key (default: OPENAI_API_KEY).
+        base_url (str): API base URL (default: OPENAI_BASE_URL or the OpenAI API).
+        max_concurrency (int): Requests in flight at once (per mode: sync / async).
+        timeout (float): Seconds per call, queueing and retries included.
+        attempt_timeout (float): Seconds per attempt (None = the whole deadline).
+        connect_timeout (float): Seconds to establish a connection.
+        max_retries (int): Retries after the first attempt.
+        backoff_base (float): First backoff ceiling in seconds; doubles per retry.
+        backoff_max (float): Largest backoff ceiling.
+        rate_per_s (float): Attempts per second (None = no rate limit).
+        burst (float): Token bucket capacity (default: max(1, rate_per_s)).
+        breaker_threshold (int): Consecutive failed attempts that open the circuit.
+        breaker_reset_s (float): Seconds before a trial call after opening.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 8,
+        timeout: float = 60.0,
+        attempt_timeout: Optional[float] = None,
+        connect_timeout: float = 5.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        rate_per_s: Optional[float] = None,
+        burst: Optional[float] = None,
+        breaker_threshold: int = 5,
+        breaker_reset_s: float = 30.0,
+    ):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.attempt_timeout = attempt_timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate_per_s, burst) if rate_per_s else None
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset_s)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async = {}  # event loop -> (asyncio.Semaphore, AsyncOpenAI client)
+        self._sync_client = None
+        self._init_lock = threading.Lock()
+        self._rng = random.Random()
+
+        self._metrics_lock = threading.Lock()
+        self.queue_wait = _Samples()
+        self.upstream = _Samples()
+        self.counts = Counter()
+        self.errors = Counter()
+
+    # --- clients ---
+
+    def _client_kwargs(self, http_client) -> dict:
+        import httpx
+
+        return dict(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=0,  # retried here, under the deadline and the breaker
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            http_client=http_client,
+        )
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+
+    @property
+    def sync_client(self):
+        """The pooled openai.OpenAI client."""
+        with self._init_lock:
+            if self._sync_client is None:
+                from openai import DefaultHttpxClient, OpenAI
+                self._sync_client = OpenAI(**self._client_kwargs(DefaultHttpxClient(limits=self._limits())))
+            return self._sync_client
+
+    def _async_state(self):
+        """
+        The slots and pooled AsyncOpenAI client of the running event loop,
+        and the clients of loops that have closed since (to be discarded).
+        """
+        loop = asyncio.get_running_loop()
+        with self._init_lock:
+            state = self._async.get(loop)
+            if state is not None:
+                return state, []
+            stale = [client for old, (_, client) in self._async.items() if old.is_closed()]
+            self._async = {old: st for old, st in self._async.items() if not old.is_closed()}
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            state = self._async[loop] = (
+                asyncio.Semaphore(self.max_concurrency),
+                AsyncOpenAI(**self._client_kwargs(DefaultAsyncHttpxClient(limits=self._limits()))),
+            )
+            return state, stale
+
+    @property
+    def async_client(self):
+        """The pooled openai.AsyncOpenAI client of the running event loop."""
+        return self._async_state()[0][1]
+
+    @staticmethod
+    async def _discard(client) -> None:
+        """Close a client whose event loop is gone, as far as that is still possible."""
+        try:
+            await client.close()
+        except RuntimeError:
+            # Its connections were bound to the closed loop; they are released with the client
+            pass
+
+    # --- metrics ---
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._metrics_lock:
+            self.counts[name] += n
+
+    def _observe(self, samples: _Samples, seconds: float) -> None:
+        with self._metrics_lock:
+            samples.add(seconds)
+
+    def stats(self) -> dict:
+        """Counters and queue-wait / upstream latency percentiles (ms)."""
+        with self._metrics_lock:
+            return {
+                "calls": self.counts["calls"],
+                "succeeded": self.counts["succeeded"],
+                "failed": self.counts["failed"],
+                "attempts": self.counts["attempts"],
+                "retries": self.counts["retries"],
+                "errors": dict(self.errors),
+                "circuit": self.breaker.state,
+                "circuit_opened": self.breaker.opened,
+                "queue_wait_ms": self.queue_wait.summary_ms(),
+                "upstream_ms": self.upstream.summary_ms(),
+            }
+
+    def reset_stats(self) -> None:
+        with self._metrics_lock:
+            self.queue_wait = _Samples()
+            self.upstream = _Samples()
+            self.counts.clear()
+            self.errors.clear()
+
+    # --- retry policy (shared by the sync and async paths) ---
+
+    def _attempt_timeout(self, deadline: float):
+        """httpx timeout for the next attempt: attempt_timeout, capped by the deadline."""
+        import httpx
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"LLM call exceeded its {self.timeout:g}s deadline")
+        if self.attempt_timeout:
+            remaining = min(remaining, self.attempt_timeout)
+        return httpx.Timeout(remaining, connect=min(self.connect_timeout, remaining))
+
+    def _rate_wait(self, deadline: float) -> float:
+        if self.bucket is None:
+            return 0.0
+        wait = self.bucket.reserve(max_wait=deadline - time.monotonic())
+        if wait is None:
+            raise DeadlineExceeded("LLM rate limit would delay the call past its deadline")
+        return wait
+
+    def _on_error(self, error: Exception, attempt: int, deadline: float) -> float:
+        """Record a failed attempt; return the backoff delay, or raise."""
+        with self._metrics_lock:
+            self.errors[type(error).__name__] += 1
+        if _loop_closed(error):
+            # A connection left over from a finished event loop: says nothing about upstream
+            self.breaker.cancel_trial()
+            raise error
+        if not _retryable(error):
+            # Upstream answered (e.g. 400): it is healthy, the request is not
+            if getattr(error, "response", None) is not None:
+                self.breaker.record_success()
+            else:
+                self.breaker.cancel_trial()
+            raise error
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            raise RetriesExhausted(f"LLM call failed after {attempt + 1} attempts: {error!r}") from error
+        delay = _retry_after(error)
+        if delay is None:
+            delay = self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise DeadlineExceeded(
+                f"No time left to retry within the {self.timeout:g}s deadline: {error!r}") from error
+        self._count("retries")
+        return delay
+
+    # --- sync ---
+
+    @contextmanager
+    def _slot(self, deadline: float):
+        t0 = time.monotonic()
+        if not self._slots.acquire(timeout=max(0.0, deadline - t0)):
+            raise DeadlineExceeded(f"No LLM slot free within {self.timeout:g}s")
+        try:
+            self._observe(self.queue_wait, time.monotonic() - t0)
+            yield
+        finally:
+            self._slots.release()
+
+    def _create(self, deadline: float, kwargs: dict):
+        client = self.sync_client
+        attempt = 0
+        while True:
+            time.sleep(self._rate_wait(deadline))
+            timeout = self._attempt_timeout(deadline)
+            self.breaker.before_attempt()
+            self._count("attempts")
+            t0 = time.monotonic()
+            try:
+                result = client.chat.completions.create(**kwargs, timeout=timeout)
+            except Exception as e:
+                self._observe(self.upstream, time.monotonic() - t0)
+                time.sleep(self._on_error(e, attempt, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.cancel_trial()
+                raise
+            self._observe(self.upstream, time.monotonic() - t0)
+            self.breaker.record_success()
+            return result
+
+    def complete(self, **kwargs):
+        """chat.completions.create(**kwargs) with the protections above."""
+        deadline = time.monotonic() + self.timeout
+        self._count("calls")
+        try:
+            with self._slot(deadline):
+                result = self._create(deadline, kwargs)
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("succeeded")
+        return result
+
+    def stream(self, **kwargs) -> Iterator:
+        """
+        Streaming chat.completions.create(**kwargs, stream=True): yields the
+        chunks. Retries happen only before the first chunk; the concurrency
+        slot is held until the stream is consumed or closed.
+        """
+        deadline = time.monotonic() + self.timeout
+        self._count("calls")
+        try:
+            with self._slot(deadline):
+                with self._create(deadline, {**kwargs, "stream": True}) as chunks:
+                    yield from chunks
+        except GeneratorExit:
+            raise
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("succeeded")
+
+    # --- async ---
+
+    @asynccontextmanager
+    async def _async_slot(self, deadline: float):
+        """Hold one of the running loop's slots; yields that loop's client."""
+        (slots, client), stale = self._async_state()
+        for old in stale:
+            await self._discard(old)
+        t0 = time.monotonic()
+        try:
+            await asyncio.wait_for(slots.acquire(), max(0.0, deadline - t0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"No LLM slot free within {self.timeout:g}s") from None
+        try:
+            self._observe(self.queue_wait, time.monotonic() - t0)
+            yield client
+        finally:
+            slots.release()
+
+    async def complete_async(self, **kwargs):
+        """Async complete(): the same policy on the AsyncOpenAI client."""
+        deadline = time.monotonic() + self.timeout
+        self._count("calls")
+        try:
+            async with self._async_slot(deadline) as client:
+                attempt = 0
+                while True:
+                    await asyncio.sleep(self._rate_wait(deadline))
+                    timeout = self._attempt_timeout(deadline)
+                    self.breaker.before_attempt()
+                    self._count("attempts")
+                    t0 = time.monotonic()
+                    try:
+                        result = await client.chat.completions.create(**kwargs, timeout=timeout)
+                    except Exception as e:
+                        self._observe(self.upstream, time.monotonic() - t0)
+                        await asyncio.sleep(self._on_error(e, attempt, deadline))
+                        attempt += 1
+                        continue
+                    except BaseException:  # e.g. the caller's task was cancelled
+                        self.breaker.cancel_trial()
+                        raise
+                    self._observe(self.upstream, time.monotonic() - t0)
+                    self.breaker.record_success()
+                    break
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("succeeded")
+        return result
+
+    async def aclose(self) -> None:
+        """Close the running event loop's connection pool (call before the loop ends)."""
+        with self._init_lock:
+            state = self._async.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[1].close()
+
+    def close(self) -> None:
+        """Close the sync connection pool (async ones: aclose(), or dropped after their loop closes)."""
+        if self._sync_client is not None:
+            self._sync_client.close()
+
+
+# --- Benchmark against the stub server ---
+
+def _run_load(call, n_requests: int, concurrency: int) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            call(i)
+            return True, time.perf_counter() - t0, None
+        except Exception as e:
+            # Name the upstream error behind RetriesExhausted / DeadlineExceeded
+            cause = f"({type(e.__cause__).__name__})" if e.__cause__ is not None else ""
+            return False, time.perf_counter() - t0, type(e).__name__ + cause
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    seconds = time.perf_counter() - t0
+    ok = sorted(s for good, s, _ in results if good)
+    return {
+        "ok": len(ok),
+        "failed": Counter(err for good, _, err in results if not good),
+        "seconds": seconds,
+        "p50_s": ok[len(ok) // 2] if ok else float("nan"),
+        "max_s": max(s for _, s, _ in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resilient LLM client; benchmark against the stub server.")
+    parser.add_argument("--bench", action="store_true", help="Compare the raw OpenAI client and LLMClient")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="Caller threads")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="Share of stub requests that fail")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of stub requests that hang")
+    parser.add_argument("--slow-latency", type=float, default=30.0, help="Seconds a hanging request takes")
+    parser.add_argument("--timeout", type=float, default=5.0, help="LLMClient deadline per call")
+    parser.add_argument("--attempt-timeout", type=float, default=0.5, help="LLMClient seconds per attempt")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="LLMClient requests in flight")
+    parser.add_argument("--rate", type=float, help="LLMClient attempts per second (default: unlimited)")
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+        return
+
+    import stub_llm_server
+    from openai import OpenAI
+
+    stub = stub_llm_server.start_in_thread(
+        port=0, latency=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+        retry_after=None, slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=0)
+    base_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    request = dict(model="stub", messages=[{"role": "user", "content": "Question: ping"}])
+
+    # The SDK default: 2 retries, a 10-minute timeout; capped here so the run ends
+    raw = OpenAI(api_key="stub", base_url=base_url, timeout=args.slow_latency * 2)
+    client = LLMClient(api_key="stub", base_url=base_url, max_concurrency=args.max_concurrency,
+                       timeout=args.timeout, attempt_timeout=args.attempt_timeout, connect_timeout=1.0,
+                       backoff_base=0.05, backoff_max=1.0, rate_per_s=args.rate,
+                       breaker_threshold=20, breaker_reset_s=1.0)
+
+    print(f"📊 {args.requests} requests, {args.concurrency} callers; stub: {args.latency}s latency, "
+          f"{args.error_rate:.0%} {args.error_status} errors, {args.slow_rate:.0%} hang {args.slow_latency:g}s")
+    print(f"{'client':<22}{'ok':>6}{'failed':>8}{'p50 s':>8}{'max s':>8}{'wall s':>8}  errors")
+    try:
+        for name, call in (("OpenAI (SDK retries)", lambda i: raw.chat.completions.create(**request)),
+                           ("LLMClient", lambda i: client.complete(**request))):
+            r = _run_load(call, args.requests, args.concurrency)
+            errors = ", ".join(f"{k} x{v}" for k, v in r["failed"].items()) or "-"
+            print(f"{name:<22}{r['ok']:>6}{sum(r['failed'].values()):>8}{r['p50_s']:>8.2f}"
+                  f"{r['max_s']:>8.2f}{r['seconds']:>8.2f}  {errors}")
+        s = client.stats()
+        print(f"📊 LLMClient: {s['attempts']} attempts, {s['retries']} retries, circuit {s['circuit']} "
+              f"(opened {s['circuit_opened']}x); queue wait p95 {s['queue_wait_ms'].get('p95', 0):.1f} ms, "
+              f"upstream p95 {s['upstream_ms'].get('p95', 0):.1f} ms")
+    finally:
+        client.close()
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
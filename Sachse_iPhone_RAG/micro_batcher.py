@@ -0,0 +1,131 @@
+"""
+Micro Batcher
+-------------
+Dynamic micro-batching for the models behind server.py.
+
+Requests arrive one question at a time, but the bi-encoder and the
+cross-encoder are far cheaper per item in batches. A MicroBatcher sits in
+front of one batch function: concurrent submit() calls queue their items,
+and a single worker task takes the first waiting item, collects more until
+the batch holds `max_batch_size` items or `max_wait_ms` have passed, and
+runs the function once for all of them in a thread pool.
+
+Only one batch per batcher runs at a time, so while the model is busy the
+next batch fills up on its own; `max_wait_ms` only matters when traffic is
+light, and trades a little latency for bigger batches.
+"""
+
+import asyncio
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent submit() calls into calls of `fn`.
+
+    Args:
+        fn (Callable): Takes a list of items, returns a list of results in
+            the same order. Runs in `executor`, never on the event loop.
+        max_batch_size (int): Most items per call of fn.
+        max_wait_ms (float): How long the first item of a batch waits for others.
+        executor: concurrent.futures executor for fn (None = the loop's default).
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, executor=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.reset_stats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+
+    def reset_stats(self) -> None:
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.mean_batch_size,
+            "largest_batch": self.largest,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": 1000 * self.max_wait,
+        }
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result (fn's exceptions propagate)."""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take everything already queued, then wait out the rest of max_wait
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that went away (e.g. a dropped connection) need no work
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            self.largest = max(self.largest, len(batch))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self) -> None:
+        """Stop the worker task; queued callers are cancelled."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+            self._worker = None
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Chunks
+---------------------
+Index-time removal of near-duplicate chunks with MinHash and LSH.
+
+With heavily overlapping chunks (chunk_size 150, chunk_overlap 100) and a
+Wikipedia page full of repeated tables and captions, many chunks say almost
+the same thing. rerank_chunks() only drops exact duplicates, after the
+cross-encoder has scored them; dropping near-duplicates before embedding
+saves the embedding time, the index space and the cross-encoder slots they
+would take.
+
+  - Signatures: every chunk becomes the set of its character 5-grams
+    (lowercased, whitespace squashed). A MinHash signature of `num_perm`
+    universal hashes estimates the Jaccard similarity of two sets as the
+    share of equal signature entries.
+  - LSH: signatures are cut into `bands` bands of `rows` entries, chosen so
+    that pairs at the threshold collide in at least one band with high
+    probability. Only chunks sharing a band bucket are compared.
+  - Collapse: chunks are visited in document order. A chunk whose estimated
+    similarity to an already kept chunk reaches `threshold` is represented
+    by the most similar one; otherwise it is kept. Comparing against kept
+    chunks only (no union-find) stops chains of sliding-window chunks from
+    merging a whole section into one.
+
+Adjacent chunks at the default sizes typically share about two thirds of
+their text, a 5-gram Jaccard similarity near 0.5; thresholds well above that
+only collapse chunks that nearly coincide (where sentence boundaries pull
+neighbours onto the same text) or text that repeats. The chunk containing a
+passage first is the one kept, so its offsets stay valid for context packing.
+
+Usage (index size, embed time and retrieval recall per threshold):
+    python near_dedup.py --report
+    python near_dedup.py --report --thresholds 0.9 0.8 0.7 --questions benchmark_questions.json
+"""
+
+import argparse
+import json
+import re
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_CHARS = 5
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def shingle_hashes(text: str, k: int = SHINGLE_CHARS) -> np.ndarray:
+    """32-bit hashes (as uint64) of the character k-grams of a normalized text."""
+    codes = np.frombuffer(_normalize(text).encode("utf-32-le"), dtype="uint32").astype("uint64")
+    if len(codes) < k:
+        # Short (or empty) texts are a single shingle
+        codes = np.concatenate([codes, np.zeros(k - len(codes), dtype="uint64")])
+    # Polynomial rolling hash over each window, then a multiplicative mix
+    windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+    powers = np.uint64(1000003) ** np.arange(k - 1, -1, -1, dtype="uint64")
+    h = (windows * powers).sum(axis=1, dtype="uint64")
+    h ^= h >> np.uint64(29)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(32)
+    return np.unique(h & _MASK32)
+
+
+class MinHasher:
+    """
+    MinHash signatures for lists of texts.
+
+    Args:
+        num_perm (int): Hash functions per signature (more = finer similarity estimates).
+        shingle_chars (int): Length of the character shingles.
+        seed (int): Seed for the hash coefficients; signatures are only comparable
+            between hashers with the same seed and num_perm.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_chars: int = SHINGLE_CHARS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_chars = shingle_chars
+        # Multiply-shift hashing, (a * h + b) >> 32 with odd a: universal, and
+        # no modulo in the inner loop
+        self._a = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype="uint64") * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype="uint64")
+
+    def signatures(self, texts: Sequence[str], block: int = 1 << 16) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: (len(texts), num_perm) uint32 signatures.
+        """
+        out = np.empty((len(texts), self.num_perm), dtype="uint32")
+        hashes = [shingle_hashes(t, self.shingle_chars) for t in texts]
+        # Hash the shingles of many texts at once (about `block` shingles per
+        # step) and take each text's minima with one reduceat
+        i = 0
+        while i < len(texts):
+            j, size = i, 0
+            while j < len(texts) and (j == i or size + len(hashes[j]) <= block):
+                size += len(hashes[j])
+                j += 1
+            flat = np.concatenate(hashes[i:j])
+            offsets = np.cumsum([0] + [len(h) for h in hashes[i:j - 1]])
+            values = (self._a * flat + self._b) >> np.uint64(32)
+            out[i:j] = np.minimum.reduceat(values, offsets, axis=1).T
+            i = j
+        return out
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows <= num_perm whose S-curve
+    1 - (1 - s**rows)**bands crosses 1/2 closest to `threshold`, preferring
+    more bands (fewer missed pairs; false candidates are checked anyway).
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        midpoint = (1 - 0.5 ** (1 / bands)) ** (1 / rows)
+        cost = abs(midpoint - threshold) - (0.02 if midpoint < threshold else 0.0)
+        if best is None or cost < best[0]:
+            best = (cost, bands, rows)
+    return best[1], best[2]
+
+
+def find_representatives(
+    texts: Sequence[str],
+    threshold: float = 0.8,
+    num_perm: int = NUM_PERM,
+    hasher: Optional[MinHasher] = None,
+) -> np.ndarray:
+    """
+    Map every text to the kept text that represents it.
+
+    Args:
+        texts (Sequence[str]): Chunks in document order.
+        threshold (float): Estimated Jaccard similarity at which a chunk counts
+            as a near-duplicate of an earlier kept one.
+        num_perm (int): Signature length (ignored when `hasher` is given).
+        hasher (MinHasher): Reuse a hasher, e.g. across thresholds.
+
+    Returns:
+        np.ndarray: int64 array; entry i is the index of the representative
+        of texts[i], and equals i for kept texts.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    hasher = hasher or MinHasher(num_perm)
+    sigs = hasher.signatures(texts)
+    bands, rows = lsh_params(threshold, hasher.num_perm)
+
+    buckets = [{} for _ in range(bands)]
+    rep = np.arange(len(texts), dtype="int64")
+    for i, sig in enumerate(sigs):
+        keys = [sig[b * rows:(b + 1) * rows].tobytes() for b in range(bands)]
+        candidates = {j for b, key in enumerate(keys) for j in buckets[b].get(key, ())}
+        if candidates:
+            cand = np.fromiter(candidates, dtype="int64", count=len(candidates))
+            sim = (sigs[cand] == sig).mean(axis=1)
+            best = int(np.argmax(sim))
+            if sim[best] >= threshold:
+                rep[i] = cand[best]
+                continue
+        # Kept: only representatives go into the buckets
+        for b, key in enumerate(keys):
+            buckets[b].setdefault(key, []).append(i)
+    return rep
+
+
+def dedupe_chunks(chunks: List[str], threshold: float = 0.8, num_perm: int = NUM_PERM) -> List[str]:
+    """The chunks that find_representatives() keeps, in document order."""
+    if not chunks:
+        return []
+    rep = find_representatives(chunks, threshold, num_perm)
+    return [c for i, c in enumerate(chunks) if rep[i] == i]
+
+
+# --- Report ---
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def dedup_report(questions: List[Tuple[str, str]], thresholds: Sequence[float], ks: Sequence[int]) -> List[dict]:
+    """
+    For each threshold: chunks kept, the index build time saved, and the
+    recall@k of dense retrieval (a retrieved chunk contains the expected
+    phrase) against indexing every chunk.
+
+    All chunks are embedded once; a threshold's index uses the subset of
+    those vectors, and its embed time is the full embed time scaled by the
+    share of characters it keeps (embedding cost is linear in text length).
+    """
+    import RAG_app
+    from ann_index import build_index, search
+
+    pipeline = RAG_app.pipeline
+    chunks = list(dict.fromkeys(pipeline.splitter.split_text(pipeline.text)))
+    embedder = pipeline.embedder
+
+    t0 = time.perf_counter()
+    vectors = np.asarray(embedder.encode(chunks, show_progress_bar=False), dtype="float32")
+    embed_s = time.perf_counter() - t0
+    lengths = np.array([len(c) for c in chunks], dtype="float64")
+
+    texts = [q for q, _ in questions]
+    expected = [_squash(e) for _, e in questions]
+    q_arr = RAG_app.encode_questions(texts)
+    metric = RAG_app.index_metric
+
+    hasher = MinHasher()
+    rows = []
+    for threshold in [None] + list(thresholds):
+        t0 = time.perf_counter()
+        if threshold is None:
+            keep = np.arange(len(chunks))
+        else:
+            rep = find_representatives(chunks, threshold, hasher=hasher)
+            keep = np.flatnonzero(rep == np.arange(len(chunks)))
+        dedup_s = time.perf_counter() - t0 if threshold is not None else 0.0
+
+        index = build_index(vectors[keep], "flat", metric=metric)
+        _, I = search(index, q_arr, max(ks))
+        row = {
+            "threshold": threshold,
+            "chunks": len(keep),
+            "shrink": 1 - len(keep) / len(chunks),
+            "dedup_s": dedup_s,
+            "embed_s": embed_s * lengths[keep].sum() / lengths.sum(),
+        }
+        for k in ks:
+            hits = sum(any(e in _squash(chunks[keep[i]]) for i in ids[:k] if i >= 0)
+                       for e, ids in zip(expected, I.tolist()))
+            row[f"recall@{k}"] = hits / len(questions)
+        rows.append(row)
+    return rows
+
+
+def print_report(rows: List[dict], ks: Sequence[int]) -> None:
+    base = rows[0]
+    recall_cols = "".join(f"{f'recall@{k}':>11}" for k in ks)
+    print(f"{'threshold':<11}{'chunks':>8}{'shrink':>8}{'dedup s':>9}{'embed s':>9}{'saved s':>9}{recall_cols}")
+    for r in rows:
+        name = "off" if r["threshold"] is None else f"{r['threshold']:.2f}"
+        recalls = "".join(f"{r[f'recall@{k}']:>11.2f}" for k in ks)
+        print(f"{name:<11}{r['chunks']:>8}{r['shrink']:>8.1%}{r['dedup_s']:>9.2f}{r['embed_s']:>9.2f}"
+              f"{base['embed_s'] - r['embed_s'] - r['dedup_s']:>9.2f}{recalls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate chunk removal report.")
+    parser.add_argument("--report", action="store_true", help="Compare index size, embed time and recall per threshold")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.9, 0.8, 0.7, 0.6])
+    parser.add_argument("--questions", default="benchmark_questions.json",
+                        help='JSON list of {"question": ..., "expected": ...}')
+    parser.add_argument("-k", type=int, nargs="+", default=[5, 20], help="Retrieval depths for recall")
+    args = parser.parse_args()
+
+    if not args.report:
+        parser.print_help()
+        return
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [(q["question"], q["expected"]) for q in json.load(f)]
+
+    rows = dedup_report(questions, args.thresholds, args.k)
+    print(f"📊 {rows[0]['chunks']} unique chunks, {len(questions)} questions "
+          f"(saved = embed time saved minus dedup time)")
+    print_report(rows, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+ONNX Backend
+------------
+Runs the bi-encoder and the cross-encoder with ONNX Runtime instead of
+PyTorch, for CPU-only hosts. Select it in RAG_app.py with
+model_backend = "onnx" (float32) or "onnx-int8" (dynamically quantized).
+
+  - Export: the first use loads the PyTorch model once and traces it with
+    torch.onnx.export. The bi-encoder graph includes pooling and
+    normalization, the cross-encoder graph the score activation, so the
+    outputs are what encode() / predict() return. model.onnx and the
+    tokenizer are cached in ONNX_CACHE_DIR/<kind>-<model>/.
+  - Quantization: onnxruntime's quantize_dynamic stores the MatMul/Gemm
+    weights as int8 and quantizes activations on the fly (model.int8.onnx,
+    about 4x smaller; fastest on CPUs with AVX2/VNNI integer dot products).
+  - Inference: OnnxEmbedder and OnnxCrossEncoder offer the encode() /
+    predict() / tokenizer interface of the sentence-transformers classes,
+    so retrieve_chunks() and rerank_chunks() use them unchanged. Inputs are
+    sorted by length and padded per batch, as sentence-transformers does.
+
+Later runs only load the cached .onnx file and the tokenizer; torch is not
+imported.
+
+Usage (latency and ranking agreement of every backend against PyTorch):
+    python onnx_backend.py --bench
+"""
+
+import argparse
+import inspect
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+MODEL_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+ONNX_CACHE_DIR = os.path.join(".rag_cache", "onnx")
+MANIFEST_FILE = "manifest.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+OPSET = 17
+
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def _model_dir(cache_dir: str, kind: str, model_name: str) -> str:
+    return os.path.join(cache_dir, f"{kind}-{re.sub(r'[^A-Za-z0-9_.-]+', '__', model_name)}")
+
+
+# --- Export ---
+
+def _export(model_name: str, kind: str, path: str) -> None:
+    """Trace the PyTorch model into path/model.onnx and save its tokenizer and manifest."""
+    import torch
+
+    if kind == "embedder":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device="cpu")
+        tokenizer, max_length = model.tokenizer, model.max_seq_length
+        dim = model.get_sentence_embedding_dimension()
+        sample = tokenizer(["an example sentence", "a second, somewhat longer example sentence"],
+                           padding=True, return_tensors="pt")
+
+        class Graph(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.model = model  # a submodule, so its weights become graph initializers
+
+            def forward(self, *inputs):
+                return self.model(dict(zip(names, inputs)))["sentence_embedding"]
+    else:
+        from sentence_transformers import CrossEncoder
+        model = CrossEncoder(model_name, device="cpu")
+        tokenizer, max_length = model.tokenizer, model.max_length or model.tokenizer.model_max_length
+        dim = model.model.config.num_labels
+        # sentence-transformers >= 4 calls it activation_fn
+        activation = getattr(model, "activation_fn", None) or getattr(model, "default_activation_function", None)
+        activation = activation or torch.nn.Identity()
+        sample = tokenizer(["a question", "another question"], ["a passage", "a somewhat longer passage"],
+                           padding=True, return_tensors="pt")
+
+        class Graph(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.model = model.model
+                self.activation = activation
+
+            def forward(self, *inputs):
+                logits = self.model(**dict(zip(names, inputs))).logits
+                return self.activation(logits.squeeze(-1) if dim == 1 else logits)
+
+    names = [n for n in _INPUT_NAMES if n in sample]
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic_axes["output"] = {0: "batch"}
+
+    # torch >= 2.5 has a dynamo exporter (the default from 2.9); keep the
+    # TorchScript one, which older versions use without being asked
+    options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            Graph().eval(), tuple(sample[n] for n in names), os.path.join(path, FP32_FILE),
+            input_names=names, output_names=["output"], dynamic_axes=dynamic_axes,
+            opset_version=OPSET, **options,
+        )
+    tokenizer.save_pretrained(path)
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "kind": kind,
+            "inputs": names,
+            "max_length": int(max_length),
+            "dim": int(dim),
+            "opset": OPSET,
+            "torch": torch.__version__,
+        }, f, indent=2)
+
+
+def _quantize(path: str) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".onnx", dir=path)
+    os.close(fd)
+    try:
+        quantize_dynamic(os.path.join(path, FP32_FILE), tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, os.path.join(path, INT8_FILE))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def ensure_exported(model_name: str, kind: str, quantize: bool = False, cache_dir: str = ONNX_CACHE_DIR) -> str:
+    """
+    Export (and quantize) the model unless the cache already has it.
+
+    Args:
+        model_name (str): sentence-transformers / Hugging Face model id.
+        kind (str): "embedder" (SentenceTransformer) or "cross-encoder".
+        quantize (bool): Also produce the int8 model.
+        cache_dir (str): Root of the ONNX cache.
+
+    Returns:
+        str: Path of the .onnx file to load.
+    """
+    if kind not in ("embedder", "cross-encoder"):
+        raise ValueError(f"Unknown model kind {kind!r}")
+    path = _model_dir(cache_dir, kind, model_name)
+
+    if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        print(f"⚙️ Exporting {model_name} to ONNX (once) ...")
+        os.makedirs(cache_dir, exist_ok=True)
+        # Export into a temporary directory and rename it, so a crash never leaves half an entry
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+        try:
+            _export(model_name, kind, tmp)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(tmp, path)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    if quantize and not os.path.exists(os.path.join(path, INT8_FILE)):
+        print(f"⚙️ Quantizing {model_name} to int8 (once) ...")
+        _quantize(path)
+    return os.path.join(path, INT8_FILE if quantize else FP32_FILE)
+
+
+# --- Inference ---
+
+class _OnnxModel:
+    """ONNX Runtime session plus the tokenizer saved next to the model."""
+
+    def __init__(self, onnx_path: str, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.onnx_path = onnx_path
+        directory = os.path.dirname(onnx_path)
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.max_length = self.manifest["max_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self._inputs = [i.name for i in self.session.get_inputs()]
+
+    def _tokenize(self, items: list) -> dict:
+        raise NotImplementedError
+
+    def _length(self, item) -> int:
+        raise NotImplementedError
+
+    def _run_batches(self, items: list, batch_size: int) -> np.ndarray:
+        """Run `items` longest first in batches and return the outputs in input order."""
+        order = np.argsort([-self._length(x) for x in items], kind="stable")
+        out = None
+        for i in range(0, len(order), batch_size):
+            idx = order[i:i + batch_size]
+            enc = self._tokenize([items[j] for j in idx])
+            result = self.session.run(None, {n: enc[n].astype("int64") for n in self._inputs})[0]
+            if out is None:
+                out = np.empty((len(items),) + result.shape[1:], dtype="float32")
+            out[idx] = result
+        return out
+
+
+class OnnxEmbedder(_OnnxModel):
+    """ONNX Runtime stand-in for SentenceTransformer (encode, tokenizer, dimension)."""
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.manifest["dim"]
+
+    def _tokenize(self, items: list) -> dict:
+        return self.tokenizer(items, padding=True, truncation=True, max_length=self.max_length,
+                              return_tensors="np")
+
+    def _length(self, item) -> int:
+        return len(item)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Embed a string or a list of strings (float32, like SentenceTransformer.encode)."""
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size)[0]
+        sentences = list(sentences)
+        if not sentences:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype="float32")
+        return self._run_batches(sentences, batch_size)
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    """ONNX Runtime stand-in for CrossEncoder.predict()."""
+
+    def _tokenize(self, items: list) -> dict:
+        return self.tokenizer([a for a, _ in items], [b for _, b in items], padding=True,
+                              truncation="longest_first", max_length=self.max_length, return_tensors="np")
+
+    def _length(self, item) -> int:
+        return len(item[0]) + len(item[1])
+
+    def predict(self, sentences: Sequence, batch_size: int = 32, show_progress_bar: bool = False,
+                **kwargs) -> np.ndarray:
+        """Score (query, passage) pairs; higher = more relevant."""
+        pairs = [tuple(p) for p in sentences]
+        if not pairs:
+            return np.empty(0, dtype="float32")
+        return self._run_batches(pairs, batch_size)
+
+
+def load_embedder(model_name: str, quantize: bool = False, cache_dir: str = ONNX_CACHE_DIR,
+                  threads: Optional[int] = None) -> OnnxEmbedder:
+    return OnnxEmbedder(ensure_exported(model_name, "embedder", quantize, cache_dir), threads)
+
+
+def load_cross_encoder(model_name: str, quantize: bool = False, cache_dir: str = ONNX_CACHE_DIR,
+                       threads: Optional[int] = None) -> OnnxCrossEncoder:
+    return OnnxCrossEncoder(ensure_exported(model_name, "cross-encoder", quantize, cache_dir), threads)
+
+
+# --- Benchmark ---
+
+def _ms_per_call(fn, calls: int, repeats: int) -> float:
+    """Milliseconds per call of `fn`, which makes `calls` model calls, after one warm-up run."""
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return 1000 * (time.perf_counter() - t0) / (repeats * calls)
+
+
+def _model_mb(model) -> float:
+    """Size of the ONNX file, or of the PyTorch parameters."""
+    if isinstance(model, _OnnxModel):
+        return os.path.getsize(model.onnx_path) / 2**20
+    torch_module = getattr(model, "model", model)  # CrossEncoder wraps the HF model
+    return sum(p.numel() * p.element_size() for p in torch_module.parameters()) / 2**20
+
+
+def _overlap(a: Sequence, b: Sequence) -> float:
+    return len(set(a) & set(b)) / max(len(b), 1)
+
+
+def _spearman(a: np.ndarray, b: np.ndarray) -> float:
+    ra, rb = np.argsort(np.argsort(a)), np.argsort(np.argsort(b))
+    if len(a) < 2:
+        return 1.0
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def benchmark(questions: List[str], chunks: List[str], embedder_name: str, cross_encoder_name: str,
+              k: int = 20, m: int = 8, repeats: int = 3, cache_dir: str = ONNX_CACHE_DIR) -> List[dict]:
+    """
+    Compare the ONNX backends with PyTorch on `questions` over `chunks`.
+
+    Latency: one question per encode() call, one question's k pairs per
+    predict() call (`repeats` passes over the questions), and chunks/s for
+    bulk embedding. Model size: both models together. Agreement, averaged
+    over questions: cosine between embeddings, overlap of the top-k
+    retrieved chunks, overlap of the top-m reranked chunks and the Spearman
+    correlation of the cross-encoder scores, all against PyTorch.
+    """
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    backends = {"torch": (SentenceTransformer(embedder_name, device="cpu"), CrossEncoder(cross_encoder_name, device="cpu"))}
+    for name, quantize in (("onnx", False), ("onnx-int8", True)):
+        backends[name] = (load_embedder(embedder_name, quantize, cache_dir),
+                          load_cross_encoder(cross_encoder_name, quantize, cache_dir))
+
+    # Candidates for reranking: PyTorch's top-k, so every backend scores the same pairs
+    ref = {}
+    rows = []
+    for name, (embedder, reranker) in backends.items():
+        t0 = time.perf_counter()
+        doc_vecs = np.asarray(embedder.encode(chunks, batch_size=64), dtype="float32")
+        chunks_per_s = len(chunks) / (time.perf_counter() - t0)
+        q_vecs = np.asarray(embedder.encode(questions), dtype="float32")
+        top_k = np.argsort(-(q_vecs @ doc_vecs.T), axis=1)[:, :k]
+        if name == "torch":
+            ref = {"q_vecs": q_vecs, "top_k": top_k, "scores": []}
+        pair_lists = [[(q, chunks[i]) for i in ids] for q, ids in zip(questions, ref["top_k"])]
+        scores = [np.asarray(reranker.predict(pairs), dtype="float32") for pairs in pair_lists]
+        if name == "torch":
+            ref["scores"] = scores
+
+        encode_ms = _ms_per_call(lambda: [embedder.encode([q]) for q in questions], len(questions), repeats)
+        rerank_ms = _ms_per_call(lambda: [reranker.predict(p) for p in pair_lists], len(questions), repeats)
+
+        cos = np.sum(q_vecs * ref["q_vecs"], axis=1) / (
+            np.linalg.norm(q_vecs, axis=1) * np.linalg.norm(ref["q_vecs"], axis=1) + 1e-12)
+        rows.append({
+            "backend": name,
+            "model_mb": _model_mb(embedder) + _model_mb(reranker),
+            "encode_ms": encode_ms,
+            "chunks_per_s": chunks_per_s,
+            "rerank_ms": rerank_ms,
+            "cosine": float(cos.mean()),
+            f"retrieval@{k}": float(np.mean([_overlap(a, b) for a, b in zip(top_k.tolist(), ref["top_k"].tolist())])),
+            f"rerank@{m}": float(np.mean([_overlap(np.argsort(-s)[:m], np.argsort(-r)[:m])
+                                         for s, r in zip(scores, ref["scores"])])),
+            "spearman": float(np.mean([_spearman(s, r) for s, r in zip(scores, ref["scores"])])),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime backends for the RAG models.")
+    parser.add_argument("--bench", action="store_true", help="Compare latency and rankings with PyTorch")
+    parser.add_argument("--export", action="store_true", help="Only export (and quantize) both models")
+    parser.add_argument("--questions", default="benchmark_questions.json")
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks of Selected_Document.txt to search")
+    args = parser.parse_args()
+
+    import RAG_app
+
+    if args.export:
+        for kind, name in (("embedder", RAG_app.model_name), ("cross-encoder", RAG_app.cross_encoder_name)):
+            print(f"✅ {ensure_exported(name, kind, quantize=True)}")
+        return
+    if not args.bench:
+        parser.print_help()
+        return
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [q["question"] for q in json.load(f)]
+    chunks = RAG_app.pipeline.splitter.split_text(RAG_app.pipeline.text)[:args.chunks]
+
+    rows = benchmark(questions, chunks, RAG_app.model_name, RAG_app.cross_encoder_name, RAG_app.top_k, RAG_app.top_m)
+    keys = [key for key in rows[0] if key.startswith(("retrieval@", "rerank@"))]
+    print(f"📊 {len(questions)} questions, {len(chunks)} chunks; agreement is against PyTorch")
+    print(f"{'backend':<11}{'MB':>8}{'encode ms':>10}{'chunks/s':>10}{'rerank ms':>10}{'cosine':>9}"
+          + "".join(f"{key:>13}" for key in keys) + f"{'spearman':>10}")
+    for r in rows:
+        print(f"{r['backend']:<11}{r['model_mb']:>8.1f}{r['encode_ms']:>10.2f}{r['chunks_per_s']:>10.1f}{r['rerank_ms']:>10.2f}"
+              f"{r['cosine']:>9.4f}" + "".join(f"{r[key]:>13.3f}" for key in keys) + f"{r['spearman']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Parallel Embedding
+------------------
+Multi-process bi-encoder embedding for large-corpus ingestion.
+
+A single `embedder.encode(chunks)` call runs in one process and leaves
+most cores of a CPU-only box idle. EmbeddingPool starts a pool of worker
+processes (spawned, each loading its own copy of the model with a fixed
+number of torch threads) and:
+
+  - cuts the input into windows of `window` chunks, so memory stays
+    bounded and results can be streamed;
+  - sorts each window by length before cutting it into batches, so chunks
+    of similar length are padded together and little compute is wasted on
+    padding tokens;
+  - scatters each batch's vectors back to their original positions and
+    yields windows in input order while later windows are still encoding.
+
+Consumers take the blocks as they arrive: ChunkIndex.sync() (index_cache.py)
+copies each one into its embedding matrix and adds it to FAISS, and corpus
+ingestion fills the shard matrix (or the on-disk embedding file) block by
+block, so no second full-size copy of the vectors is made. iter_blocks() and
+collect_blocks() accept either an iterator of blocks or a plain array, so
+encode callables may return either.
+
+Usage (throughput per core and speedup over the single-process call):
+    python parallel_embed.py --bench --workers 4 --chunks 4000
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# Per-worker model, loaded once by _init_worker
+_MODEL = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _MODEL
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from transformers import logging as hf_logging
+    hf_logging.set_verbosity_error()
+    from sentence_transformers import SentenceTransformer
+    _MODEL = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    vecs = _MODEL.encode(texts, batch_size=len(texts), show_progress_bar=False)
+    return np.asarray(vecs, dtype="float32")
+
+
+def _warm_up_worker(text: str) -> int:
+    _encode_batch([text])
+    time.sleep(0.05)  # stay busy so the other warm-up tasks go to other workers
+    return os.getpid()
+
+
+def iter_blocks(result) -> Iterator[np.ndarray]:
+    """The float32 blocks of an encode result: one array, or an iterator of arrays in input order."""
+    if isinstance(result, np.ndarray):
+        result = (result,)
+    for block in result:
+        yield np.asarray(block, dtype="float32")
+
+
+def collect_blocks(result, n: int) -> np.ndarray:
+    """Stack an encode result of `n` vectors into one preallocated float32 array."""
+    out, done = None, 0
+    for block in iter_blocks(result):
+        if out is None:
+            out = np.empty((n, block.shape[1]), dtype="float32")
+        out[done:done + len(block)] = block
+        done += len(block)
+    if out is None:
+        return np.empty((0, 0), dtype="float32")
+    if done != n:
+        raise ValueError(f"encoder returned {done} vectors for {n} chunks")
+    return out
+
+
+def length_sorted_batches(texts: List[str], batch_size: int) -> List[np.ndarray]:
+    """
+    Index arrays of batches of `texts`, longest first, so each batch holds
+    chunks of similar length (character length stands in for token count).
+    """
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+class EmbeddingPool:
+    """
+    Worker processes that each hold a SentenceTransformer.
+
+    Args:
+        model_name (str): Bi-encoder to load in every worker.
+        workers (int): Worker processes (default: one per core).
+        threads_per_worker (int): torch threads per worker.
+        batch_size (int): Chunks per encode call in a worker.
+        window (int): Chunks length-sorted together and yielded as one block.
+    """
+
+    def __init__(self, model_name: str, workers: Optional[int] = None, threads_per_worker: int = 1,
+                 batch_size: int = 64, window: int = 4096):
+        self.workers = workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self.window = window
+        # spawn: forking a process that already initialized torch can deadlock
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads_per_worker),
+        )
+
+    @property
+    def cores(self) -> int:
+        return self.workers * self.threads_per_worker
+
+    def _submit_window(self, texts: List[str]):
+        batches = length_sorted_batches(texts, self.batch_size)
+        futures = [self._pool.submit(_encode_batch, [texts[i] for i in idx]) for idx in batches]
+        return len(texts), batches, futures
+
+    @staticmethod
+    def _collect_window(n: int, batches, futures) -> np.ndarray:
+        out = None
+        for idx, future in zip(batches, futures):
+            vecs = future.result()
+            if out is None:
+                out = np.empty((n, vecs.shape[1]), dtype="float32")
+            out[idx] = vecs
+        return out
+
+    def iter_encode(self, texts: Iterable[str], prefetch: int = 2) -> Iterator[np.ndarray]:
+        """
+        Encode a stream of chunks, yielding float32 blocks in input order
+        (one per window) while up to `prefetch` further windows are encoding.
+        """
+        pending = deque()
+        window: List[str] = []
+        for text in texts:
+            window.append(text)
+            if len(window) >= self.window:
+                pending.append(self._submit_window(window))
+                window = []
+                while len(pending) > prefetch:
+                    yield self._collect_window(*pending.popleft())
+        if window:
+            pending.append(self._submit_window(window))
+        while pending:
+            yield self._collect_window(*pending.popleft())
+
+    def warm_up(self, text: str = "warm-up") -> None:
+        """
+        Start every worker and run one encode in each. Workers are spawned on
+        demand and load their model first, so without this the first real
+        call also pays for the model loads.
+        """
+        started = set()
+        while len(started) < self.workers:
+            futures = [self._pool.submit(_warm_up_worker, text) for _ in range(self.workers)]
+            started.update(f.result() for f in futures)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a list of chunks; drop-in for embedder.encode(chunks)."""
+        return collect_blocks(self.iter_encode(texts), len(texts))
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Benchmark ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process embedding throughput benchmark.")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--chunks", type=int, default=4000, help="Chunks of Selected_Document.txt to embed")
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+        return
+
+    import RAG_app
+
+    chunks = RAG_app.pipeline.splitter.split_text(RAG_app.pipeline.text)
+    chunks = (chunks * (args.chunks // max(len(chunks), 1) + 1))[:args.chunks]
+
+    try:
+        import torch
+        single_cores = torch.get_num_threads()
+    except ImportError:
+        single_cores = 1
+
+    embedder = RAG_app.pipeline.embedder
+    t0 = time.perf_counter()
+    baseline = np.asarray(embedder.encode(chunks, show_progress_bar=False), dtype="float32")
+    single_s = time.perf_counter() - t0
+
+    with EmbeddingPool(RAG_app.model_name, args.workers, args.threads_per_worker, args.batch_size) as pool:
+        pool.warm_up(chunks[0])
+        t0 = time.perf_counter()
+        parallel = pool.encode(chunks)
+        pool_s = time.perf_counter() - t0
+        pool_cores = pool.cores
+
+    print(f"📊 {len(chunks)} chunks; max |Δ| vs single call {np.abs(parallel - baseline).max():.2e}")
+    print(f"{'mode':<28}{'cores':>6}{'seconds':>9}{'chunks/s':>10}{'/s/core':>9}")
+    for name, cores, secs in (("single encode() call", single_cores, single_s),
+                              (f"pool {args.workers}x{args.threads_per_worker}", pool_cores, pool_s)):
+        rate = len(chunks) / secs
+        print(f"{name:<28}{cores:>6}{secs:>9.2f}{rate:>10.1f}{rate / cores:>9.1f}")
+    print(f"⏱️ Speedup: {single_s / pool_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Profiling
+---------
+Per-stage latency spans for the RAG pipeline.
+
+    from profiling import span
+
+    with span("rerank"):
+        scores = reranker.predict(pairs)
+
+Every span adds its duration to an in-process histogram for its stage name.
+Histograms keep Prometheus-style cumulative buckets (for the text export)
+plus a bounded window of recent samples (for exact p50/p95/p99).
+
+Profiling is off by default. A disabled span() returns one shared no-op
+context manager, so instrumented code pays a flag check and nothing else.
+Turn it on with `profiler.enabled = True` or `python RAG_app.py --profile`.
+
+Exports:
+  - profiler.report():        aligned text table (count, mean, p50/p95/p99, max)
+  - profiler.to_json():       the same numbers as a dict
+  - profiler.to_prometheus(): Prometheus text exposition format
+  - profiler.dump(path):      .json or .prom (anything else) by extension
+"""
+
+import bisect
+import contextlib
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+# Upper bounds (seconds) of the Prometheus histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Histogram:
+    """Latency histogram: bucket counts, sum and a window of recent samples."""
+
+    def __init__(self, window: int = 10000):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        """Quantile of the recent samples (nearest rank); 0.0 when empty."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "p50_s": self.quantile(0.50),
+            "p95_s": self.quantile(0.95),
+            "p99_s": self.quantile(0.99),
+            "max_s": self.max,
+        }
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "t0")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Profiler:
+    """Collects span durations into one Histogram per stage name."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = {}
+        self.last: Dict[str, float] = {}  # seconds per stage since the last clear_last()
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        """Context manager timing one stage (a shared no-op when disabled)."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add a duration measured elsewhere (ignored when disabled)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+            self.last[name] = self.last.get(name, 0.0) + seconds
+
+    def clear_last(self) -> None:
+        with self._lock:
+            self.last.clear()
+
+    def last_report(self) -> str:
+        """Time per stage since clear_last(), e.g. for the question just answered."""
+        with self._lock:
+            items = list(self.last.items())
+        return ", ".join(f"{n} {1000 * s:.1f} ms" for n, s in items) or "no spans recorded"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.last.clear()
+
+    # --- exports ---
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self.histograms.items())}
+
+    def report(self) -> str:
+        rows = self.to_json()
+        if not rows:
+            return "no spans recorded"
+        lines = [f"{'stage':<18}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for name, s in rows.items():
+            lines.append(f"{name:<18}{s['count']:>7}" + "".join(
+                f"{1000 * s[key]:>10.2f}" for key in ("mean_s", "p50_s", "p95_s", "p99_s", "max_s")))
+        return "\n".join(lines)
+
+    def to_prometheus(self, metric: str = "rag_stage_seconds") -> str:
+        lines = [f"# HELP {metric} Latency of RAG pipeline stages.", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(list(BUCKETS) + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {h.total}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Write the histograms to `path`: JSON for *.json, Prometheus text otherwise."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_json(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+
+
+profiler = Profiler()
+span = profiler.span
@@ -0,0 +1,127 @@
+"""
+Rerank Cascade
+--------------
+Two ways to spend less cross-encoder time in rerank_chunks():
+
+  - ScoreCache: an LRU cache of cross-encoder scores keyed by
+    (question hash, chunk hash), so repeated pairs are never re-scored.
+  - plan_rerank(): looks at the FAISS distances of the candidates and
+    decides whether the cross-encoder is needed at all.
+
+The cascade has three paths:
+
+  - "skip":   the gap between the m-th and (m+1)-th distance is large
+              relative to the spread of all candidates, so FAISS order is
+              trusted and the top m are returned unscored.
+  - "shrink": candidates far behind the m-th one (by more than `margin`
+              times the spread) are dropped before scoring.
+  - "full":   every candidate is scored (also when the cascade is off).
+
+`margin` is the accuracy/latency knob: a smaller margin skips more often
+and drops more candidates (faster); a larger one behaves more like full
+reranking (more accurate). None disables the cascade.
+"""
+
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional, Sequence, Tuple
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class ScoreCache:
+    """Thread-safe LRU cache of cross-encoder scores for (question, chunk) pairs."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scores: "OrderedDict[Tuple[bytes, bytes], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question: str, chunk: str) -> Tuple[bytes, bytes]:
+        return _digest(question), _digest(chunk)
+
+    def get(self, key) -> Optional[float]:
+        with self._lock:
+            score = self._scores.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._scores.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key, score: float) -> None:
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+
+
+def plan_rerank(distances: Sequence[float], m: int, margin: Optional[float]) -> Tuple[str, int]:
+    """
+    Decide how much cross-encoder work a candidate list needs.
+
+    Args:
+        distances (Sequence[float]): FAISS distances, ascending (best first).
+        m (int): Number of chunks that will be kept.
+        margin (float): Cascade knob (see module docstring); None = off.
+
+    Returns:
+        tuple: (path, n) where path is "skip", "shrink" or "full" and n is
+        how many leading candidates to keep ("skip": return the first n
+        unscored; otherwise: score the first n).
+    """
+    n = len(distances)
+    if margin is None or n <= m:
+        return "full", n
+
+    spread = float(distances[-1]) - float(distances[0])
+    if spread <= 0:
+        return "full", n
+
+    gap = (float(distances[m]) - float(distances[m - 1])) / spread
+    if gap >= margin:
+        return "skip", m
+
+    cutoff = float(distances[m - 1]) + margin * spread
+    keep = max(m, sum(1 for d in distances if d <= cutoff))
+    return ("shrink", keep) if keep < n else ("full", n)
+
+
+class CascadeStats:
+    """Counts how often each cascade path was taken and how many pairs were scored."""
+
+    def __init__(self):
+        self.paths = Counter()
+        self.pairs_scored = 0
+        self.pairs_total = 0
+        self._lock = threading.Lock()
+
+    def record(self, path: str, scored: int, total: int) -> None:
+        with self._lock:
+            self.paths[path] += 1
+            self.pairs_scored += scored
+            self.pairs_total += total
+
+    def report(self, score_cache: Optional[ScoreCache] = None) -> str:
+        """One-line summary of path frequencies and cross-encoder savings."""
+        queries = sum(self.paths.values()) or 1
+        parts = [f"{p} {100 * self.paths[p] / queries:.0f}%" for p in ("skip", "shrink", "full")]
+        line = (f"rerank cascade over {sum(self.paths.values())} queries: " + ", ".join(parts)
+                + f"; scored {self.pairs_scored}/{self.pairs_total} pairs")
+        if score_cache is not None:
+            lookups = score_cache.hits + score_cache.misses
+            rate = 100 * score_cache.hits / lookups if lookups else 0.0
+            line += f"; score cache hit rate {rate:.0f}%"
+        return line
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+RAG Server
+----------
+HTTP serving mode for RAG_app.py (aiohttp), so the pipeline can be called
+by other services instead of through the input() REPL:
+
+    POST /answer    {"question": "..."}           -> {"answer": "...", "cached": false, "source": "llm"}
+    POST /retrieve  {"question": "...", "k": 20}  -> {"chunks": [{"text", "doc_id", "start", "end"}, ...]}
+    GET  /stats                                   -> micro-batch sizes, answer sources, LLM client metrics
+                                                     and, with --profile, stage latencies
+
+Requests are handled concurrently. The question embeddings and the
+cross-encoder scores of all in-flight requests are computed in shared
+micro-batches (see micro_batcher.py): a batch closes at --max-batch-size
+items or --max-wait-ms after its first item. FAISS search, context packing
+and the answer cache run per request in RAG_app's CPU thread pool; chat
+completions go through RAG_app's LLMClient (llm_client.py): at most
+llm_concurrency at once, with deadlines, retries and a circuit breaker.
+
+Usage:
+    python server.py --port 8080 --max-batch-size 32 --max-wait-ms 5
+    curl -s localhost:8080/answer -d '{"question": "When was the iPhone 16e released?"}'
+
+    # Load test against the stub LLM: micro-batching off vs on
+    python server.py --bench --concurrency 32 --requests 512 --llm-latency 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from functools import partial
+from typing import List
+
+import numpy as np
+from aiohttp import web
+from openai import APIError
+
+import RAG_app
+from llm_client import LLMError
+from micro_batcher import MicroBatcher
+from profiling import profiler, span
+
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = 5.0
+
+
+def _encode_batch(questions: List[str]) -> list:
+    return list(RAG_app.encode_questions(questions))
+
+
+def _rerank_batch(items: List[tuple]) -> List[List[str]]:
+    """Rerank (question, candidate texts, distances) items in one cross-encoder pass."""
+    return RAG_app.rerank_chunks_batch(
+        [q for q, _, _ in items], [c for _, c, _ in items], m=RAG_app.top_m,
+        distance_lists=[d for _, _, d in items])
+
+
+class RAGService:
+    """The pipeline steps of RAG_app._prepare_answer(), with the models behind micro-batchers."""
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.encoder = None
+        self.reranker = None
+
+    async def start(self, app=None) -> None:
+        pool = RAG_app._async_state()
+        self.encoder = MicroBatcher(_encode_batch, self.max_batch_size, self.max_wait_ms, pool)
+        self.reranker = MicroBatcher(_rerank_batch, self.max_batch_size, self.max_wait_ms, pool)
+        # Load models and the index before the first request
+        await asyncio.get_running_loop().run_in_executor(pool, partial(RAG_app.pipeline.warm_up, background=False))
+
+    async def stop(self, app=None) -> None:
+        await self.encoder.close()
+        await self.reranker.close()
+
+    async def _retrieve(self, question: str, q_vec: np.ndarray, k: int):
+        """Reranked chunk texts and the SourceChunks they were retrieved as."""
+        pool = RAG_app._async_state()
+        loop = asyncio.get_running_loop()
+        sources, distances = await loop.run_in_executor(pool, partial(
+            RAG_app.retrieve_chunks, question, k, q_vec=q_vec, with_distances=True, with_sources=True))
+        relevant = await self.reranker.submit((question, [s.text for s in sources], distances))
+        return relevant, sources
+
+    async def retrieve(self, question: str, k: int) -> list:
+        q_vec = await self.encoder.submit(question)
+        relevant, sources = await self._retrieve(question, q_vec, k)
+        by_text = {}
+        for src in sources:
+            by_text.setdefault(RAG_app._normalize_ws(src.text), src)
+        return [by_text[t] for t in relevant if t in by_text]
+
+    async def answer(self, question: str) -> tuple:
+        """
+        Returns:
+            tuple: (answer, where it came from: "cache", "local" (extractive_mode) or "llm")
+        """
+        t0 = time.perf_counter()
+        answer, source = await self._answer(question)
+        RAG_app.extractive_stats.record(source, time.perf_counter() - t0)
+        return answer, source
+
+    async def _answer(self, question: str) -> tuple:
+        pool = RAG_app._async_state()
+        loop = asyncio.get_running_loop()
+        # SQLite reads and hit-count updates (and building the cache on first
+        # use) block, so they stay off the event loop like put() below
+        answer_cache = await loop.run_in_executor(pool, getattr, RAG_app.pipeline, "answer_cache")
+
+        cached = await loop.run_in_executor(pool, answer_cache.get_exact, question)
+        if cached is not None:
+            return cached, "cache"
+        q_vec = await self.encoder.submit(question)
+        cached = await loop.run_in_executor(pool, answer_cache.get_similar, q_vec)
+        if cached is not None:
+            return cached, "cache"
+
+        relevant, sources = await self._retrieve(question, q_vec, RAG_app.top_k)
+        local = await loop.run_in_executor(pool, RAG_app._local_answer, question, relevant)
+        if local is not None:
+            return local, "local"
+        context = await loop.run_in_executor(pool, RAG_app.build_context, q_vec, sources, relevant)
+        with span("llm"):
+            resp = await RAG_app.pipeline.client.complete_async(**RAG_app._completion_args(question, context))
+        answer = resp.choices[0].message.content.strip()
+        await loop.run_in_executor(pool, answer_cache.put, question, q_vec, answer)
+        return answer, "llm"
+
+
+# --- HTTP handlers ---
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": {"message": message}}, status=status)
+
+
+async def _read_question(request: web.Request):
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None, _error(400, "Body must be JSON")
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        return None, _error(400, '"question" must be a non-empty string')
+    return body, None
+
+
+async def handle_answer(request: web.Request) -> web.Response:
+    body, error = await _read_question(request)
+    if error:
+        return error
+    try:
+        with span("http.answer"):
+            answer, source = await request.app["service"].answer(body["question"].strip())
+    except LLMError as e:
+        # Deadline passed, retries exhausted or circuit open: upstream is slow or down
+        return _error(503, str(e))
+    except APIError as e:
+        # Upstream rejected the call (e.g. bad API key or model name): a server-side problem
+        return _error(502, f"LLM request failed: {e}")
+    return web.json_response({"answer": answer, "cached": source == "cache", "source": source})
+
+
+async def handle_retrieve(request: web.Request) -> web.Response:
+    body, error = await _read_question(request)
+    if error:
+        return error
+    k = body.get("k", RAG_app.top_k)
+    if not isinstance(k, int) or not 1 <= k <= 1000:
+        return _error(400, '"k" must be an integer between 1 and 1000')
+    with span("http.retrieve"):
+        chunks = await request.app["service"].retrieve(body["question"].strip(), k)
+    return web.json_response({"chunks": [
+        {"text": c.text, "doc_id": c.doc_id, "start": int(c.start), "end": int(c.end)} for c in chunks
+    ]})
+
+
+async def handle_stats(request: web.Request) -> web.Response:
+    service = request.app["service"]
+    return web.json_response({
+        "batchers": {"encode": service.encoder.stats(), "rerank": service.reranker.stats()},
+        "answers": RAG_app.extractive_stats.to_json(),
+        "llm": RAG_app.pipeline.client.stats() if RAG_app.pipeline.is_loaded("client") else None,
+        "stages": profiler.to_json(),
+    })
+
+
+def make_app(max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS) -> web.Application:
+    service = RAGService(max_batch_size, max_wait_ms)
+    app = web.Application()
+    app["service"] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.router.add_post("/answer", handle_answer)
+    app.router.add_post("/retrieve", handle_retrieve)
+    app.router.add_get("/stats", handle_stats)
+    return app
+
+
+# --- Load test ---
+
+async def load_test(url: str, questions: List[str], n_requests: int, concurrency: int) -> dict:
+    """
+    POST n_requests questions (cycling through `questions`) to `url` with
+    `concurrency` requests in flight.
+
+    Returns:
+        dict: requests, errors, seconds, req_per_s and p50/p95/p99 latency in ms.
+    """
+    import aiohttp
+
+    latencies, errors = [], 0
+    next_request = iter(range(n_requests))
+
+    async def client(session):
+        nonlocal errors
+        for i in next_request:
+            t0 = time.perf_counter()
+            async with session.post(url, json={"question": questions[i % len(questions)]}) as resp:
+                await resp.read()
+                if resp.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    t0 = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    seconds = time.perf_counter() - t0
+
+    ms = 1000 * np.asarray(latencies)
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "seconds": seconds,
+        "req_per_s": n_requests / seconds,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+async def _bench(args) -> None:
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [q["question"] for q in json.load(f)]
+
+    print(f"📊 {args.requests} requests to {args.path}, {args.concurrency} concurrent, "
+          f"stub LLM latency {args.llm_latency}s, llm_concurrency {RAG_app.llm_concurrency}")
+    print(f"{'mode':<26}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'encode batch':>14}{'rerank batch':>14}")
+    for name, size, wait in (("no batching", 1, 0.0),
+                             (f"batch {args.max_batch_size}, wait {args.max_wait_ms:g} ms",
+                              args.max_batch_size, args.max_wait_ms)):
+        app = make_app(size, wait)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        try:
+            url = f"http://127.0.0.1:{runner.addresses[0][1]}{args.path}"
+            await load_test(url, questions, min(args.concurrency, args.requests), args.concurrency)  # warm-up
+            service = app["service"]
+            service.encoder.reset_stats()
+            service.reranker.reset_stats()
+            r = await load_test(url, questions, args.requests, args.concurrency)
+        finally:
+            await runner.cleanup()
+        errors = f"  ⚠️ {r['errors']} errors" if r["errors"] else ""
+        print(f"{name:<26}{r['req_per_s']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+              f"{service.encoder.mean_batch_size:>14.1f}{service.reranker.mean_batch_size:>14.1f}{errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve RAG_app.py over HTTP with micro-batched models.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help="Most questions per encoder / cross-encoder batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="How long a batch waits to fill after its first question")
+    parser.add_argument("--profile", action="store_true", help="Record stage latencies for /stats")
+    parser.add_argument("--bench", action="store_true", help="Load-test against a stub LLM and exit")
+    parser.add_argument("--path", default="/answer", choices=("/answer", "/retrieve"), help="Endpoint to load-test")
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Seconds the stub LLM waits per request")
+    parser.add_argument("--questions", default="benchmark_questions.json")
+    args = parser.parse_args()
+    profiler.enabled = args.profile
+
+    if not args.bench:
+        web.run_app(make_app(args.max_batch_size, args.max_wait_ms), host=args.host, port=args.port)
+        return
+
+    import stub_llm_server
+
+    stub = stub_llm_server.start_in_thread(port=0, latency=args.llm_latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+    # Every request does the full work
+    RAG_app.answer_cache_path = ":memory:"
+    RAG_app.answer_cache_size = 0
+    RAG_app.rerank_cache_size = 0
+    RAG_app.context_log = False
+    RAG_app.llm_concurrency = max(RAG_app.llm_concurrency, args.concurrency)
+    try:
+        asyncio.run(_bench(args))
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Sparse Index
+------------
+BM25 keyword retrieval next to the dense FAISS index, for questions that
+hinge on exact terms (model numbers such as "A1549", "iPhone 15 Pro Max")
+that the bi-encoder tends to blur.
+
+BM25Index is a compact in-process inverted index: the vocabulary maps each
+term to a row of a CSR-style posting table (`indptr`, `postings`,
+`weights`), where each posting carries its precomputed BM25 term weight. A
+query sums the weights of its terms' postings with one np.bincount.
+
+reciprocal_rank_fusion() merges the BM25 and dense rankings; RAG_app.py
+uses it when `hybrid_search` is on, so a shorter fused candidate list goes
+to the cross-encoder.
+
+Usage (recall and latency of dense vs hybrid retrieval on Selected_Document.txt):
+    python sparse_index.py --report -k 10
+    python sparse_index.py --report --questions gold.json
+"""
+
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric runs; keeps model numbers like 'a1549' and '15' intact."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of chunks.
+
+    Args:
+        texts (Sequence[str]): Chunk texts.
+        ids (Sequence[int]): Id reported for each text (default: position).
+        k1 (float): Term-frequency saturation.
+        b (float): Length normalization.
+    """
+
+    def __init__(self, texts: Sequence[str], ids: Optional[Sequence[int]] = None,
+                 k1: float = 1.5, b: float = 0.75):
+        n = len(texts)
+        self.ids = np.asarray(ids if ids is not None else range(n), dtype="int64")
+        self.vocab: Dict[str, int] = {}
+
+        terms, docs, tfs = [], [], []
+        doc_len = np.zeros(n, dtype="float32")
+        for d, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len[d] = sum(counts.values())
+            for term, tf in counts.items():
+                terms.append(self.vocab.setdefault(term, len(self.vocab)))
+                docs.append(d)
+                tfs.append(tf)
+
+        # Group postings by term: row t is postings[indptr[t]:indptr[t + 1]]
+        terms = np.asarray(terms, dtype="int64")
+        order = np.argsort(terms, kind="stable")
+        self.postings = np.asarray(docs, dtype="int32")[order]
+        tf = np.asarray(tfs, dtype="float32")[order]
+        df = np.bincount(terms, minlength=len(self.vocab))
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype="int64")
+        np.cumsum(df, out=self.indptr[1:])
+
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype("float32")
+        avg_len = float(doc_len.mean()) if n else 1.0
+        norm = k1 * (1 - b + b * doc_len[self.postings] / (avg_len or 1.0))
+        self.weights = np.repeat(idf, df) * tf * (k1 + 1) / (tf + norm)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every chunk against the query terms and keep the best k.
+
+        Returns:
+            tuple: (scores, ids), best first; only chunks sharing at least one
+            term with the query are returned, so both may be shorter than k.
+        """
+        rows = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not rows or k <= 0:
+            return np.empty(0, dtype="float32"), np.empty(0, dtype="int64")
+
+        spans = [slice(self.indptr[t], self.indptr[t + 1]) for t in rows]
+        docs = np.concatenate([self.postings[s] for s in spans])
+        weights = np.concatenate([self.weights[s] for s in spans])
+        scores = np.bincount(docs, weights=weights, minlength=len(self.ids))
+
+        hit = np.flatnonzero(scores)
+        if len(hit) > k:
+            hit = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+        hit = hit[np.argsort(-scores[hit], kind="stable")]
+        return scores[hit].astype("float32"), self.ids[hit]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    k: int = 60,
+    limit: Optional[int] = None,
+) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse several ranked lists: each item scores sum(1 / (k + rank)) over the
+    lists it appears in (rank starting at 1).
+
+    Args:
+        rankings (Sequence[Sequence]): Ranked lists of hashable items, best first.
+        k (int): RRF constant; larger values flatten the contribution of top ranks.
+        limit (int): Keep only the best `limit` fused items.
+
+    Returns:
+        List[tuple]: (item, fused score), best first; ties keep first-seen order.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    return fused[:limit] if limit is not None else fused
+
+
+# --- Recall / latency report ---
+
+# (question, phrase that a relevant chunk contains) for Selected_Document.txt
+DEFAULT_QUESTIONS = [
+    ("Which iPhones have a Lightning port?", "Lightning port (iPhone 5"),
+    ("Which iPhones use a USB-C port?", "USB-C port (iPhone 15"),
+    ("When was the iPhone 16e released?", "February 28, 2025 iPhone 16e"),
+    ("What chip is in the iPhone 17 Pro?", "iPhone 17 Pro Apple A19 Pro"),
+    ("Which iPhone first had a Touch ID fingerprint sensor?", "iPhone 5s and later integrating a Touch ID"),
+    ("What replaced Touch ID on the iPhone X?", "Face ID facial recognition in place of Touch ID"),
+    ("Until when did AT&T have exclusive US sales of the iPhone?", "four years of exclusive U.S. sales"),
+]
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def recall_report(questions: List[Tuple[str, str]], k: int, depth: int) -> List[dict]:
+    """
+    Retrieve for every question with dense@depth, dense@k and hybrid@k and
+    measure recall (a retrieved chunk contains the expected phrase) and the
+    per-question retrieval and cross-encoder time.
+    """
+    import RAG_app
+
+    configs = [("dense", depth, False), ("dense", k, False), ("hybrid", k, True)]
+    texts = [q for q, _ in questions]
+    expected = [_squash(e) for _, e in questions]
+
+    # Load everything up front so the timings exclude model loading
+    RAG_app.pipeline.warm_up(background=False)
+    RAG_app.pipeline.bm25
+    q_arr = RAG_app.encode_questions(texts)
+
+    rows = []
+    saved = RAG_app.hybrid_search, RAG_app.hybrid_depth
+    try:
+        for name, kk, hybrid in configs:
+            RAG_app.hybrid_search, RAG_app.hybrid_depth = hybrid, depth
+            t0 = time.perf_counter()
+            candidates = RAG_app.retrieve_chunks_batch(texts, k=kk, q_arr=q_arr)
+            t_retrieve = time.perf_counter() - t0
+
+            RAG_app.score_cache.clear()
+            t0 = time.perf_counter()
+            RAG_app.rerank_chunks_batch(texts, candidates)
+            t_rerank = time.perf_counter() - t0
+
+            found = sum(any(e in _squash(c) for c in cands) for e, cands in zip(expected, candidates))
+            rows.append({
+                "retriever": name, "k": kk,
+                "recall": found / len(questions),
+                "retrieve_ms": 1000 * t_retrieve / len(questions),
+                "rerank_ms": 1000 * t_rerank / len(questions),
+            })
+    finally:
+        RAG_app.hybrid_search, RAG_app.hybrid_depth = saved
+    return rows
+
+
+def print_report(rows: List[dict]) -> None:
+    print(f"{'retriever':<10}{'k':>4}{'recall':>9}{'retrieve ms':>14}{'rerank ms':>12}")
+    for r in rows:
+        print(f"{r['retriever']:<10}{r['k']:>4}{r['recall']:>9.2f}"
+              f"{r['retrieve_ms']:>14.2f}{r['rerank_ms']:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 + dense hybrid retrieval report.")
+    parser.add_argument("--report", action="store_true", help="Compare dense and hybrid retrieval")
+    parser.add_argument("--questions", help='JSON list of {"question": ..., "expected": ...}')
+    parser.add_argument("-k", type=int, default=10, help="Candidates sent to the cross-encoder")
+    parser.add_argument("--depth", type=int, default=20, help="Hits per retriever before fusion")
+    args = parser.parse_args()
+
+    if not args.report:
+        parser.print_help()
+        return
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [(q["question"], q["expected"]) for q in json.load(f)]
+
+    print(f"📊 {len(questions)} questions, dense depth {args.depth}, fused k {args.k}")
+    print_report(recall_report(questions, args.k, args.depth))
+
+
+if __name__ == "__main__":
+    main()
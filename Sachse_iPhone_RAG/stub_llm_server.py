@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Stub LLM Server
+---------------
+A local stand-in for the OpenAI Chat Completions endpoint, so the RAG
+pipeline can be exercised (and load-tested) without network access or an
+API key. Every request sleeps for an artificial latency and then answers
+with a deterministic message that echoes the question. Requests with
+"stream": true get the answer as server-sent events, one word per event,
+spaced by a per-token delay.
+
+For testing clients under failure (see llm_client.py), a share of requests
+can fail with an error status (e.g. 429, with an optional Retry-After
+header, or 500/503) and another share can hang for `slow_latency` seconds,
+drawn from a seeded random generator so runs are reproducible.
+
+Usage:
+    python stub_llm_server.py --port 8000 --latency 0.5 --token-latency 0.05
+    python stub_llm_server.py --error-rate 0.2 --error-status 429 --retry-after 1 --slow-rate 0.05
+
+    # in another shell; the OpenAI client picks up OPENAI_BASE_URL
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=stub python RAG_app.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def _question_from(messages) -> str:
+    """Pull the 'Question: ...' line out of the last user message."""
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    match = re.search(r"Question:\s*(.*)", user)
+    return match.group(1).strip() if match else user.strip()[:80]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles POST /v1/chat/completions; configured through server attributes."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # no 40 ms delayed-ACK stalls on keep-alive connections
+
+    def handle(self):
+        # Clients that give up on a slow request (timeouts) just hang up
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request: dict, answer: str) -> None:
+        """Send the answer as chat.completion.chunk server-sent events."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+        }
+        words = answer.split(" ")
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": w if i == 0 else " " + w} for i, w in enumerate(words)]
+        for i, delta in enumerate(deltas):
+            if i > 0:
+                time.sleep(self.server.token_latency)
+            event = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        done = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        server = self.server
+        with server.lock:
+            roll = server.rng.random()
+            jitter = server.rng.uniform(-server.jitter, server.jitter)
+        failing = roll < server.error_rate
+        slow = not failing and roll < server.error_rate + server.slow_rate
+        time.sleep(server.slow_latency if slow else max(0.0, server.latency + jitter))
+        with server.lock:
+            server.requests_served += 1
+            server.errors_served += failing
+
+        if failing:
+            headers = {}
+            if server.retry_after is not None:
+                headers["Retry-After"] = f"{server.retry_after:g}"
+            self._send_json(server.error_status, {"error": {
+                "message": f"Injected error {server.error_status}",
+                "type": "rate_limit_error" if server.error_status == 429 else "server_error",
+            }}, headers)
+            return
+
+        answer = f"Stub answer to: {_question_from(request.get('messages', []))}"
+        if request.get("stream"):
+            self._send_stream(request, answer)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split()), "total_tokens": 0},
+        })
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8000, latency: float = 0.5,
+                jitter: float = 0.0, verbose: bool = False,
+                token_latency: float = 0.02, error_rate: float = 0.0,
+                error_status: int = 429, retry_after: Optional[float] = None,
+                slow_rate: float = 0.0, slow_latency: float = 30.0,
+                seed: Optional[int] = None) -> ThreadingHTTPServer:
+    """
+    Create (but do not start) a stub server. Pass port=0 to pick a free port;
+    the chosen one is in server.server_address[1].
+
+    error_rate of the requests get `error_status` (with a Retry-After header
+    when retry_after is set) and slow_rate of them answer only after
+    slow_latency seconds; `seed` makes the sequence reproducible.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.token_latency = token_latency
+    server.verbose = verbose
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.retry_after = retry_after
+    server.slow_rate = slow_rate
+    server.slow_latency = slow_latency
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests_served = 0
+    server.errors_served = 0
+    return server
+
+
+def start_in_thread(**kwargs) -> ThreadingHTTPServer:
+    """Start a stub server on a background thread and return it (call .shutdown() to stop)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Chat Completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- seconds added to latency")
+    parser.add_argument("--token-latency", type=float, default=0.02,
+                        help="Seconds between streamed tokens (stream=true requests)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of injected errors")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with injected errors")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests that hang")
+    parser.add_argument("--slow-latency", type=float, default=30.0, help="Seconds a hanging request takes")
+    parser.add_argument("--seed", type=int, help="Seed for error / hang injection and jitter")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.jitter, args.verbose, args.token_latency,
+                         args.error_rate, args.error_status, args.retry_after, args.slow_rate,
+                         args.slow_latency, args.seed)
+    host, port = server.server_address[:2]
+    print(f"✅ Stub LLM listening on http://{host}:{port}/v1 (latency {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Bye!")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,59 @@ PDF Extractor
 -------------
 Opens a PDF, extracts text from each page, cleans it, writes to
 Selected_Document.txt (UTF-8), and returns the combined text.
+
+For long PDFs, extract_pdf_to_file() splits the pages into slices of
+`pages_per_task` pages and extracts them in a process pool; every worker
+opens the PDF once and reads only the pages it is given. Finished slices
+are written to the output file in page order as soon as all earlier ones
+are written, and at most `2 * workers` slices are in flight, so memory
+holds a few slices instead of the whole text. The output is identical to
+extract_text_from_pdf()'s.
+
+Usage:
+    python text_extractor.py
+    python text_extractor.py manual.pdf --workers 8 --pages-per-task 16
+    python text_extractor.py manual.pdf --bench   # serial vs parallel, output compared
 """
 
+import argparse
+import os
 import re
-from typing import Optional
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
 from PyPDF2 import PdfReader
 
+OUTPUT_PATH = "Selected_Document.txt"
+PAGES_PER_TASK = 8
+
+
+def _clean(text: str) -> str:
+    # Collapse multiple whitespace characters
+    return re.sub(r"\s+", " ", text).strip()
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+
+def _read_pages(reader: PdfReader, start: int, stop: int) -> List[str]:
+    """Cleaned text of pages [start, stop) that have any text."""
+    parts = []
+    for i in range(start, stop):
+        try:
+            text = reader.pages[i].extract_text() or ""
+            if text:
+                parts.append(_clean(text))
+        except Exception as e:
+            print(f"⚠️ Could not read page {i}: {e}")
+    return parts
+
+
+def extract_text_from_pdf(pdf_path: str, out_path: str = OUTPUT_PATH) -> str:
     """
     Extracts text from a PDF file and writes it to Selected_Document.txt.
 
     Args:
         pdf_path (str): Path to the PDF file.
+        out_path (str): Where to write the text.
 
     Returns:
         str: Combined cleaned text from all pages.
@@ -27,32 +67,128 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         print(f"❌ Failed to open PDF: {e}")
         return ""
 
-    parts = []
-    for i, page in enumerate(reader.pages):
-        try:
-            text = page.extract_text() or ""
-            if text:
-                # Collapse multiple whitespace characters
-                text = re.sub(r"\s+", " ", text).strip()
-                parts.append(text)
-        except Exception as e:
-            print(f"⚠️ Could not read page {i}: {e}")
-
-    combined = "\n\n".join(parts)
+    combined = "\n\n".join(_read_pages(reader, 0, len(reader.pages)))
 
     try:
-        with open("Selected_Document.txt", "w", encoding="utf-8") as f:
+        with open(out_path, "w", encoding="utf-8") as f:
             f.write(combined)
-        print("✅ Wrote extracted text to Selected_Document.txt (UTF-8).")
+        print(f"✅ Wrote extracted text to {out_path} (UTF-8).")
     except OSError as e:
         print(f"❌ Failed to write output file: {e}")
 
     return combined
 
 
+# --- Parallel extraction ---
+
+_reader = None
+
+
+def _init_worker(pdf_path: str) -> None:
+    global _reader
+    _reader = PdfReader(pdf_path)
+
+
+def _extract_slice(start: int, stop: int) -> List[str]:
+    return _read_pages(_reader, start, stop)
+
+
+def extract_pdf_to_file(
+    pdf_path: str,
+    out_path: str = OUTPUT_PATH,
+    workers: Optional[int] = None,
+    pages_per_task: int = PAGES_PER_TASK,
+) -> int:
+    """
+    Extract a PDF in parallel, streaming the text to `out_path` in page order.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        out_path (str): Where to write the text (replaced only on success).
+        workers (int): Worker processes (default: all cores).
+        pages_per_task (int): Pages per task; larger = less overhead, more memory.
+
+    Returns:
+        int: Characters written (0 if the PDF could not be read or written).
+    """
+    try:
+        pages = len(PdfReader(pdf_path).pages)
+    except Exception as e:
+        print(f"❌ Failed to open PDF: {e}")
+        return 0
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    slices = [(s, min(s + pages_per_task, pages)) for s in range(0, pages, pages_per_task)]
+    window = 2 * workers
+    written = 0
+    t0 = time.perf_counter()
+
+    # Write next to the target and rename, so readers never see half a document
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".txt", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as pool:
+            futures, submitted = {}, 0
+            for i in range(len(slices)):
+                # Keep the window full; later slices that finish early wait here
+                while submitted < min(len(slices), i + window):
+                    futures[submitted] = pool.submit(_extract_slice, *slices[submitted])
+                    submitted += 1
+                for part in futures.pop(i).result():
+                    if written:
+                        f.write("\n\n")
+                        written += 2
+                    f.write(part)
+                    written += len(part)
+        os.replace(tmp, out_path)
+    except Exception as e:
+        os.unlink(tmp)
+        print(f"❌ Failed to extract {pdf_path}: {e}")
+        return 0
+
+    print(f"✅ Wrote {pages} pages ({written} chars) to {out_path} in "
+          f"{time.perf_counter() - t0:.2f}s with {workers} workers.")
+    return written
+
+
+def _bench(pdf_path: str, workers: Optional[int], pages_per_task: int) -> None:
+    out_dir = tempfile.mkdtemp(prefix="pdf-bench-")
+    serial_path, parallel_path = os.path.join(out_dir, "serial.txt"), os.path.join(out_dir, "parallel.txt")
+
+    t0 = time.perf_counter()
+    extract_text_from_pdf(pdf_path, serial_path)
+    serial_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    extract_pdf_to_file(pdf_path, parallel_path, workers, pages_per_task)
+    parallel_s = time.perf_counter() - t0
+
+    with open(serial_path, encoding="utf-8") as a, open(parallel_path, encoding="utf-8") as b:
+        same = a.read() == b.read()
+    print(f"📊 serial {serial_s:.2f}s, parallel {parallel_s:.2f}s ({serial_s / parallel_s:.1f}x); "
+          f"{'✅ identical output' if same else '❌ outputs differ'}")
+
+
 def main():
-    pdf_path = "iPhone - Wikipedia.pdf"
-    text = extract_text_from_pdf(pdf_path)
+    parser = argparse.ArgumentParser(description="Extract a PDF's text to Selected_Document.txt.")
+    parser.add_argument("pdf", nargs="?", default="iPhone - Wikipedia.pdf")
+    parser.add_argument("--workers", type=int, help="Extract pages in this many processes, streaming to the file")
+    parser.add_argument("--pages-per-task", type=int, default=PAGES_PER_TASK)
+    parser.add_argument("--bench", action="store_true", help="Time serial vs parallel extraction and compare outputs")
+    args = parser.parse_args()
+
+    if args.bench:
+        _bench(args.pdf, args.workers, args.pages_per_task)
+        return
+
+    if args.workers:
+        # The text is not held in memory; preview it from the file
+        if not extract_pdf_to_file(args.pdf, OUTPUT_PATH, args.workers, args.pages_per_task):
+            print("\n⚠️ No text was extracted from the PDF.")
+            return
+        with open(OUTPUT_PATH, "r", encoding="utf-8") as f:
+            text = f.read(400)
+    else:
+        text = extract_text_from_pdf(args.pdf)
     if text:
         print("\n--- Preview (first 400 chars) ---")
         print(text[:400])
@@ -3,12 +3,16 @@ from transformers import logging as transformers_logging
 import warnings
 from dotenv import load_dotenv  # Make sure this is imported
 import os
-import openai
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from sentence_transformers import SentenceTransformer
 from sentence_transformers import CrossEncoder  # <-- ADDED
 import numpy as np
-import faiss
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from index_cache import CACHE_DIR, cache_key, load_or_build_index, text_hash
+from llm_client import LLMClient
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,8 +27,6 @@ api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise ValueError("OpenAI API key not found. Make sure your .env file has OPENAI_API_KEY set.")
 
-openai.api_key = api_key
-
 # Read contents of Selected_Document.txt into text variable
 with open("Selected_Document.txt", "r", encoding="utf-8") as file:
     text = file.read()
@@ -41,23 +43,73 @@ top_k = 20                             # <-- CHANGED (from 5)
 cross_encoder_name = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # <-- ADDED
 top_m = 8                              # <-- ADDED
 
+# Async pipeline: max chat completions in flight / threads for retrieval + reranking
+llm_concurrency = 8
+cpu_workers = 4
+
+# LLM calls (see llm_client.py): per-answer deadline, per-attempt timeout,
+# retries with jittered backoff, rate limit (requests/s, None = off) and
+# the failures that open the circuit breaker for llm_breaker_reset seconds
+llm_timeout = 60.0
+llm_attempt_timeout = 30.0
+llm_max_retries = 4
+llm_rate_limit = None
+llm_breaker_threshold = 5
+llm_breaker_reset = 30.0
+
+separators = ["\n\n", "\n", " ", ""]
+
 # Split text into chunks using RecursiveCharacterTextSplitter
 text_splitter = RecursiveCharacterTextSplitter(
-    separators=["\n\n", "\n", " ", ""],
+    separators=separators,
     chunk_size=chunk_size,
     chunk_overlap=chunk_overlap,
 )
-chunks = text_splitter.split_text(text)
 
-# Load model and encode chunks (bi-encoder)
+# Load model (bi-encoder)
 embedder = SentenceTransformer(model_name)
-embeddings = embedder.encode(chunks, show_progress_bar=False)
-embeddings = np.array(embeddings).astype('float32')
 
-# Initialize FAISS index and add embeddings
-dimension = embeddings.shape[1]
-faiss_index = faiss.IndexFlatL2(dimension)
-faiss_index.add(embeddings)
+def _encode_chunks(new_chunks):
+    return embedder.encode(new_chunks, show_progress_bar=False)
+
+# Build the FAISS index from the on-disk cache: chunks are content-addressed,
+# so only chunks that are new since the last run get embedded
+index_key = cache_key(model_name, chunk_size, chunk_overlap, separators)
+chunk_index, _, _ = load_or_build_index(
+    index_key,
+    text,
+    split=text_splitter.split_text,
+    encode=_encode_chunks,
+    dim=embedder.get_sentence_embedding_dimension(),
+)
+
+# These objects are updated in place by refresh_index()
+chunks = chunk_index.chunks
+chunk_by_id = chunk_index.chunk_by_id
+faiss_index = chunk_index.index
+
+def refresh_index(path: str = "Selected_Document.txt"):
+    """
+    Re-read the document and update faiss_index and chunks in place,
+    embedding only the chunks that changed.
+
+    Returns:
+        tuple[int, int]: Number of vectors added and removed.
+    """
+    global text
+    with open(path, "r", encoding="utf-8") as file:
+        text = file.read()
+
+    doc_hash = text_hash(text)
+    if doc_hash == chunk_index.doc_hash:
+        return 0, 0
+
+    added, removed = chunk_index.sync(text_splitter.split_text(text), _encode_chunks, doc_hash)
+    try:
+        chunk_index.save(os.path.join(CACHE_DIR, index_key))
+    except OSError as e:
+        print(f"⚠️ Could not write index cache: {e}")
+    return added, removed
 
 # -----------------------------
 # Retrieval (bi-encoder + FAISS)
@@ -76,7 +128,7 @@ def retrieve_chunks(question: str, k: int = top_k):
     q_vec = embedder.encode([question], show_progress_bar=False)
     q_arr = np.array(q_vec).astype('float32')
     distances, I = faiss_index.search(q_arr, k)
-    return [chunks[i] for i in I[0]]
+    return [chunk_by_id[i] for i in I[0] if i in chunk_by_id]
 
 # -----------------------------
 # Re-ranking (cross-encoder)
@@ -109,16 +161,23 @@ def rerank_chunks(question: str, candidate_chunks: list[str], m: int = top_m) ->
 # -----------------------------
 # QA with LLM
 # -----------------------------
-def answer_question(question: str) -> str:
+# One pooled client for every chat completion: deadlines, retries,
+# concurrency / rate limits and a circuit breaker (see llm_client.py)
+llm = LLMClient(
+    api_key=api_key,
+    max_concurrency=llm_concurrency,
+    timeout=llm_timeout,
+    attempt_timeout=llm_attempt_timeout,
+    max_retries=llm_max_retries,
+    rate_per_s=llm_rate_limit,
+    breaker_threshold=llm_breaker_threshold,
+    breaker_reset_s=llm_breaker_reset,
+)
+
+def _completion_args(question: str, relevant_chunks: list[str]) -> dict:
     """
-    Retrieves candidate chunks, re-ranks them, and uses OpenAI's Chat Completions API to answer.
+    Builds the Chat Completions arguments (model, prompts, parameters) for a question.
     """
-    # Retrieve candidate chunks via FAISS
-    candidates = retrieve_chunks(question)
-
-    # Re-rank to final context
-    relevant_chunks = rerank_chunks(question, candidates, m=top_m)
-
     # Combine chunks into a single context string separated by double newlines
     context = "\n\n".join(relevant_chunks)
 
@@ -137,8 +196,7 @@ Question: {question}
 Answer:
 """
 
-    # Call OpenAI Chat Completions with the prompts and parameters
-    resp = openai.chat.completions.create(
+    return dict(
         model="gpt-3.5-turbo",  # You can switch to "gpt-4o" or a newer model if available
         messages=[
             {"role": "system", "content": system_prompt},
@@ -148,14 +206,110 @@ Answer:
         max_tokens=500,
     )
 
+
+def answer_question(question: str) -> str:
+    """
+    Retrieves candidate chunks, re-ranks them, and uses OpenAI's Chat Completions API to answer.
+    """
+    # Retrieve candidate chunks via FAISS
+    candidates = retrieve_chunks(question)
+
+    # Re-rank to final context
+    relevant_chunks = rerank_chunks(question, candidates, m=top_m)
+
+    # Call OpenAI Chat Completions with the prompts and parameters
+    resp = llm.complete(**_completion_args(question, relevant_chunks))
+
     # Return the assistant's reply text, stripped of whitespace
     return resp.choices[0].message.content.strip()
 
+# -----------------------------
+# Async QA (concurrent LLM calls)
+# -----------------------------
+_cpu_pool = None
+
+def _async_state():
+    """
+    Lazily creates the CPU thread pool; returns it with the LLM client, whose
+    complete_async() limits in-flight completions to llm_concurrency.
+    """
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ThreadPoolExecutor(max_workers=cpu_workers)
+    return llm, _cpu_pool
+
+async def answer_question_async(question: str) -> str:
+    """
+    Async version of answer_question: retrieval and re-ranking run in a thread
+    pool so the event loop stays free, and the completion uses the async client.
+    """
+    client, pool = _async_state()
+    loop = asyncio.get_running_loop()
+
+    relevant_chunks = await loop.run_in_executor(
+        pool, lambda: rerank_chunks(question, retrieve_chunks(question), m=top_m)
+    )
+
+    resp = await client.complete_async(**_completion_args(question, relevant_chunks))
+    return resp.choices[0].message.content.strip()
+
+async def answer_questions_async(questions: list[str]) -> list[str]:
+    """
+    Answers many questions concurrently and returns the answers in input order.
+    """
+    return await asyncio.gather(*(answer_question_async(q) for q in questions))
+
+
+# -----------------------------
+# Streaming QA
+# -----------------------------
+def stream_answer(question: str, timings: dict = None):
+    """
+    Streams the answer to a question, yielding text pieces as the chat completion produces them.
+
+    Args:
+        question (str): The input question string.
+        timings (dict): Optional dict that receives "ttft_s" (seconds until the
+            first token, retrieval included) and "total_s" (until the last token).
+
+    Yields:
+        str: Pieces of the answer text, in order.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+
+    candidates = retrieve_chunks(question)
+    relevant_chunks = rerank_chunks(question, candidates, m=top_m)
+
+    stream = llm.stream(**_completion_args(question, relevant_chunks))
+    for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        timings.setdefault("ttft_s", time.perf_counter() - start)
+        yield chunk.choices[0].delta.content
+
+    timings["total_s"] = time.perf_counter() - start
+    timings.setdefault("ttft_s", timings["total_s"])
+
 
 if __name__ == "__main__":
+    stream = "--stream" in sys.argv[1:]
+
     print("Enter 'exit' or 'quit' to end.")
     while True:
         question = input("Your question: ")
         if question.lower() in ("exit", "quit"):
             break
-        print("Answer:", answer_question(question))
+        try:
+            if not stream:
+                print("Answer:", answer_question(question))
+                continue
+
+            timings = {}
+            print("Answer: ", end="", flush=True)
+            for piece in stream_answer(question, timings):
+                print(piece, end="", flush=True)
+            print(f"\n(first token {timings['ttft_s']:.2f}s, total {timings['total_s']:.2f}s)")
+        except Exception as e:
+            # Timeouts, exhausted retries or an open circuit: keep the REPL alive
+            print("\n⚠️ Error while answering:", e)
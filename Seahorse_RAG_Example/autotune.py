@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Autotune
+--------
+Sweeps chunk_size, chunk_overlap, top_k and top_m of RAG_app.py over a
+labeled question set and prints the Pareto frontier of latency, retrieval
+quality and prompt cost.
+
+For every configuration and question the sweep retrieves top_k chunks and
+reranks them to top_m, as answer_question() does before calling the LLM,
+and records:
+
+  - p95_ms:        95th percentile of the retrieve + rerank wall time;
+  - recall:        share of questions whose top_m chunks contain the
+                   question's "expected" phrase (whitespace and case ignored);
+  - prompt_tokens: mean tokens of the chat prompt built from those chunks.
+
+A configuration is on the frontier when no other one is at least as good on
+all three and better on one.
+
+Each chunking is split, embedded and indexed once through index_cache.py,
+under the same key RAG_app.py uses, so chunkings indexed before are loaded
+instead of re-embedded, and all top_k / top_m combinations share one index
+and one reranking of the largest top_k. Chunkings are spread over spawned
+worker processes (each importing RAG_app.py, i.e. loading both models);
+latencies are comparable within one sweep, use --workers 1 for standalone
+numbers. No LLM calls are made.
+
+Usage:
+    python autotune.py
+    python autotune.py --chunk-sizes 300 500 800 --overlaps 50 100 --workers 3
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bump when the report layout changes
+SCHEMA_VERSION = 1
+
+QUESTIONS_PATH = "benchmark_questions.json"
+
+# Lower is better for these, higher for recall
+OBJECTIVES = (("p95_ms", -1), ("recall", 1), ("prompt_tokens", -1))
+
+_COUNT_TOKENS = None
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def _token_counter(model: str, fallback_tokenizer):
+    """The chat model's tokenizer (tiktoken) when installed, else the embedder's."""
+    try:
+        import tiktoken
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(enc.encode(text, disallowed_special=()))
+    except ImportError:
+        return lambda text: len(fallback_tokenizer.encode(text, add_special_tokens=False))
+
+
+def _init_worker(threads: int) -> None:
+    global _COUNT_TOKENS
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    # RAG_app.py needs a key at import time; the sweep makes no LLM calls
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    import RAG_app  # loads both models once per worker
+    _COUNT_TOKENS = _token_counter(RAG_app._completion_args("", [])["model"], RAG_app.embedder.tokenizer)
+
+
+def evaluate_chunking(
+    chunk_size: int,
+    chunk_overlap: int,
+    top_ks: Sequence[int],
+    top_ms: Sequence[int],
+    questions: List[Tuple[str, str]],
+    repeats: int = 2,
+) -> dict:
+    """
+    Measure every (top_k, top_m) combination for one chunking.
+
+    Args:
+        chunk_size (int): Splitter chunk size.
+        chunk_overlap (int): Splitter chunk overlap.
+        top_ks (Sequence[int]): Retrieval depths.
+        top_ms (Sequence[int]): Reranked chunks kept.
+        questions (List[Tuple[str, str]]): (question, expected phrase) pairs.
+        repeats (int): Timed passes over the questions (after one untimed pass).
+
+    Returns:
+        dict: chunking info ("chunks", "build_s") and one row per combination.
+    """
+    import RAG_app
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from index_cache import cache_key, load_or_build_index
+
+    splitter = RecursiveCharacterTextSplitter(
+        separators=RAG_app.separators, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    t0 = time.perf_counter()
+    chunk_index, _, _ = load_or_build_index(
+        cache_key(RAG_app.model_name, chunk_size, chunk_overlap, RAG_app.separators),
+        RAG_app.text,
+        split=splitter.split_text,
+        encode=RAG_app._encode_chunks,
+        dim=RAG_app.embedder.get_sentence_embedding_dimension(),
+    )
+    build_s = time.perf_counter() - t0
+    # retrieve_chunks() searches these module globals
+    RAG_app.faiss_index, RAG_app.chunk_by_id = chunk_index.index, chunk_index.chunk_by_id
+
+    combos = [(k, m) for k in top_ks for m in top_ms]
+    seconds: Dict[tuple, List[float]] = {c: [] for c in combos}
+    hits = {c: 0 for c in combos}
+    candidate_hits = {k: 0 for k in top_ks}
+    tokens = {c: 0 for c in combos}
+    max_m = max(top_ms)
+
+    # The first pass is untimed and supplies the quality numbers
+    for rep in range(repeats + 1):
+        for question, expected in questions:
+            gold = _squash(expected)
+            for k in top_ks:
+                t0 = time.perf_counter()
+                candidates = RAG_app.retrieve_chunks(question, k)
+                # Best-first, so each top_m is a prefix of one reranking
+                relevant = RAG_app.rerank_chunks(question, candidates, m=max_m)
+                elapsed = time.perf_counter() - t0
+                if rep:
+                    for m in top_ms:
+                        seconds[(k, m)].append(elapsed)
+                    continue
+
+                candidate_hits[k] += any(gold in _squash(c) for c in candidates)
+                for m in top_ms:
+                    hits[(k, m)] += any(gold in _squash(c) for c in relevant[:m])
+                    messages = RAG_app._completion_args(question, relevant[:m])["messages"]
+                    tokens[(k, m)] += sum(_COUNT_TOKENS(msg["content"]) for msg in messages)
+
+    n = len(questions)
+    rows = []
+    for k, m in combos:
+        ms = 1000 * np.asarray(seconds[(k, m)] or [0.0])
+        rows.append({
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "top_k": k,
+            "top_m": m,
+            "recall": hits[(k, m)] / n,
+            "candidate_recall": candidate_hits[k] / n,
+            "prompt_tokens": tokens[(k, m)] / n,
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+        })
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunks": len(chunk_index.chunks),
+        "build_s": build_s,
+        "rows": rows,
+    }
+
+
+def pareto_front(rows: List[dict], objectives=OBJECTIVES) -> List[dict]:
+    """Rows that no other row matches or beats on every objective and beats on one."""
+    def dominates(a, b):
+        better = False
+        for key, sign in objectives:
+            if sign * a[key] < sign * b[key]:
+                return False
+            better |= sign * a[key] > sign * b[key]
+        return better
+
+    return [r for r in rows if not any(dominates(o, r) for o in rows if o is not r)]
+
+
+def run_sweep(
+    questions: List[Tuple[str, str]],
+    chunk_sizes: Sequence[int],
+    overlaps: Sequence[int],
+    top_ks: Sequence[int],
+    top_ms: Sequence[int],
+    repeats: int = 2,
+    workers: Optional[int] = None,
+) -> dict:
+    """
+    Evaluate every combination, one chunking per task across `workers`
+    processes, and mark the Pareto-optimal rows.
+
+    Returns:
+        dict: JSON-serializable report ("chunkings", "rows" with a "pareto" flag).
+    """
+    chunkings = [(s, o) for s in chunk_sizes for o in overlaps if o < s]
+    if not chunkings:
+        raise ValueError("no chunking with chunk_overlap < chunk_size")
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus // 2, len(chunkings)))
+    threads = max(1, cpus // workers)
+    args = (top_ks, top_ms, questions, repeats)
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        _init_worker(0)
+        results = [evaluate_chunking(s, o, *args) for s, o in chunkings]
+    else:
+        # spawn: forking a process that already initialized torch can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            futures = [pool.submit(evaluate_chunking, s, o, *args) for s, o in chunkings]
+            results = [f.result() for f in futures]
+    seconds = time.perf_counter() - t0
+
+    rows = [row for result in results for row in result.pop("rows")]
+    front = {id(r) for r in pareto_front(rows)}
+    for row in rows:
+        row["pareto"] = id(row) in front
+    return {
+        "schema": SCHEMA_VERSION,
+        "questions": len(questions),
+        "repeats": repeats,
+        "workers": workers,
+        "threads_per_worker": threads if workers > 1 else None,
+        "seconds": seconds,
+        "chunkings": results,
+        "rows": rows,
+    }
+
+
+def print_rows(rows: List[dict], current: tuple) -> None:
+    print(f"{'size':>6}{'overlap':>9}{'top_k':>7}{'top_m':>7}{'recall':>8}{'cand.':>7}"
+          f"{'tokens':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in rows:
+        key = (r["chunk_size"], r["chunk_overlap"], r["top_k"], r["top_m"])
+        mark = "  ← current" if key == current else ""
+        print(f"{r['chunk_size']:>6}{r['chunk_overlap']:>9}{r['top_k']:>7}{r['top_m']:>7}"
+              f"{r['recall']:>8.2f}{r['candidate_recall']:>7.2f}{r['prompt_tokens']:>8.0f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep chunking and retrieval depth; print the Pareto frontier.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH,
+                        help='JSON list of {"question": ..., "expected": phrase in the gold chunk}')
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[150, 300, 500, 800])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 20, 40])
+    parser.add_argument("--top-m", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--repeats", type=int, default=2, help="Timed passes over the question set")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: half the cores)")
+    parser.add_argument("--out", default="autotune_results.json", help="Where to write the JSON report")
+    parser.add_argument("--all", action="store_true", help="Print every configuration, not just the frontier")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [(q["question"], q["expected"]) for q in json.load(f)]
+
+    report = run_sweep(questions, args.chunk_sizes, args.overlaps, args.top_k, args.top_m,
+                       args.repeats, args.workers)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    import RAG_app
+    current = (RAG_app.chunk_size, RAG_app.chunk_overlap, RAG_app.top_k, RAG_app.top_m)
+
+    print(f"📊 {len(report['rows'])} configurations, {len(questions)} questions, "
+          f"{report['workers']} workers, {report['seconds']:.1f}s")
+    for c in report["chunkings"]:
+        print(f"   chunk_size {c['chunk_size']:>4}, overlap {c['chunk_overlap']:>3}: "
+              f"{c['chunks']:>5} chunks, index ready in {c['build_s']:.2f}s")
+
+    rows = sorted(report["rows"], key=lambda r: (r["p95_ms"], -r["recall"], r["prompt_tokens"]))
+    front = [r for r in rows if r["pareto"]]
+    print(f"\n📊 Pareto frontier ({len(front)} of {len(rows)}; lower p95 and tokens, higher recall):")
+    print_rows(rows if args.all else front, current)
+    if not args.all and not any((r["chunk_size"], r["chunk_overlap"], r["top_k"], r["top_m"]) == current
+                                for r in front):
+        print("\n⚠️ The current configuration is not on the frontier:")
+        print_rows([r for r in rows if (r["chunk_size"], r["chunk_overlap"], r["top_k"], r["top_m"]) == current],
+                   current)
+    print(f"✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Benchmark
+---------
+Reproducible end-to-end benchmark of RAG_app.py on the seahorse article,
+with a JSON report that can be diffed between commits.
+
+The OpenAI calls go to stub_llm_server.py, started on a background thread,
+so answers are deterministic and cost nothing. The benchmark then:
+
+  - rebuilds the index for Selected_Document.txt in a temporary cache
+    directory (build time, peak memory);
+  - retrieves and reranks every question of benchmark_questions.json. A
+    chunk is gold when it contains the question's "expected" phrase
+    (whitespace and case ignored); recall@k is the share of questions with
+    a gold chunk among the top_k candidates, precision@m the share of gold
+    chunks among the top_m reranked ones;
+  - answers every question `--repeats` times the way answer_question() does
+    and reports p50/p99 of the retrieve, rerank, llm and answer stages.
+
+--compare BASELINE prints the changes against an earlier report and exits
+with status 1 on a quality drop or a p50 above --tolerance.
+
+Usage:
+    python benchmark.py --out baseline.json
+    python benchmark.py --out new.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Bump when the report layout changes, so --compare can refuse old files
+SCHEMA_VERSION = 1
+
+QUESTIONS_PATH = "benchmark_questions.json"
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def load_questions(path: str) -> List[dict]:
+    """Gold questions: a JSON list of {"question": ..., "expected": ...}."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _rounded(value, digits: int = 4):
+    if isinstance(value, float):
+        return round(value, digits)
+    if isinstance(value, dict):
+        return {k: _rounded(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rounded(v, digits) for v in value]
+    return value
+
+
+def _stage_table(samples: Dict[str, List[float]]) -> Dict[str, dict]:
+    """Per-stage count, mean, p50 and p99 in milliseconds."""
+    table = {}
+    for name, seconds in sorted(samples.items()):
+        ms = 1000 * np.asarray(seconds)
+        table[name] = {
+            "count": len(ms),
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p99_ms": float(np.percentile(ms, 99)),
+        }
+    return table
+
+
+def run_benchmark(questions: List[dict], repeats: int = 3, llm_latency: float = 0.0) -> dict:
+    """
+    Run the benchmark in this process and return the report.
+
+    Args:
+        questions (List[dict]): Gold questions (see load_questions()).
+        repeats (int): Times every question is answered for the latency stats.
+        llm_latency (float): Seconds the stub LLM waits per request.
+
+    Returns:
+        dict: JSON-serializable report.
+    """
+    import stub_llm_server
+
+    stub = stub_llm_server.start_in_thread(port=0, latency=llm_latency, token_latency=0.0)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+
+    try:
+        # Importing the app loads both models and its (possibly cached) index
+        import RAG_app
+        from index_cache import load_or_build_index
+
+        # Cold build in an empty cache directory
+        t0 = time.perf_counter()
+        chunk_index, _, _ = load_or_build_index(
+            RAG_app.index_key,
+            RAG_app.text,
+            split=RAG_app.text_splitter.split_text,
+            encode=RAG_app._encode_chunks,
+            dim=RAG_app.embedder.get_sentence_embedding_dimension(),
+            cache_dir=tempfile.mkdtemp(prefix="rag-bench-"),
+        )
+        index = {
+            "build_s": time.perf_counter() - t0,
+            "chunks": len(chunk_index.chunks),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+        texts = [q["question"] for q in questions]
+        expected = [_squash(q["expected"]) for q in questions]
+        samples: Dict[str, List[float]] = {}
+        per_question = []
+
+        # The first pass is untimed and supplies the quality numbers
+        for rep in range(repeats + 1):
+            for i, question in enumerate(texts):
+                t0 = time.perf_counter()
+                candidates = RAG_app.retrieve_chunks(question)
+                t1 = time.perf_counter()
+                relevant = RAG_app.rerank_chunks(question, candidates, m=RAG_app.top_m)
+                t2 = time.perf_counter()
+                RAG_app.llm.complete(**RAG_app._completion_args(question, relevant))
+                t3 = time.perf_counter()
+
+                if rep == 0:
+                    per_question.append({
+                        "question": question,
+                        "hit": any(expected[i] in _squash(c) for c in candidates),
+                        "precision": sum(expected[i] in _squash(c) for c in relevant) / RAG_app.top_m,
+                    })
+                    continue
+                for stage, seconds in (("retrieve", t1 - t0), ("rerank", t2 - t1),
+                                       ("llm", t3 - t2), ("answer", t3 - t0)):
+                    samples.setdefault(stage, []).append(seconds)
+    finally:
+        stub.shutdown()
+
+    n = max(len(per_question), 1)
+    report = {
+        "schema": SCHEMA_VERSION,
+        "app": "Seahorse_RAG_Example",
+        "config": {
+            "chunk_size": RAG_app.chunk_size,
+            "chunk_overlap": RAG_app.chunk_overlap,
+            "model_name": RAG_app.model_name,
+            "cross_encoder_name": RAG_app.cross_encoder_name,
+            "top_k": RAG_app.top_k,
+            "top_m": RAG_app.top_m,
+            "questions": len(questions),
+            "repeats": repeats,
+            "llm_latency_s": llm_latency,
+        },
+        "env": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "index": index,
+        "quality": {
+            f"recall@{RAG_app.top_k}": sum(q["hit"] for q in per_question) / n,
+            f"precision@{RAG_app.top_m}": sum(q["precision"] for q in per_question) / n,
+        },
+        "latency_ms": _stage_table(samples),
+        "peak_rss_mb": peak_rss_mb(),
+        "per_question": per_question,
+    }
+    return _rounded(report)
+
+
+# --- Comparison ---
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25) -> List[str]:
+    """
+    Print current vs baseline and return the regressions: a lower quality
+    metric, or build time / stage p50 up by more than `tolerance`
+    (ignoring growth under 50 ms of build time or 0.5 ms per stage).
+    """
+    if baseline.get("schema") != current.get("schema"):
+        return [f"baseline schema {baseline.get('schema')} != {current.get('schema')}"]
+
+    # (name, baseline, current, allowed growth floor; None = higher is better)
+    rows = [(f"quality.{name}", baseline["quality"].get(name), value, None)
+            for name, value in current["quality"].items()]
+    rows.append(("index.build_s", baseline["index"]["build_s"], current["index"]["build_s"], 0.05))
+    rows += [(f"latency_ms.{name}.p50_ms", baseline["latency_ms"].get(name, {}).get("p50_ms"), s["p50_ms"], 0.5)
+             for name, s in current["latency_ms"].items()]
+
+    regressions = []
+    print(f"{'metric':<34}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, old, new, floor in rows:
+        if old is None:
+            print(f"{name:<34}{'-':>12}{new:>12.4f}{'new':>10}")
+            continue
+        change = (new - old) / old if old else 0.0
+        print(f"{name:<34}{old:>12.4f}{new:>12.4f}{change:>+10.1%}")
+        if floor is None and new < old:
+            regressions.append(f"{name} dropped from {old} to {new}")
+        elif floor is not None and change > tolerance and new - old > floor:
+            regressions.append(f"{name} grew {change:+.0%} ({old} -> {new})")
+    return regressions
+
+
+def print_summary(report: dict) -> None:
+    index = report["index"]
+    rss = f", peak RSS {index['peak_rss_mb']:.0f} MB" if index["peak_rss_mb"] is not None else ""
+    print(f"📊 Index: {index['chunks']} chunks built in {index['build_s']:.2f}s{rss}")
+    print("📊 " + ", ".join(f"{name} {value:.3f}" for name, value in report["quality"].items()))
+    print(f"{'stage':<10}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, s in report["latency_ms"].items():
+        print(f"{name:<10}{s['count']:>7}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end RAG benchmark with a stub LLM.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH,
+                        help='JSON list of {"question": ..., "expected": phrase in the gold chunk}')
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the question set")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the stub LLM waits per request")
+    parser.add_argument("--out", default="benchmark_results.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", metavar="BASELINE", help="Report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative growth of build time and stage p50 latencies")
+    args = parser.parse_args()
+
+    report = run_benchmark(load_questions(args.questions), args.repeats, args.llm_latency)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + "\n")
+    print_summary(report)
+    print(f"✅ Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()